@@ -1,7 +1,9 @@
 import sys
 import json
+from typing import Optional, Tuple, Iterator, Iterable
 from bxast import *
 from macros import tacMacros as Macros
+from tac_store import TacStore, Temp, Label, RET, temp, label, write_procs
 
 """
 Authors: Yi Yao Tan 
@@ -14,12 +16,17 @@ Authors: Yi Yao Tan
 
 class CodeScope:
     """ The class keeps track of scope info 
-        needed to track TAC stmt generation """
-    def __init__(self) -> None:
-        self.__temps: dict = []
+        needed to track TAC stmt generation
+        recycle: reuse the temps of finished statements and closed scopes """
+    def __init__(self, recycle: bool = True) -> None:
+        self.__temps: List[Temp] = []
         self.__temp_counter: int = 0
-        self.__scope_map: List = []
-        self.__labels: List[str] = []
+        self.__recycle: bool = recycle
+        self.__free_temps: List[Temp] = []              # popped from the end
+        self.__statement_temps: List[Temp] = []         # given out since the last release
+        self.__variable_temps: List[List[Temp]] = []    # temps of the variables by scope
+        self.__symbols: SymbolTable = SymbolTable()
+        self.__labels: List[Label] = []
         self.__label_counter: int = 0
         self.__break_stack = []
         self.__continue_stack = []
@@ -29,46 +36,63 @@ class CodeScope:
 
     def add_globl_var(self, variable: str) -> None:
         """ Temporary for globl var is same as its name """
-        assert(len(self.__scope_map) == 1), f"global variable {variable} not defined globally "
-        self.__scope_map[0][variable] = variable
+        assert(len(self.__symbols) == 1), f"global variable {variable} not defined globally "
+        self.__symbols.bind(variable, variable)
 
-    def add_variable(self, variable: str) -> str:
-        """ Adds a variable in code and creates a temp for it """
+    def add_variable(self, variable: str) -> Temp:
+        """ Adds a variable in code and creates a temp for it, which is kept
+            until the scope of the variable is closed """
         self.__check_scope(variable)
-        temp = self.fresh_temp()
-        self.__scope_map[-1][variable] = temp
+        temp = self.__take_temp()
+        if self.__recycle:
+            self.__variable_temps[-1].append(temp)
+        self.__symbols.bind(variable, temp)
         return temp
 
-    def fresh_temp(self) -> str:
-        """ Creates and returns a new temp """
-        temp = f'%{self.__temp_counter}'
+    def fresh_temp(self) -> Temp:
+        """ Returns a temp that is free until release_temps """
+        fresh = self.__take_temp()
+        if self.__recycle:
+            self.__statement_temps.append(fresh)
+        return fresh
+
+    def __take_temp(self) -> Temp:
+        """ Reuses a released temp or creates a new one """
+        if self.__free_temps:
+            return self.__free_temps.pop()
+        fresh = temp(self.__temp_counter)
         self.__temp_counter += 1
-        self.__temps.append(temp)
-        return temp
+        self.__temps.append(fresh)
+        return fresh
+
+    def release_temps(self) -> None:
+        """ Frees the temps given out by fresh_temp, none of them may be read
+            by the tac emitted from now on """
+        # the first temp of the statement is the first reused
+        self.__free_temps.extend(reversed(self.__statement_temps))
+        self.__statement_temps = []
 
-    def fresh_label(self) -> str:
+    def fresh_label(self) -> Label:
         """ generates a new label """
-        label = f'%.L{self.__label_counter}'
+        fresh = label(self.__label_counter)
         self.__label_counter += 1
-        self.__labels.append(label)
-        return label
+        self.__labels.append(fresh)
+        return fresh
 
     def fetch_temp(self, variable: str) -> str:
         """ Returns a temp if it exists otherwise raises RuntimeError"""
         self.__check_scope(variable)
-        # print(f"Scope is {self.__scope_map}")
+        # print(f"Scope is {self.__symbols}")
         # print(f"Variable is {variable}")
-        # We traverse the scopes from the last to check if variable is defined bottom up
-        for scope in self.__scope_map[::-1]:
-            # print(f"Scope is {scope}")
-            if variable in scope:
-                # print(f" variable = {variable} and temp = {scope[variable]}")
-                return scope[variable]
+        # the innermost binding shadows the outer ones
+        temp = self.__symbols.lookup(variable)
+        if temp is not None:
+            return temp
         # check if variable is globally defined
-        if f'@{variable}' in self.__scope_map[0]:
-            return scope[f'@{variable}']
-        else:
-            raise RuntimeError(f"Variable {variable} accessed before definition")
+        temp = self.__symbols.lookup_global(f'@{variable}')
+        if temp is not None:
+            return temp
+        raise RuntimeError(f"Variable {variable} accessed before definition")
 
     def enter_new_proc(self) -> None:
         """ Resets label and temp handlers when a new proc is entered """
@@ -76,22 +100,26 @@ class CodeScope:
         self.__label_counter = 0
         self.__temps = []
         self.__labels = []
+        self.__free_temps = []
+        self.__statement_temps = []
 
     # ------------------------------------------------------------------------------#
     # scope handlers
 
     def enter_scope(self) -> None:
-        """ adds a new scope dict to the stack """
-        self.__scope_map.append({})
+        """ opens a new scope """
+        self.__symbols.enter_scope()
+        self.__variable_temps.append([])
 
     def __check_scope(self, variable: ExpressionVar) -> None:
         """ Asserts that a scope exists """
-        if not len(self.__scope_map):
+        if not len(self.__symbols):
             raise RuntimeError(f'Variable {variable} is defined out of scope')
 
     def exit_scope(self) -> None:
-        """ pops the last scope dict from the stack """
-        self.__scope_map.pop()
+        """ closes the innermost scope and frees the temps of its variables """
+        self.__symbols.exit_scope()
+        self.__free_temps.extend(reversed(self.__variable_temps.pop()))
 
     # ------------------------------------------------------------------------------#
     # loop handlers
@@ -113,16 +141,21 @@ class CodeScope:
         self.__break_stack.pop()
         self.__continue_stack.pop()
 
+    def in_loop(self) -> bool:
+        """ Checks if code is generated inside a loop """
+        return len(self.__break_stack) > 0
+
     # ------------------------------------------------------------------------------#
     # getter functions
 
     def get_labels(self) -> list:
         """ Return sorted list of labels because last label is used in CFG """
-        return sorted(self.__labels)
+        return list(self.__labels)      # created in increasing order
 
     def get_temps(self) -> list:
-        """ Returns sorted list of temps just in case """
-        return sorted(self.__temps)
+        """ Returns sorted list of temps just in case, with recycling their
+            number is the most temps held at once """
+        return list(self.__temps)
 
 
 # ------------------------------------------------------------------------------#
@@ -130,38 +163,269 @@ class CodeScope:
 # ------------------------------------------------------------------------------#
 
 class AST_to_TAC_Generator:
-    """ Takes the AST tree and converts it to TAC """
-    def __init__(self, tree: Prog):
-        self.__code_state: CodeScope = CodeScope()
+    """ Takes the AST tree and converts it to TAC
+        scope: if given, the proc bodies are type checked in the same walk
+               (fused mode), the tree must have passed global_type_check
+        cached: tac of procs by name that is reused instead of generated
+        fold: evaluate constant expressions and conditions at compile time
+        order: evaluate the operand needing more temps first when that cannot
+               change the result (Sethi-Ullman order)
+        recycle: reuse the temps of finished statements and closed scopes """
+    def __init__(self, tree: Prog, scope: Scope = None, cached: Dict[str, dict] = None, fold: bool = True,
+                 order: bool = True, recycle: bool = True):
+        self.__code_state: CodeScope = CodeScope(recycle)
         self.__code: Prog = tree
-        self.__global_vars: List[dict] = list()
-        self.__global_procs: List[dict] = list()
-        self.__proc_instructions: List[dict] = []
+        self.__scope: Scope = scope
+        self.__cached: Dict[str, dict] = cached if cached is not None else dict()
+        self.__proc_instructions: TacStore = TacStore()
         self.__macros: Macros = Macros
-        self.__tmm_global_parse()
+        self.__fold_constants: bool = fold
+        # folded value by id of the expression node, None if not constant
+        self.__folded: Dict[int, Union[int, bool, None]] = dict()
+        self.__order_operands: bool = order
+        # Sethi-Ullman number and whether it calls a proc by id of the expression node
+        self.__needs: Dict[int, Tuple[int, bool]] = dict()
 
     # ------------------------------------------------------------------------------#
     # misc functions
 
     def return_tac_instr(self) -> List[dict]:
         """ Returns all tac instrs """
-        return self.__global_vars + self.__global_procs
+        return list(self.declarations())
+
+    def declarations(self) -> Iterator[dict]:
+        """ Yields the tac of the global variables, then of each proc as soon
+            as it is generated """
+        return self.__tmm_global_parse()
 
     def __emit(self, opcode: str, args: List, result: str) -> None:
-        self.__proc_instructions.append({"opcode": opcode, 
-                                         "args": args, 
-                                         "result": result })
+        self.__proc_instructions.emit(opcode, args, result)
+
+    def __type_check(self, statement: Statement, args: List[Param]) -> None:
+        """ Fused mode: type checks the statement but not its sub statements,
+            which are checked when their own tac is generated """
+        if isinstance(statement, StatementBlock):
+            statement.enter(self.__scope, args)
+        elif isinstance(statement, (StatementWhile, StatementIfElse)):
+            statement.check_condition(self.__scope)
+        else:
+            statement.type_check(self.__scope, self.__code_state.in_loop())
+
+    # ------------------------------------------------------------------------------#
+    # Constant folding
+
+    def __fold(self, expression: Expression) -> Optional[int]:
+        """ Returns the value of an int expression of literals and operators,
+            None if it is not constant or its value is left to run time """
+        if isinstance(expression, ExpressionInt):
+            return expression.value if self.__fold_constants else None
+        if not isinstance(expression, ExpressionOp) or expression.operator not in self.__macros.operator_map:
+            return None
+        key = id(expression)
+        if key not in self.__folded:
+            self.__fold_tree(expression)
+        return self.__folded[key]
+
+    def __fold_condition(self, expression: Expression) -> Optional[bool]:
+        """ Returns the value of a bool expression if it is known at compile time """
+        if isinstance(expression, ExpressionBool):
+            return expression.value
+        if not self.__fold_constants or not isinstance(expression, ExpressionOp):
+            return None
+        key = id(expression)
+        if key not in self.__folded:
+            self.__fold_tree(expression)
+        return self.__folded[key]
+
+    def __fold_tree(self, expression: ExpressionOp) -> None:
+        """ Folds the operations of the tree that are not folded yet, operands
+            first, with an explicit stack so that deep trees do not recurse """
+        folded = self.__folded
+        stack = [(expression, False)]
+        while stack:
+            node, ready = stack.pop()
+            if ready:
+                folded[id(node)] = self.__fold_operation(node)
+                continue
+            stack.append((node, True))
+            for subexpr in node.arguments:
+                if isinstance(subexpr, ExpressionOp) and id(subexpr) not in folded:
+                    stack.append((subexpr, False))
+
+    def __fold_operation(self, expression: ExpressionOp) -> Union[int, bool, None]:
+        """ Folds an operation whose operands are folded """
+        if expression.operator in self.__macros.operator_map:
+            opcode = self.__macros.operator_map[expression.operator]
+            values = [self.__fold(subexpr) for subexpr in expression.arguments]
+            value = None
+            if None not in values:
+                if len(values) == 1:
+                    value = self.__macros.fold_unops[opcode](values[0])
+                else:
+                    value = self.__macros.fold_binops[opcode](values[0], values[1])
+                if value is not None:
+                    value = self.__macros.wrap(value)
+            return value
+        value = None
+        if expression.operator == "not":
+            value = self.__fold_condition(expression.arguments[0])
+            value = None if value is None else not value
+        elif expression.operator in ("logical-and", "logical-or"):
+            # the second operand is only used if the first does not decide, as at run time
+            decides = expression.operator == "logical-or"
+            first = self.__fold_condition(expression.arguments[0])
+            if first is decides:
+                value = decides
+            elif first is not None:
+                value = self.__fold_condition(expression.arguments[1])
+        elif expression.operator in self.__macros.jump_map:
+            left, right = (self.__fold(subexpr) for subexpr in expression.arguments)
+            if left is not None and right is not None:
+                jump = self.__macros.jump_map[expression.operator]
+                value = self.__macros.fold_jumps[jump](left - right)
+        return value
+
+    def __has_effect(self, expression: Expression) -> bool:
+        """ Checks if evaluating the int expression calls a proc or may trap:
+            a div or mod whose divisor is not a constant other than 0 and -1,
+            as idivq also traps on the lowest int divided by -1 """
+        stack = [expression]
+        while stack:
+            expression = stack.pop()
+            if isinstance(expression, ExpressionProcCall):
+                return True
+            if not isinstance(expression, ExpressionOp) or self.__fold(expression) is not None:
+                continue
+            if self.__macros.operator_map.get(expression.operator) in ("div", "mod") and \
+                    self.__fold(expression.arguments[1]) in (None, 0, -1):
+                return True
+            stack.extend(expression.arguments)
+        return False
+
+    def __simplify(self, opcode: str, arguments: List[Expression]) -> Union[Expression, int, None]:
+        """ Applies the identities x+0, x-0, x*1, x/1, x<<0, x>>0 and x*0 to the
+            operation, returns the argument or the constant it reduces to, or None """
+        left, right = arguments
+        lvalue, rvalue = self.__fold(left), self.__fold(right)
+        if opcode == "add" and lvalue == 0:
+            return right
+        if opcode in ("add", "sub", "shl", "shr") and rvalue == 0:
+            return left
+        if opcode in ("mul", "div") and rvalue == 1:
+            return left
+        if opcode == "mul" and lvalue == 1:
+            return right
+        # the other operand is still evaluated if it calls a proc or may trap
+        if opcode == "mul" and ((lvalue == 0 and not self.__has_effect(right)) or
+                                (rvalue == 0 and not self.__has_effect(left))):
+            return 0
+        return None
+
+    # ------------------------------------------------------------------------------#
+    # Operand ordering
+
+    def __need(self, expression: Expression) -> Tuple[int, bool]:
+        """ Returns the number of temps live at once while the expression is
+            evaluated with its operands in order (its Sethi-Ullman number), and
+            whether it calls a proc """
+        if not isinstance(expression, (ExpressionOp, ExpressionProcCall)):
+            return 1, False
+        key = id(expression)
+        if key not in self.__needs:
+            self.__label_tree(expression)
+        return self.__needs[key]
+
+    def __label_tree(self, expression: Expression) -> None:
+        """ Labels the operations and calls of the tree that are not labeled yet,
+            operands first, with an explicit stack """
+        needs = self.__needs
+        stack = [(expression, False)]
+        while stack:
+            node, ready = stack.pop()
+            if ready:
+                needs[id(node)] = self.__label(node)
+                continue
+            stack.append((node, True))
+            operands = node.get_params() if isinstance(node, ExpressionProcCall) else node.arguments
+            for subexpr in operands:
+                if isinstance(subexpr, (ExpressionOp, ExpressionProcCall)) and id(subexpr) not in needs:
+                    stack.append((subexpr, False))
+
+    def __label(self, expression: Expression) -> Tuple[int, bool]:
+        """ Labels an operation or a call whose operands are labeled, operations
+            folded to a constant need a single temp, the identities of __simplify
+            are left out as they can only lower the count """
+        needs = self.__needs
+        leaf = (1, False)
+        if isinstance(expression, ExpressionProcCall):
+            # the params are evaluated in order and each keeps its temp until the call
+            need = 1
+            for index, param in enumerate(expression.get_params()):
+                need = max(need, index + needs.get(id(param), leaf)[0])
+            return need, True
+        if expression.operator in self.__macros.operator_map:
+            if self.__fold(expression) is not None:
+                return 1, False
+        elif self.__fold_condition(expression) is not None:
+            return 1, False
+        left, left_calls = needs.get(id(expression.arguments[0]), leaf)
+        if len(expression.arguments) == 1:
+            return left, left_calls
+        right, right_calls = needs.get(id(expression.arguments[1]), leaf)
+        return (left + 1 if left == right else max(left, right)), left_calls or right_calls
+
+    def __operand_order(self, arguments: List[Expression]) -> Tuple[int, int]:
+        """ Returns the indices of the two operands in evaluation order, the one
+            needing more temps first unless a proc call in either could change
+            what the other reads """
+        # a leaf needs a single temp, it never goes first
+        if self.__order_operands and isinstance(arguments[1], (ExpressionOp, ExpressionProcCall)):
+            left, left_calls = self.__need(arguments[0])
+            right, right_calls = self.__need(arguments[1])
+            if right > left and not left_calls and not right_calls:
+                return (1, 0)
+        return (0, 1)
+
     # ------------------------------------------------------------------------------#
     # Convert bool result to int 
 
-    def __bool_assign(self, fresh_temp:str, expression: ExpressionBool, temporary: str) -> None:
+    def __comparison(self, expression: Expression) -> Optional[Tuple[str, List[Expression]]]:
+        """ Returns the operator and the operands if the bool expression is a
+            comparison of ints, possibly negated """
+        negated = False
+        while isinstance(expression, ExpressionOp) and expression.operator == "not":
+            negated = not negated
+            expression = expression.arguments[0]
+        if not isinstance(expression, ExpressionOp) or expression.operator not in self.__macros.set_map:
+            return None
+        if expression.arguments[0].get_type() != BX_TYPE.INT:
+            return None
+        operator = self.__macros.negated_map[expression.operator] if negated else expression.operator
+        return operator, expression.arguments
+
+    def __bool_assign(self, expression: ExpressionBool, temporary: str) -> Iterator:
         """ Adds TAC instrs to convert bool expr result into int """
+        value = self.__fold_condition(expression)
+        if value is not None:
+            self.__emit("const", [int(value)], temporary)
+            return
+        comparison = self.__comparison(expression)
+        if comparison is not None:
+            # a single setcc instead of the branches below
+            operator, arguments = comparison
+            subexpr_targets = [None, None]
+            for index in self.__operand_order(arguments):
+                subexpr_targets[index] = self.__code_state.fresh_temp()
+                yield self.__tmm_expression_parse(arguments[index], subexpr_targets[index])
+            self.__emit(self.__macros.set_map[operator], subexpr_targets, temporary)
+            return
         LTrue = self.__code_state.fresh_label()
         LFalse = self.__code_state.fresh_label()
+        fresh_temp = self.__code_state.fresh_temp()
         self.__emit("const", [0], fresh_temp)
         # if expression is true then transfer 1 to temporary
         # otherwise jmp to false where 0 is assigned above
-        self.__tmm_bool_expression_parse(expression, LTrue, LFalse)
+        yield self.__tmm_bool_expression_parse(expression, LTrue, LFalse)
         self.__emit("label", [LTrue], None)
         self.__emit("const", [1], fresh_temp)
         self.__emit("label", [LFalse], None)
@@ -170,15 +434,14 @@ class AST_to_TAC_Generator:
     # ------------------------------------------------------------------------------#
     # ExpressionProcCall convertor
 
-    def __expression_call(self, expression: ExpressionProcCall, temporary: str) -> None:
+    def __expression_call(self, expression: ExpressionProcCall, temporary: str) -> Iterator:
         """ function that creates TAC for expression call """
         for index, param in enumerate(expression.get_params()):
             temp = self.__code_state.fresh_temp()
             if param.get_type() == BX_TYPE.BOOL:
-                temp2 = self.__code_state.fresh_temp()
-                self.__bool_assign(temp2, param, temp)
+                yield self.__bool_assign(param, temp)
             else:
-                self.__tmm_expression_parse(param, temp)
+                yield self.__tmm_expression_parse(param, temp)
 
             self.__emit(opcode="param", args=[index+1, temp], result=None)
         res = None if expression.get_type() is BX_TYPE.VOID else temporary
@@ -187,8 +450,8 @@ class AST_to_TAC_Generator:
     # ------------------------------------------------------------------------------#
     # Global Muncher
 
-    def __tmm_global_parse(self) -> None:
-        """ parses the global definition and builds its tac """
+    def __tmm_global_parse(self) -> Iterator[dict]:
+        """ parses the global definition and yields its tac """
         self.__code_state.enter_scope()
         # first add all global variables
         # print(self.__code.global_decls())
@@ -201,14 +464,17 @@ class AST_to_TAC_Generator:
                         if isinstance(var.init, ExpressionBool):
                             init_val = int(var.init.value)
                         else: init_val = var.init.value
-                        self.__global_vars.append({"var": "@"+var.variable.name,
-                                                    "init": init_val})
+                        yield {"var": "@"+var.variable.name, "init": init_val}
         # now add all global functions
         for glob_func in self.__code.global_decls():
-            if isinstance(glob_func, DeclProc):
+            if isinstance(glob_func, DeclProc) and glob_func.get_name() in self.__cached:
+                yield self.__cached[glob_func.get_name()]
+            elif isinstance(glob_func, DeclProc):
                 self.__code_state.enter_scope()
                 self.__code_state.enter_new_proc()
-                self.__proc_instructions = []
+                self.__proc_instructions = TacStore()
+                self.__folded = dict()
+                self.__needs = dict()
                 # TODO create example to check that params are computed left -> right
                 args = []
                 for var in glob_func.get_args():
@@ -217,33 +483,97 @@ class AST_to_TAC_Generator:
 
                 # if glob_func.get_name() == "is_odd": 
                     # print(glob_func.get_body())
-                self.__tmm_statement_parse(glob_func.get_body())
+                if self.__scope is not None:
+                    self.__scope.set_proc_return_type(glob_func.get_returntype())
+                walk(self.__tmm_statement_parse(glob_func.get_body(), glob_func.get_args()))
+                if self.__scope is not None:
+                    self.__scope.unset_proc_return_type()
+                    glob_func.check_returns()
                 # if last instr is not ret then add it to simplify CFG analysis
                 # print(glob_func.get_name())
                 # print(self.__proc_instructions)
-                if self.__proc_instructions[-1]["opcode"] != "ret":
+                if not self.__proc_instructions or self.__proc_instructions.opcodes[-1] != RET:
                     self.__emit(opcode="ret", args=[], result=None)
-                self.__global_procs.append({"proc":"@"+glob_func.get_name(),
-                                            "args": args,
-                                            "body": self.__proc_instructions,
-                                            "temps": self.__code_state.get_temps(),
-                                            "labels": self.__code_state.get_labels()})
                 self.__code_state.exit_scope()
+                yield {"proc":"@"+glob_func.get_name(),
+                       "args": args,
+                       "body": self.__proc_instructions,
+                       "temps": self.__code_state.get_temps(),
+                       "labels": self.__code_state.get_labels()}
 
         self.__code_state.exit_scope()
 
     # ------------------------------------------------------------------------------#
     # Statement Muncher
 
-    def __tmm_statement_parse(self, statement) -> None:
-        """ parses the statement and append its tac to proc_instructions """
+    def __tmm_statement_parse(self, statement, args: List[Param] = None) -> Optional[Iterator]:
+        """ parses the statement and append its tac to proc_instructions, returns
+            the walker of the blocks, loops and conditionals
+            args: arguments of the proc whose body is statement (fused mode) """
+        if self.__scope is not None:
+            self.__type_check(statement, args)
+
+        if isinstance(statement, (StatementBlock, StatementWhile, StatementIfElse)):
+            return self.__tmm_compound_parse(statement)
+
+        if isinstance(statement, StatementJump):
+            # print(f"Jump stmt is {statement.keyword}")
+            Ldestination = self.__code_state[statement.keyword]     # get the relevant label for jmp
+            # print(f"Jump stmt destination is {Ldestination}")
+            self.__emit(opcode="jmp", args=[Ldestination], result=None)
+
+        elif isinstance(statement, StatementVardecl):
+            temp = self.__code_state.add_variable(statement.variable.name)
+            expr = statement.init
+            if expr.get_type() == BX_TYPE.BOOL:
+                walk(self.__bool_assign(expression=expr, temporary=temp))
+            else:
+                walk(self.__tmm_expression_parse(expr, temp))
+
+        elif isinstance(statement, StatementEval):
+            temp = self.__code_state.fresh_temp()
+            expr = statement.expression
+            if expr.get_type() == BX_TYPE.BOOL:
+                walk(self.__bool_assign(expression=expr, temporary=temp))
+            else:
+                walk(self.__tmm_expression_parse(expr, temp))
+
+        elif isinstance(statement, StatementAssign):
+            temporary = self.__code_state.fetch_temp(statement.lvalue.name)
+            if statement.rvalue.get_type() == BX_TYPE.INT:
+                walk(self.__tmm_expression_parse(statement.rvalue, temporary))
+            elif statement.rvalue.get_type() == BX_TYPE.BOOL:
+                walk(self.__bool_assign(statement.rvalue, temporary))
+
+        elif isinstance(statement, StatementReturn):
+            expr = statement.expression
+            if expr is None:
+                self.__emit(opcode="ret", args=[], result=None)
+            elif isinstance(expr, ExpressionVar):
+                temp = self.__code_state.fetch_temp(expr.name)
+                self.__emit(opcode="ret", args=[temp], result=None)
+            else:
+                temporary = self.__code_state.fresh_temp()
+                if expr.get_type() == BX_TYPE.BOOL:
+                    walk(self.__bool_assign(expression=expr, temporary=temporary))
+                else:
+                    walk(self.__tmm_expression_parse(expr, temporary))
+                self.__emit(opcode="ret", args=[temporary], result=None)
+
+        else:       # should never reach here
+            raise RuntimeError(f'Got unexpected statement {statement}')
+        self.__code_state.release_temps()
 
+    def __tmm_compound_parse(self, statement: Statement) -> Iterator:
+        """ walker building the tac of a block, loop or conditional """
         if isinstance(statement, StatementBlock):
             self.__code_state.enter_scope()
             for stmt in statement.statements:
                 # print(stmt)
-                self.__tmm_statement_parse(stmt)
+                yield self.__tmm_statement_parse(stmt)
             self.__code_state.exit_scope() 
+            if self.__scope is not None:
+                self.__scope.delete_scope()
 
         elif isinstance(statement, StatementWhile):
             Lhead = self.__code_state.fresh_label()
@@ -253,11 +583,12 @@ class AST_to_TAC_Generator:
             self.__code_state.enter_loop(Lhead, Lend)
             # print(f'while head label is {Lhead}')
             self.__emit(opcode="label", args=[Lhead], result=None)
-            self.__tmm_bool_expression_parse(statement.condition, Lbody, Lend)
+            yield self.__tmm_bool_expression_parse(statement.condition, Lbody, Lend)
+            self.__code_state.release_temps()
             # treat the body of while loop
             # print(f'while body label is {Lbody}')
             self.__emit(opcode="label", args=[Lbody], result=None)
-            self.__tmm_statement_parse(statement.block)
+            yield self.__tmm_statement_parse(statement.block)
             self.__emit(opcode="jmp", args=[Lhead], result=None)
             # treat while loop ending
             # print(f'while end label is {Lend}')
@@ -269,73 +600,29 @@ class AST_to_TAC_Generator:
             Lfalse = self.__code_state.fresh_label()
             Lover = self.__code_state.fresh_label()
             # treat condition of if stmt
-            self.__tmm_bool_expression_parse(statement.condition, Ltrue, Lfalse)
+            yield self.__tmm_bool_expression_parse(statement.condition, Ltrue, Lfalse)
+            self.__code_state.release_temps()
             # print(f'if true label is {Ltrue}')
             self.__emit(opcode="label", args=[Ltrue], result=None)
             # treat block of if stmt
-            self.__tmm_statement_parse(statement.block)
+            yield self.__tmm_statement_parse(statement.block)
             # print(f'if over label is {Lover}')
             self.__emit(opcode="jmp", args=[Lover], result=None)
             # print(f'if false label is {Lfalse}')
             self.__emit(opcode="label", args=[Lfalse], result=None)
             # treat else part if exists
-            if statement.if_rest is not None: self.__tmm_statement_parse(statement.if_rest)
+            if statement.if_rest is not None: yield self.__tmm_statement_parse(statement.if_rest)
             self.__emit(opcode="label", args=[Lover], result=None)
 
-        elif isinstance(statement, StatementJump):
-            # print(f"Jump stmt is {statement.keyword}")
-            Ldestination = self.__code_state[statement.keyword]     # get the relevant label for jmp
-            # print(f"Jump stmt destination is {Ldestination}")
-            self.__emit(opcode="jmp", args=[Ldestination], result=None)
-
-        elif isinstance(statement, StatementVardecl):
-            temp = self.__code_state.add_variable(statement.variable.name)
-            expr = statement.init
-            if expr.get_type() == BX_TYPE.BOOL:
-                self.__bool_assign(fresh_temp=temp, expression=expr, temporary=temporary)
-            else:
-                self.__tmm_expression_parse(expr, temp)
-
-        elif isinstance(statement, StatementEval):
-            temp = self.__code_state.fresh_temp()
-            expr = statement.expression
-            if expr.get_type() == BX_TYPE.BOOL:
-                self.__bool_assign(fresh_temp=temp, expression=expr, temporary=temporary)
-            else:
-                self.__tmm_expression_parse(expr, temp)
-
-        elif isinstance(statement, StatementAssign):
-            temporary = self.__code_state.fetch_temp(statement.lvalue.name)
-            if statement.rvalue.get_type() == BX_TYPE.INT:
-                self.__tmm_expression_parse(statement.rvalue, temporary)
-            elif statement.rvalue.get_type() == BX_TYPE.BOOL:
-                temp = self.__code_state.fresh_temp()
-                self.__bool_assign(temp, statement.rvalue, temporary)
-
-        elif isinstance(statement, StatementReturn):
-            expr = statement.expression
-            if expr is None:
-                self.__emit(opcode="ret", args=[], result=None)
-            elif isinstance(expr, ExpressionVar):
-                temp = self.__code_state.fetch_temp(expr.name)
-                self.__emit(opcode="ret", args=[temp], result=None)
-            else:
-                temporary = self.__code_state.fresh_temp()
-                if expr.get_type() == BX_TYPE.BOOL:
-                    temp = self.__code_state.fresh_temp()
-                    self.__bool_assign(fresh_temp=temp, expression=expr, temporary=temporary)
-                else:
-                    self.__tmm_expression_parse(expr, temporary)
-                self.__emit(opcode="ret", args=[temporary], result=None)
-
         else:       # should never reach here
             raise RuntimeError(f'Got unexpected statement {statement}')
 
     # ------------------------------------------------------------------------------#
     # Int Expression Muncher
 
-    def __tmm_expression_parse(self, expression: Expression, temporary: str) -> None:
-        """ parses the expression and builds its tac """
+    def __tmm_expression_parse(self, expression: Expression, temporary: str) -> Optional[Iterator]:
+        """ parses the expression and builds its tac, returns the walker of
+            the operations that are not folded and of the calls """
 
         if expression.get_type() == BX_TYPE.BOOL:
             raise RuntimeError(f'Expression must have type INT or VOID but has type {expression.get_type()}')
@@ -349,30 +636,45 @@ class AST_to_TAC_Generator:
             if temp != temporary:
                 self.__emit("copy", [temp], temporary)
 
-        elif isinstance(expression, ExpressionOp) and len(expression.arguments) == 1:
+        elif isinstance(expression, ExpressionOp) and self.__fold(expression) is not None:
+            self.__emit("const", [self.__fold(expression)], temporary)
+
+        else:
+            return self.__tmm_operation_parse(expression, temporary)
+
+    def __tmm_operation_parse(self, expression: Expression, temporary: str) -> Iterator:
+        """ walker building the tac of an operation or a call """
+        if isinstance(expression, ExpressionOp) and len(expression.arguments) == 1:
             opcode = self.__macros.operator_map[expression.operator]
             subexpr_target = self.__code_state.fresh_temp()
             subexpr = expression.arguments[0]
             if subexpr.get_type() == BX_TYPE.BOOL:
-                self.__bool_assign(fresh_temp=subexpr_target, expression=subexpr, temporary=temporary)
+                yield self.__bool_assign(expression=subexpr, temporary=subexpr_target)
             else:
-                self.__tmm_expression_parse(subexpr, subexpr_target)
+                yield self.__tmm_expression_parse(subexpr, subexpr_target)
             self.__emit(opcode, [subexpr_target], temporary)
 
         elif isinstance(expression, ExpressionOp) and len(expression.arguments) == 2:
             opcode = self.__macros.operator_map[expression.operator]
-            subexpr_targets = []
-            for subexpr in expression.arguments: 
-                target = self.__code_state.fresh_temp()
-                subexpr_targets.append(target)
+            simplified = self.__simplify(opcode, expression.arguments) if self.__fold_constants else None
+            if isinstance(simplified, int):
+                self.__emit("const", [simplified], temporary)
+                return
+            if simplified is not None:
+                yield self.__tmm_expression_parse(simplified, temporary)
+                return
+            subexpr_targets = [None, None]
+            for index in self.__operand_order(expression.arguments):
+                subexpr = expression.arguments[index]
+                target = subexpr_targets[index] = self.__code_state.fresh_temp()
                 if subexpr.get_type() == BX_TYPE.BOOL:
-                    self.__bool_assign(fresh_temp=target, expression=subexpr, temporary=temporary)
+                    yield self.__bool_assign(expression=subexpr, temporary=target)
                 else:
-                    self.__tmm_expression_parse(subexpr, target)
+                    yield self.__tmm_expression_parse(subexpr, target)
             self.__emit(opcode, subexpr_targets, temporary)
 
         elif isinstance(expression, ExpressionProcCall):
-            self.__expression_call(expression=expression, temporary=temporary)
+            yield self.__expression_call(expression=expression, temporary=temporary)
 
         else:       # should never reach here
             raise RuntimeError(f'Got unexpected expression {expression}')
@@ -380,13 +682,15 @@ class AST_to_TAC_Generator:
     # ------------------------------------------------------------------------------#
     # Bool expression Muncher
 
-    def __tmm_bool_expression_parse(self, expression: Expression, Ltrue: str, Lfalse: str) -> None:
-        """ parses the bool expression and builds its tac """
+    def __tmm_bool_expression_parse(self, expression: Expression, Ltrue: str, Lfalse: str) -> Optional[Iterator]:
+        """ parses the bool expression and builds its tac, returns the walker
+            of the operations that are not folded and of the calls """
         if expression.get_type() != BX_TYPE.BOOL:
             raise RuntimeError(f'Expression must have type BOOL but has type {expression.get_type()}')
 
-        if isinstance(expression, ExpressionBool):
-            if expression.value: 
+        value = self.__fold_condition(expression)
+        if value is not None:       # literals and conditions known at compile time
+            if value: 
                 self.__emit("jmp", [Ltrue], None)
             else:
                 self.__emit("jmp", [Lfalse], None)
@@ -396,33 +700,40 @@ class AST_to_TAC_Generator:
             self.__emit("jz", [temp, Lfalse], None)
             self.__emit("jmp", [Ltrue], None)
 
-        elif isinstance(expression, ExpressionOp):
-            if expression.operator == "logical-and":
+        else:
+            return self.__tmm_bool_operation_parse(expression, Ltrue, Lfalse)
+
+    def __tmm_bool_operation_parse(self, expression: Expression, Ltrue: str, Lfalse: str) -> Iterator:
+        """ walker building the tac of a bool operation or call """
+        if isinstance(expression, ExpressionOp):
+            if expression.operator in ("logical-and", "logical-or") and \
+                    self.__fold_condition(expression.arguments[0]) is (expression.operator == "logical-and"):
+                # true && e and false || e only depend on e
+                yield self.__tmm_bool_expression_parse(expression.arguments[1], Ltrue, Lfalse)
+
+            elif expression.operator == "logical-and":
                 Lmid = self.__code_state.fresh_label()
-                self.__tmm_bool_expression_parse(expression.arguments[0], Lmid, Lfalse)
+                yield self.__tmm_bool_expression_parse(expression.arguments[0], Lmid, Lfalse)
                 self.__emit("label", [Lmid], None)
-                self.__tmm_bool_expression_parse(expression.arguments[1], Ltrue, Lfalse)
+                yield self.__tmm_bool_expression_parse(expression.arguments[1], Ltrue, Lfalse)
 
             elif expression.operator == "logical-or":
                 Lmid = self.__code_state.fresh_label()
-                self.__tmm_bool_expression_parse(expression.arguments[0], Ltrue, Lmid)
+                yield self.__tmm_bool_expression_parse(expression.arguments[0], Ltrue, Lmid)
                 self.__emit("label", [Lmid], None)
-                self.__tmm_bool_expression_parse(expression.arguments[1], Ltrue, Lfalse)
+                yield self.__tmm_bool_expression_parse(expression.arguments[1], Ltrue, Lfalse)
 
             elif expression.operator == "not":
-                self.__tmm_bool_expression_parse(expression.arguments[0], Lfalse, Ltrue)
+                yield self.__tmm_bool_expression_parse(expression.arguments[0], Lfalse, Ltrue)
 
             elif expression.operator in self.__macros.jump_map:
-                subexpr_targets = [] 
-                for subexpr in expression.arguments: 
-                    target = self.__code_state.fresh_temp()
-                    subexpr_targets.append(target)
-                    self.__tmm_expression_parse(subexpr, target)
-                temp_result = self.__code_state.fresh_temp()
-                #e1 - e2 since assembly second argument is subtracted from first
-                self.__emit("sub", subexpr_targets, temp_result)
+                subexpr_targets = [None, None]
+                for index in self.__operand_order(expression.arguments):
+                    subexpr_targets[index] = self.__code_state.fresh_temp()
+                    yield self.__tmm_expression_parse(expression.arguments[index], subexpr_targets[index])
+                # jcc e1, e2 compares e1 to e2
                 self.__emit(self.__macros.jump_map[expression.operator], 
-                            [temp_result, Ltrue], None)
+                            subexpr_targets + [Ltrue], None)
                 self.__emit("jmp", [Lfalse], None)
 
             else:       # should never reach here
@@ -430,7 +741,7 @@ class AST_to_TAC_Generator:
 
         elif isinstance(expression, ExpressionProcCall):
             temporary = self.__code_state.fresh_temp()
-            self.__expression_call(expression, temporary)
+            yield self.__expression_call(expression, temporary)
             self.__emit("jz", [temporary, Lfalse], None)
             self.__emit("jmp", [Ltrue], None)
 
@@ -442,26 +753,59 @@ class AST_to_TAC_Generator:
 # Main functions
 # ------------------------------------------------------------------------------#
 
-import argparse
-import bx2front
-
-def ast_to_tac(ast: Prog) -> json:
+def ast_to_tac(ast: Prog, fused: bool = False, cache = None, fold: bool = True, order: bool = True,
+               recycle: bool = True) -> json:
+    """ Returns the tac of the whole program, see iter_tac """
+    return list(iter_tac(ast, fused, cache, fold, order, recycle))
+
+def iter_tac(ast: Prog, fused: bool = False, cache = None, fold: bool = True, order: bool = True,
+             recycle: bool = True) -> Iterator[dict]:
+    """ Yields the tac of the global variables, then of each proc as soon as
+        it is generated
+        fused: type check the proc bodies while generating tac,
+               the ast must only have passed global_type_check
+        cache: proc_cache.ProcCache, procs found in it are neither type checked
+               nor generated again, requires fused
+        fold: evaluate constant expressions and conditions
+        order: evaluate the operands needing more temps first
+        recycle: reuse the temps of finished statements and closed scopes
+        the cache must be keyed by the level these flags come from, see
+        proc_cache.ProcCache """
     if ast is None: raise RuntimeError("Could not compile ast")          # exit if error occured while parsing 
     
-    tac_ = AST_to_TAC_Generator(ast)   # convert ast code to json
+    cached = dict()
+    if cache is not None:
+        for decl in ast.global_decls():
+            if isinstance(decl, DeclProc):
+                proc_tac = cache.get(decl.get_name(), "tac")
+                if proc_tac is not None:
+                    cached[decl.get_name()] = proc_tac
+
+    tac_ = AST_to_TAC_Generator(ast, ast.get_scope() if fused else None, cached, fold, order,
+                                recycle)   # convert ast code to json
+    for decl in tac_.declarations():
+        if cache is not None and "proc" in decl and decl["proc"][1:] not in cached:
+            cache.put(decl["proc"][1:], "tac", decl)
+        yield decl
+    if fused:
+        print("type_check done")
     print("tac created")
-    tac_instr = tac_.return_tac_instr()
-    return tac_instr
 
-def write_tacfile(fname: str, tac_instr: List[dict]) -> None:
+def write_tacfile(fname: str, tac_instr: Iterable[dict]) -> None:
     """ Writes a tac json to the system """
+    for _ in stream_tacfile(fname, tac_instr):
+        pass
+
+def stream_tacfile(fname: str, tac_instr: Iterable[dict]) -> Iterator[dict]:
+    """ Writes a tac json to the system while passing the declarations on """
     tac_filename = fname[:-2] + 'tac.json'   # get new file name
-    # print(tac_instr)
-    with open(tac_filename, 'w') as fp:         # save the file
-        json.dump(tac_instr, fp, indent=3) #, indent=3
+    yield from write_procs(tac_filename, tac_instr)
     print(f"tac json file {tac_filename} written")
 
 if __name__=="__main__":
+    import argparse
+    import bx2front
+
     parser = argparse.ArgumentParser(description='Get method for conversion and filetype.')
     parser.add_argument('filename', metavar="FILE", type=str, nargs=1)
     args = parser.parse_args(sys.argv[1:])
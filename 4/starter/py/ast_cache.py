@@ -0,0 +1,32 @@
+"""
+    On disk cache of the ASTs built by bx2front.get_ast.
+
+    An entry is keyed by the source text, the front end sources and whether
+    the proc bodies were type checked (the fused mode leaves them to ast2tac),
+    so builds of an unchanged file with different flags share one entry and
+    skip the lexer, the parser and the type checks.
+"""
+
+import os
+import hashlib
+from bxast import Prog
+from proc_cache import compiler_fingerprint, load_entry, store_entry
+
+# modules whose code decides the tree
+_FRONTEND_MODULES = ("bxast.py", "macros.py", "scanner.py", "dfa_scanner.py", "my_parser.py", "rd_parser.py", "bx2front.py")
+
+def _path(directory: str, filename: str, checked: bool) -> str:
+    h = hashlib.sha256(compiler_fingerprint(_FRONTEND_MODULES))
+    with open(filename, "rb") as fp:
+        h.update(fp.read())
+    h.update(b"\0checked" if checked else b"\0global")
+    return os.path.join(directory, f"{h.hexdigest()}.ast.pickle")
+
+def load_ast(directory: str, filename: str, checked: bool) -> Prog:
+    """ Returns the cached tree of the file or None """
+    return load_entry(_path(directory, filename, checked))
+
+def store_ast(directory: str, filename: str, checked: bool, ast: Prog) -> None:
+    """ Stores the tree of the file, after it passed the checks """
+    os.makedirs(directory, exist_ok=True)
+    store_entry(_path(directory, filename, checked), ast)
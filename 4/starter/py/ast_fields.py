@@ -0,0 +1,17 @@
+"""
+    Attributes of the AST nodes, for walking and comparing trees whatever
+    the nodes store them in.
+"""
+
+def node_fields(node) -> dict:
+    """ Returns the attributes of an object, including those stored in __slots__ """
+    if hasattr(node, "__dict__"):
+        return dict(vars(node))
+    fields = {}
+    for cls in type(node).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            if name.startswith("__"):
+                name = f"_{cls.__name__.lstrip('_')}{name}"
+            if hasattr(node, name):
+                fields[name] = getattr(node, name)
+    return fields
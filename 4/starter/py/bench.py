@@ -0,0 +1,943 @@
+"""
+    Benchmarks for the compiler.
+    Usage: python3 bench.py <benchmark> [--runs N]
+"""
+
+import sys
+import os
+import glob
+import time
+import argparse
+import subprocess
+from typing import List, Tuple
+from ast_fields import node_fields
+from programs import (make_program, make_nested_program, make_temp_program, make_frame_program,
+                      make_block_program, make_else_chain_program, make_constant_program,
+                      make_deep_program, order_live_temps, procs_of, make_cfg,
+                      FIZZBUZZ_LOOP, COLLATZ_LOOP, BOOL_LOOP)
+
+PY_DIR = os.path.dirname(os.path.abspath(__file__))
+TACRUN_DIR = os.path.join(PY_DIR, "..", "tacrun")
+
+# ------------------------------------------------------------------------------#
+# Helpers
+# ------------------------------------------------------------------------------#
+
+def time_process(cmd: List[str], cwd: str = PY_DIR) -> float:
+    """ Runs the command and returns its wall clock time in ms """
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+def report(name: str, timings: List[float]) -> None:
+    """ Prints min and mean of the timings """
+    print(f"{name:<32} min {min(timings):8.2f} ms   mean {sum(timings)/len(timings):8.2f} ms")
+
+# ------------------------------------------------------------------------------#
+# Benchmarks
+# ------------------------------------------------------------------------------#
+
+def bench_startup(runs: int) -> None:
+    """ Cold (no LR table cache) vs warm startup of both parsers """
+    tac_file = os.path.join(PY_DIR, "..", "tac_examples", "fib.tac")
+    front_ends = {
+        "my_parser": ([sys.executable, "-c", "import my_parser"], PY_DIR),
+        "tacrun": ([sys.executable, "tacrun.py", "--no-exec", tac_file], TACRUN_DIR),
+    }
+    for name, (cmd, cwd) in front_ends.items():
+        caches = os.path.join(cwd, "__pycache__", "*.lrtab-*.pickle")
+        cold, warm = [], []
+        for _ in range(runs):
+            for f in glob.glob(caches):
+                os.remove(f)
+            cold.append(time_process(cmd, cwd))
+            warm.append(time_process(cmd, cwd))
+        report(f"{name} cold", cold)
+        report(f"{name} warm", warm)
+
+def import_time(cmd: List[str]) -> float:
+    """ Runs the command under -X importtime and returns the time spent importing in ms """
+    err = subprocess.run([sys.executable, "-X", "importtime", *cmd], cwd=PY_DIR, check=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    total = 0
+    for line in err.splitlines():
+        # top level imports, their cumulative time includes the nested ones
+        if line.startswith("import time:") and not line.startswith("import time: self"):
+            name = line.split("|")[2]
+            if not name.startswith("  "):
+                total += int(line.split("|")[1])
+    return total / 1000
+
+def bench_imports(runs: int) -> None:
+    """ Import time and wall clock time of bxcc.py per mode """
+    import shutil
+    import tempfile
+
+    work = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work, "fizzbuzz.bx")
+        shutil.copy(os.path.join(PY_DIR, "..", "examples", "fizzbuzz.bx"), source)
+        subprocess.run([sys.executable, "bxcc.py", source, "--keep-tac", "--stop-tac"], cwd=PY_DIR,
+                       check=True, stdout=subprocess.DEVNULL)
+        modes = {
+            "--compile-tac": [os.path.join(work, "fizzbuzz.tac.json"), "--compile-tac"],
+            "--stop-tac": [source, "--stop-tac"],
+            "--stop-tac rd/dfa": [source, "--stop-tac", "--rd-parser", "--dfa-lexer"],
+            "full build": [source],
+        }
+        for name, flags in modes.items():
+            imports, wall = [], []
+            for _ in range(runs):
+                imports.append(import_time(["bxcc.py", *flags]))
+                wall.append(time_process([sys.executable, "bxcc.py", *flags]))
+            report(f"{name} imports", imports)
+            report(f"{name} wall", wall)
+    finally:
+        shutil.rmtree(work)
+
+LEXER_PROBE = """
+import time
+start = time.perf_counter()
+import ply.lex as lex
+import scanner
+lexer = lex.lex(module=scanner, tabcache={tabcache})
+lexer.input("def main() {{ print(42); }}")
+lexer.token()
+print((time.perf_counter() - start) * 1000)
+"""
+
+def bench_lexer(runs: int) -> None:
+    """ Import-to-first-token latency of the scanner without and with the lexer spec cache """
+    for tabcache in (False, True):
+        # prime the cache so that the cached runs are warm
+        subprocess.run([sys.executable, "-c", LEXER_PROBE.format(tabcache=tabcache)],
+                       cwd=PY_DIR, check=True, stdout=subprocess.DEVNULL)
+        timings = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", LEXER_PROBE.format(tabcache=tabcache)],
+                                 cwd=PY_DIR, check=True, capture_output=True, text=True).stdout
+            timings.append(float(out))
+        report("scanner " + ("cached" if tabcache else "uncached"), timings)
+
+def bench_dfa_lexer(runs: int) -> None:
+    """ Tokens/sec of ply.lex and the DFA scanner, see tests/test_dfa_scanner.py """
+    import ply.lex as lex
+    import scanner
+    import dfa_scanner
+
+    ply_lexer = lex.lex(module=scanner, tabcache=True)
+    def ply_tokens(data: str) -> list:
+        ply_lexer.input(data)
+        ply_lexer.lineno = 1
+        return [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in ply_lexer]
+
+    data = make_program(200, 50)
+    num_tokens = len(dfa_scanner.tokenize(data))
+    for name, scan in (("ply.lex", ply_tokens), ("dfa_scanner", dfa_scanner.tokenize)):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            scan(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        report(name, timings)
+        print(f"{'':<32} {num_tokens / min(timings) * 1000:,.0f} tokens/sec")
+
+def bench_parse(runs: int) -> None:
+    """ Parse throughput of ply.yacc and rd_parser, see tests/test_rd_parser.py """
+    import my_parser
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    def ply_parse(data: str, scan):
+        scan.lineno = 1
+        return my_parser.parser.parse(data, lexer=scan, tracking=True)
+    def rd_parse(data: str, scan):
+        scan.lineno = 1
+        return RDParser(scan).parse(data)
+
+    data = make_program(100, 50)
+    variants = {
+        "ply.yacc + ply.lex": (ply_parse, my_parser.lexer),
+        "ply.yacc + dfa_scanner": (ply_parse, DFALexer()),
+        "rd_parser + ply.lex": (rd_parse, my_parser.lexer),
+        "rd_parser + dfa_scanner": (rd_parse, DFALexer()),
+    }
+    for name, (parse, scan) in variants.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            parse(data, scan)
+            timings.append((time.perf_counter() - start) * 1000)
+        report(name, timings)
+        print(f"{'':<32} {len(data) / min(timings) * 1000 / 1024:,.0f} KiB/sec")
+
+def count_nodes(node) -> Tuple[int, int]:
+    """ Returns the number of AST nodes and statements below node """
+    import bxast
+    nodes = statements = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, bxast.Node):
+            nodes += 1
+            statements += isinstance(node, bxast.Statement)
+            stack.extend(v for v in node_fields(node).values() if isinstance(v, (list, bxast.Node)))
+    return nodes, statements
+
+def bench_ast_memory(runs: int) -> None:
+    """ Peak traced memory while building the AST of a program with ~100k statements """
+    import gc
+    import tracemalloc
+    import my_parser
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    data = make_program(200, 50)
+    for name, parse in (("ply.yacc", lambda: my_parser.parser.parse(data, lexer=DFALexer(), tracking=True)),
+                        ("rd_parser", lambda: RDParser(DFALexer()).parse(data))):
+        gc.collect()
+        tracemalloc.start()
+        ast = parse()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        nodes, statements = count_nodes(ast)
+        print(f"{name:<32} peak {peak / 2**20:8.1f} MiB   retained {retained / 2**20:8.1f} MiB")
+        print(f"{'':<32} {nodes:,} nodes, {statements:,} statements, {retained / nodes:.0f} bytes/node")
+        del ast
+
+def bench_scopes(runs: int) -> None:
+    """ Type checking and TAC generation time on deeply nested blocks """
+    import io
+    import contextlib
+    import ast2tac
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    for depth in (10, 50, 200):
+        data = make_nested_program(depth, 5000)
+        check, tac = [], []
+        for _ in range(runs):
+            ast = RDParser(DFALexer()).parse(data)
+            start = time.perf_counter()
+            ast.global_type_check()
+            ast.type_check()
+            check.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ast2tac.ast_to_tac(ast)
+            tac.append((time.perf_counter() - start) * 1000)
+        report(f"type_check depth {depth}", check)
+        report(f"ast_to_tac depth {depth}", tac)
+
+def bench_fused(runs: int) -> None:
+    """ Separate type_check and tac generation walks vs the fused walk, see
+        tests/test_fused.py """
+    import io
+    import contextlib
+    import ast2tac
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    data = make_program(200, 50)
+    timings = {False: [], True: []}
+    for _ in range(runs):
+        for fused in (False, True):
+            ast = RDParser(DFALexer()).parse(data)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ast.global_type_check()
+                if not fused:
+                    ast.type_check()
+                ast2tac.ast_to_tac(ast, fused)
+            timings[fused].append((time.perf_counter() - start) * 1000)
+    report("type_check + ast_to_tac", timings[False])
+    report("fused", timings[True])
+
+def bench_parallel_check(runs: int) -> None:
+    """ Proc type checking across worker counts, see tests/test_parallel_check.py """
+    import bx2front
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    data = make_program(400, 50)
+    for jobs in (1, 2, 4, 8):
+        timings = []
+        for _ in range(runs):
+            ast = RDParser(DFALexer()).parse(data)
+            ast.global_type_check()
+            start = time.perf_counter()
+            if jobs > 1:
+                bx2front.parallel_type_check(ast, jobs)
+            else:
+                ast.type_check()
+            timings.append((time.perf_counter() - start) * 1000)
+        report(f"type_check jobs={jobs}", timings)
+
+def bench_ast_cache(runs: int) -> None:
+    """ get_ast without the AST cache, storing into it and loading from it, see
+        tests/test_ast_cache.py """
+    import io
+    import shutil
+    import tempfile
+    import contextlib
+    import bx2front
+
+    work = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work, "prog.bx")
+        with open(source, "w") as fp:
+            fp.write(make_program(200, 50))
+        cache_dir = os.path.join(work, "cache")
+        timings = {"no cache": [], "cold cache": [], "warm cache": []}
+        for _ in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            for name, directory in (("no cache", None), ("cold cache", cache_dir), ("warm cache", cache_dir)):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    bx2front.get_ast(source, True, True, cache_dir=directory)
+                timings[name].append((time.perf_counter() - start) * 1000)
+        for name, timing in timings.items():
+            report(f"get_ast {name}", timing)
+    finally:
+        shutil.rmtree(work)
+
+def bench_incremental(runs: int) -> None:
+    """ Builds with the per proc cache: cold, unchanged, and after editing one
+        proc, see tests/test_proc_cache.py """
+    import shutil
+    import tempfile
+
+    num_procs = 1000
+    work = tempfile.mkdtemp()
+    try:
+        cache_dir = os.path.join(work, "cache")
+        source = os.path.join(work, "prog.bx")
+        program = make_program(num_procs, 5)
+        def build(text: str, *flags: str) -> float:
+            with open(source, "w") as fp:
+                fp.write(text)
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "bxcc.py", source, *flags], cwd=PY_DIR,
+                                 check=True, capture_output=True, text=True).stdout
+            elapsed = (time.perf_counter() - start) * 1000
+            hits = [line for line in out.splitlines() if line.startswith("proc cache")]
+            print(f"{'':<32} " + ", ".join(line[len("proc cache "):] for line in hits))
+            return elapsed
+
+        cold, warm, edited = [], [], []
+        for run in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(build(program, "--cache-dir", cache_dir))
+            warm.append(build(program, "--cache-dir", cache_dir))
+            # edit the body of a single proc in the middle of the file
+            changed = program.replace(f"def p{num_procs // 2}(a, b : int) : int {{",
+                                      f"def p{num_procs // 2}(a, b : int) : int {{ a = a + {run + 1};")
+            edited.append(build(changed, "--cache-dir", cache_dir))
+        report("cold cache", cold)
+        report("unchanged", warm)
+        report("one proc edited", edited)
+    finally:
+        shutil.rmtree(work)
+
+def bench_tac_store(runs: int) -> None:
+    """ Memory and scan throughput of the TacStore vs the list of dicts form on
+        ~1M instructions, see tests/test_tac_store.py """
+    import gc
+    import io
+    import json
+    import contextlib
+    import tracemalloc
+    import ast2tac
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    from tac_store import OPCODE_IDS, proc_to_json, proc_from_json
+
+    ast = RDParser(DFALexer()).parse(make_program(360, 50))
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast.global_type_check()
+        ast.type_check()
+        tac = ast2tac.ast_to_tac(ast)
+    del ast
+    # both forms are built from the same text, so neither shares strings with the other
+    text = json.dumps([proc_to_json(decl) for decl in tac])
+    del tac
+    instrs = sum(len(decl["body"]) for decl in json.loads(text) if "proc" in decl)
+
+    def retained(build):
+        gc.collect()
+        tracemalloc.start()
+        value = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return value, size
+    dicts, dicts_size = retained(lambda: json.loads(text))
+    stores, stores_size = retained(lambda: [proc_from_json(decl) for decl in json.loads(text)])
+    print(f"{instrs:,} instructions")
+    print(f"{'list of dicts':<32} {dicts_size / 2**20:8.1f} MiB   {dicts_size / instrs:6.1f} bytes/instr")
+    print(f"{'TacStore':<32} {stores_size / 2**20:8.1f} MiB   {stores_size / instrs:6.1f} bytes/instr")
+
+    # what the CFG passes do most: find the jumps and the temporaries they read
+    jccs = {"jz", "jnz", "jl", "jle", "jnl", "jnle", "je", "jne", "jnge", "jng", "jg", "jge"}
+    jcc_ids = frozenset(OPCODE_IDS[opcode] for opcode in jccs)
+    def scan_dicts():
+        temps = set()
+        for decl in dicts:
+            if "proc" in decl:
+                for instr in decl["body"]:
+                    if instr["opcode"] in jccs:
+                        temps.add(instr["args"][0])
+        return temps
+    def scan_stores():
+        temps = set()
+        for decl in stores:
+            if "proc" in decl:
+                store = decl["body"]
+                operands, args1 = store.operands, store.args1
+                for index, opcode in enumerate(store.opcodes):
+                    if opcode in jcc_ids:
+                        temps.add(operands[args1[index]])
+        return temps
+    timings = {"list of dicts": [], "TacStore": []}
+    for _ in range(runs):
+        for name, scan in (("list of dicts", scan_dicts), ("TacStore", scan_stores)):
+            start = time.perf_counter()
+            scan()
+            timings[name].append((time.perf_counter() - start) * 1000)
+    for name, timing in timings.items():
+        report(f"jcc scan {name}", timing)
+
+def bench_temps(runs: int) -> None:
+    """ Phases and end to end compile time of a temporary heavy program """
+    import io
+    import json
+    import shutil
+    import tempfile
+    import contextlib
+    import ast2tac
+    import tac_cfopt
+    import tac2x64
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    from tac_store import proc_to_json
+
+    data = make_temp_program(200, 20)
+    phases = {"ast_to_tac": [], "cfg": [], "x64": [], "write tac.json": []}
+    for _ in range(runs):
+        ast = RDParser(DFALexer()).parse(data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ast.global_type_check()
+            ast.type_check()
+            start = time.perf_counter()
+            tac = ast2tac.ast_to_tac(ast)
+            phases["ast_to_tac"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            serial = tac_cfopt.get_serialized_tac(tac)
+            phases["cfg"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            tac2x64.tac2x64(serial).get_asm_instr()
+            phases["x64"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            json.dumps([proc_to_json(decl) for decl in tac], indent=3)
+            phases["write tac.json"].append((time.perf_counter() - start) * 1000)
+    temps = sum(len(decl["temps"]) for decl in tac if "proc" in decl)
+    instrs = sum(len(decl["body"]) for decl in tac if "proc" in decl)
+    print(f"{temps:,} temporaries, {instrs:,} instructions")
+    for name, timing in phases.items():
+        report(name, timing)
+
+    work = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work, "temps.bx")
+        with open(source, "w") as fp:
+            fp.write(data)
+        report("bxcc.py --keep-tac", [time_process([sys.executable, "bxcc.py", source, "--keep-tac",
+                                                    "--rd-parser", "--dfa-lexer"]) for _ in range(runs)])
+    finally:
+        shutil.rmtree(work)
+
+def tac_counts(source: str, fold: bool) -> Tuple[int, int, int]:
+    """ Returns the number of tac instructions, temporaries and instructions after
+        the CFG optimizations of a program """
+    import io
+    import contextlib
+    import ast2tac
+    import bx2front
+    import tac_cfopt
+    with contextlib.redirect_stdout(io.StringIO()):
+        tac = ast2tac.ast_to_tac(bx2front.get_ast(source, True, True), fold=fold)
+        serial = tac_cfopt.get_serialized_tac(tac)
+    procs = [decl for decl in tac if "proc" in decl]
+    return (sum(len(decl["body"]) for decl in procs), sum(len(decl["temps"]) for decl in procs),
+            sum(len(decl["body"]) for decl in serial if "proc" in decl))
+
+def bench_folding(runs: int) -> None:
+    """ Instructions saved by folding on the examples, see tests/test_folding.py """
+    totals = [0] * 6
+    print(f"{'':<24} {'tac':>15} {'temps':>15} {'after cfg':>15}")
+    for source in sorted(glob.glob(os.path.join(PY_DIR, "..", "examples", "*.bx"))):
+        counts = tac_counts(source, False) + tac_counts(source, True)
+        totals = [total + count for total, count in zip(totals, counts)]
+        print(f"{os.path.basename(source):<24} " +
+              " ".join(f"{counts[i]:>6} -> {counts[i + 3]:>5}" for i in range(3)))
+    print(f"{'total':<24} " + " ".join(f"{totals[i]:>6} -> {totals[i + 3]:>5}" for i in range(3)))
+
+def asm_instructions(asm_file: str) -> int:
+    """ Returns the number of instructions in an assembly file """
+    with open(asm_file) as fp:
+        lines = [line.strip() for line in fp]
+    return sum(1 for line in lines if line and not line.startswith(("/*", ".")) and not line.endswith(":"))
+
+def bench_branches(runs: int) -> None:
+    """ Code size and run time of loop heavy programs, whose conditions are comparisons """
+    import shutil
+    import tempfile
+
+    work = tempfile.mkdtemp()
+    try:
+        for name, text in (("fizzbuzz", FIZZBUZZ_LOOP), ("collatz", COLLATZ_LOOP)):
+            source = os.path.join(work, f"{name}.bx")
+            with open(source, "w") as fp:
+                fp.write(text)
+            subprocess.run([sys.executable, "bxcc.py", source], cwd=PY_DIR, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"{name:<32} {asm_instructions(source[:-3] + '.s')} x64 instructions")
+            report(f"{name} run", [time_process([source[:-3] + ".exe"]) for _ in range(runs)])
+    finally:
+        shutil.rmtree(work)
+
+def cfg_blocks(source: str) -> Tuple[int, int]:
+    """ Returns the number of basic blocks of a program before and after the CFG
+        optimizations """
+    import io
+    import contextlib
+    import ast2tac
+    import bx2front
+    import tac_cfopt
+    from tac_store import LABEL
+    with contextlib.redirect_stdout(io.StringIO()):
+        tac = ast2tac.ast_to_tac(bx2front.get_ast(source, True, True))
+        serial = tac_cfopt.get_serialized_tac(tac)
+        blocks = 0
+        for decl in tac:
+            if "proc" in decl:
+                label = tac_cfopt.get_max_label(decl["labels"]) + 1 if decl["labels"] else 0
+                blocks += len(tac_cfopt.CFG_creator(decl["proc"][1:], decl["body"], label).return_blocks())
+    return blocks, sum(decl["body"].opcodes.count(LABEL) for decl in serial if "proc" in decl)
+
+def bench_setcc(runs: int) -> None:
+    """ Basic blocks, code size and run time of programs storing, passing and
+        returning comparisons """
+    import shutil
+    import tempfile
+
+    work = tempfile.mkdtemp()
+    try:
+        bool_print = os.path.join(PY_DIR, "..", "examples", "bool_print.bx")
+        with open(bool_print) as fp:
+            programs = (("bool_print", fp.read()), ("bool_loop", BOOL_LOOP))
+        for name, text in programs:
+            source = os.path.join(work, f"{name}.bx")
+            with open(source, "w") as fp:
+                fp.write(text)
+            before, after = cfg_blocks(source)
+            subprocess.run([sys.executable, "bxcc.py", source], cwd=PY_DIR, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"{name:<32} {before} blocks, {after} after cfg, "
+                  f"{asm_instructions(source[:-3] + '.s')} x64 instructions")
+            report(f"{name} run", [time_process([source[:-3] + ".exe"]) for _ in range(runs)])
+    finally:
+        shutil.rmtree(work)
+
+def bench_deep(runs: int) -> None:
+    """ Front end and tac generation of 50k deep nestings, which overflowed
+        the interpreter stack when the walkers recursed, see tests/test_deep.py """
+    import io
+    import shutil
+    import tempfile
+    import contextlib
+    import ast2tac
+    import bx2front
+
+    depth = 50000
+    work = tempfile.mkdtemp()
+    try:
+        for kind in ("else_if", "nested_if", "and_chain", "sum"):
+            source = os.path.join(work, f"{kind}.bx")
+            with open(source, "w") as fp:
+                fp.write(make_deep_program(kind, depth))
+            for parser, rd in (("ply", False), ("rd", True)):
+                front, tac = [], []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        ast = bx2front.get_ast(source, rd, rd)
+                        middle = time.perf_counter()
+                        ast2tac.ast_to_tac(ast)
+                    front.append((middle - start) * 1000)
+                    tac.append((time.perf_counter() - middle) * 1000)
+                report(f"{kind} {parser} front end", front)
+                report(f"{kind} {parser} ast_to_tac", tac)
+    finally:
+        shutil.rmtree(work)
+
+def tac_time(data: str, order: bool) -> float:
+    """ Returns the ast_to_tac time in ms of a program """
+    import io
+    import contextlib
+    import ast2tac
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+
+    ast = RDParser(DFALexer()).parse(data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast.global_type_check()
+        ast.type_check()
+        start = time.perf_counter()
+        ast2tac.ast_to_tac(ast, order=order)
+    return (time.perf_counter() - start) * 1000
+
+def bench_order(runs: int) -> None:
+    """ Max live temporaries per proc with the operands in source order and in
+        Sethi-Ullman order, see tests/test_order.py """
+    import shutil
+    import tempfile
+
+    work = tempfile.mkdtemp()
+    try:
+        temps = os.path.join(work, "temps.bx")
+        with open(temps, "w") as fp:
+            fp.write(make_temp_program(3, 2))
+        # the sum nests to the right, in source order each + keeps its left operand live
+        nested = os.path.join(work, "nested_sum.bx")
+        with open(nested, "w") as fp:
+            fp.write(make_deep_program("sum", 100))
+        sources = sorted(glob.glob(os.path.join(PY_DIR, "..", "examples", "*.bx"))) + [temps, nested]
+        for source in sources:
+            before, after = order_live_temps(source, False), order_live_temps(source, True)
+            for proc in before:
+                print(f"{os.path.basename(source) + ' ' + proc:<32} max live temps "
+                      f"{before[proc]:>3} -> {after[proc]:>3}")
+
+        data = make_temp_program(200, 20)
+        with open(temps, "w") as fp:
+            fp.write(data)
+        for order in (False, True):
+            live = order_live_temps(temps, order)
+            report(f"ast_to_tac order={order} ({max(live.values())} live)",
+                   [tac_time(data, order) for _ in range(runs)])
+    finally:
+        shutil.rmtree(work)
+
+def frame_bytes(asm_file: str) -> int:
+    """ Returns the stack frame size of all the procs of an assembly file """
+    import re
+    with open(asm_file) as fp:
+        return sum(int(size) for size in re.findall(r"\tsubq \$(\d+), %rsp", fp.read()))
+
+def bench_frames(runs: int) -> None:
+    """ Temps and stack frames without and with temp recycling, then the run
+        time of a loop over a large body, see tests/test_recycle.py """
+    import io
+    import shutil
+    import tempfile
+    import contextlib
+    import ast2tac
+    import bx2front
+    import tac_cfopt
+    import tac2x64
+
+    def build(source: str, target: str, recycle: bool) -> int:
+        """ Compiles the program and returns its number of temps """
+        with contextlib.redirect_stdout(io.StringIO()):
+            tac = ast2tac.ast_to_tac(bx2front.get_ast(source, True, True), recycle=recycle)
+            tac2x64.convert_instr_to_asm(target, tac_cfopt.get_serialized_tac(tac))
+        return sum(len(decl["temps"]) for decl in tac if "proc" in decl)
+
+    work = tempfile.mkdtemp()
+    try:
+        generated = []
+        for name, text in (("temps.bx", make_temp_program(3, 10)), ("program.bx", make_program(5, 10)),
+                           ("constants.bx", make_constant_program(30, 0))):
+            generated.append(os.path.join(work, name))
+            with open(generated[-1], "w") as fp:
+                fp.write(text)
+        sources = sorted(glob.glob(os.path.join(PY_DIR, "..", "examples", "*.bx"))) + generated
+        print(f"{'':<24} {'temps':>15} {'frame bytes':>15}")
+        for source in sources:
+            counts = []
+            for recycle in (False, True):
+                target = os.path.join(work, f"out{recycle}")
+                counts += [build(source, target, recycle), frame_bytes(target + ".s")]
+            print(f"{os.path.basename(source):<24} {counts[0]:>6} -> {counts[2]:>5} "
+                  f"{counts[1]:>6} -> {counts[3]:>5}")
+
+        source = os.path.join(work, "frame.bx")
+        with open(source, "w") as fp:
+            fp.write(make_frame_program(200, 20000))
+        for recycle in (False, True):
+            target = os.path.join(work, f"frame{recycle}")
+            build(source, target, recycle)
+            report(f"loop recycle={recycle} ({frame_bytes(target + '.s')} B)",
+                   [time_process([target + ".exe"]) for _ in range(runs)])
+    finally:
+        shutil.rmtree(work)
+
+# runs the phases on one file as lists or as chained generators, or only the
+# front end, prints the peak RSS of the process in KiB
+PIPELINE_CHILD = """
+import io, sys, contextlib, resource
+sys.path.insert(0, sys.argv[3])
+import bx2front, ast2tac, tac_cfopt, tac2x64
+mode, source = sys.argv[1], sys.argv[2]
+with contextlib.redirect_stdout(io.StringIO()):
+    ast = bx2front.get_ast(source, True, True)
+    with open(source[:-3] + ".s.part", "w") as fp:
+        if mode == "list":
+            serial = tac_cfopt.get_serialized_tac(ast2tac.ast_to_tac(ast))
+            asm = tac2x64.tac2x64(serial).get_asm_instr()
+            fp.write("\\n".join(line for decl in asm for line in decl))
+        elif mode == "stream":
+            separator = ""
+            for asm in tac2x64.iter_asm(tac_cfopt.iter_serialized_tac(ast2tac.iter_tac(ast))):
+                fp.write(separator + "\\n".join(asm))
+                separator = "\\n"
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def run_pipeline(mode: str, source: str) -> Tuple[int, float, float]:
+    """ Runs PIPELINE_CHILD and returns its peak RSS in KiB, the time until the
+        first assembly reached the disk and the total time, in ms """
+    part = source[:-3] + ".s.part"
+    if os.path.exists(part):
+        os.remove(part)
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", PIPELINE_CHILD, mode, source, PY_DIR],
+                             stdout=subprocess.PIPE, text=True)
+    first = None
+    while child.poll() is None:
+        if first is None and os.path.exists(part) and os.path.getsize(part) > 0:
+            first = (time.perf_counter() - start) * 1000
+        time.sleep(0.005)
+    total = (time.perf_counter() - start) * 1000
+    assert(child.returncode == 0), f"the {mode} pipeline failed"
+    return int(child.stdout.read()), total if first is None else first, total
+
+def bench_stream(runs: int) -> None:
+    """ Peak RSS and time to the first assembly of the list and the streaming
+        pipelines on programs with more and more procs, the front end alone
+        holds the AST of the whole program, see tests/test_stream.py """
+    import shutil
+    import tempfile
+
+    work = tempfile.mkdtemp()
+    try:
+        for num_procs in (250, 1000, 4000):
+            source = os.path.join(work, f"procs{num_procs}.bx")
+            with open(source, "w") as fp:
+                fp.write(make_program(num_procs, 20))
+            for mode in ("ast", "list", "stream"):
+                rss, first, total = [], [], []
+                for _ in range(runs):
+                    result = run_pipeline(mode, source)
+                    for values, value in zip((rss, first, total), result):
+                        values.append(value)
+                if mode == "ast":
+                    print(f"{num_procs:>5} procs {mode:<7} peak RSS {min(rss) / 1024:7.1f} MiB   "
+                          f"{'':>24} total {min(total):8.1f} ms")
+                    continue
+                print(f"{num_procs:>5} procs {mode:<7} peak RSS {min(rss) / 1024:7.1f} MiB   "
+                      f"first asm {min(first):8.1f} ms   total {min(total):8.1f} ms")
+    finally:
+        shutil.rmtree(work)
+
+def bench_cfg_scaling(runs: int) -> None:
+    """ Block inference, CFG optimizations and serialization of procs from 1k
+        to 100k blocks, the time per block should stay flat """
+    import io
+    import contextlib
+    import tac_cfopt
+    from cfg import CFG
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    import ast2tac
+
+    for num_blocks in (1000, 10000, 100000):
+        ast = RDParser(DFALexer()).parse(make_block_program(num_blocks))
+        with contextlib.redirect_stdout(io.StringIO()):
+            ast.global_type_check()
+            ast.type_check()
+            decl = [decl for decl in ast2tac.ast_to_tac(ast) if "proc" in decl][0]
+        timings = []
+        for _ in range(runs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                creator = tac_cfopt.CFG_creator("main", decl["body"], tac_cfopt.get_max_label(decl["labels"]) + 1)
+                blocks = len(creator.return_blocks())
+                cfg = CFG(creator.return_blocks(), "main")
+                cfg.optimization()
+                size = len(cfg.serialized_tac())
+            timings.append((time.perf_counter() - start) * 1000)
+        report(f"{blocks:>7} blocks -> {size:>7} instrs", timings)
+        print(f"{'':<32} {min(timings) * 1000 / blocks:8.2f} us per block")
+
+def bench_cfg_edges(runs: int) -> None:
+    """ CFG optimizations alone on procs from 1k to 100k blocks, see
+        tests/test_cfg.py for the edges checked against a rebuild """
+    import io
+    import contextlib
+    import tac_cfopt
+    from cfg import CFG
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    import ast2tac
+
+    for num_blocks in (1000, 10000, 100000):
+        ast = RDParser(DFALexer()).parse(make_block_program(num_blocks))
+        with contextlib.redirect_stdout(io.StringIO()):
+            ast.global_type_check()
+            ast.type_check()
+            decl = [decl for decl in ast2tac.ast_to_tac(ast) if "proc" in decl][0]
+        timings = []
+        for _ in range(runs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                creator = tac_cfopt.CFG_creator("main", decl["body"], tac_cfopt.get_max_label(decl["labels"]) + 1)
+                blocks = len(creator.return_blocks())
+                cfg = CFG(creator.return_blocks(), "main")
+                start = time.perf_counter()
+                cfg.optimization()
+                timings.append((time.perf_counter() - start) * 1000)
+        report(f"{blocks:>7} blocks optimization", timings)
+        print(f"{'':<32} {min(timings) * 1000 / blocks:8.2f} us per block")
+
+def bench_cfg_passes(runs: int) -> None:
+    """ CFG optimizations run once against runs to a fixpoint: instrs left,
+        time and the statistics of every pass, see tests/test_cfg.py """
+    import io
+    import contextlib
+
+    programs = [("block program 10k", make_block_program(10000)),
+                ("else chains 300x8", make_else_chain_program(300, 8))]
+
+    print(f"{'':<28} {'rounds':>7} {'instrs':>8} {'time':>10}")
+    for name, source in programs:
+        decl = procs_of(source)[0]
+        for budget in (1, 16):
+            timings = []
+            for _ in range(runs):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cfg = make_cfg(decl)
+                    start = time.perf_counter()
+                    cfg.optimization(budget)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    size = len(cfg.serialized_tac())
+            print(f"{name + (' once' if budget == 1 else ' fixpoint'):<28} {cfg.get_rounds():>7} {size:>8} {min(timings):>7.2f} ms")
+        for pass_stats in cfg.pass_stats():
+            print(f"    {pass_stats}")
+
+def bench_levels(runs: int) -> None:
+    """ Compile time, x64 instructions and run time of the examples and the
+        loop programs at every optimization level, see tests/test_opt_levels.py """
+    import shutil
+    import tempfile
+    from opt_levels import LEVELS
+
+    work = tempfile.mkdtemp()
+    try:
+        programs = []
+        for example in sorted(glob.glob(os.path.join(PY_DIR, "..", "examples", "*.bx"))):
+            programs.append(os.path.basename(example)[:-3])
+            shutil.copy(example, work)
+        for name, text in (("fizzbuzz_loop", FIZZBUZZ_LOOP), ("collatz_loop", COLLATZ_LOOP),
+                           ("bool_loop", BOOL_LOOP)):
+            programs.append(name)
+            with open(os.path.join(work, f"{name}.bx"), "w") as fp:
+                fp.write(text)
+
+        print(f"{'':<16}" + "".join(f"{level + ' compile':>14} {'instrs':>7} {'run':>9}" for level in LEVELS))
+        totals = {level: [0.0, 0, 0.0] for level in LEVELS}
+        for name in programs:
+            row = f"{name:<16}"
+            for level in LEVELS:
+                source = os.path.join(work, f"{name}{level}.bx")
+                shutil.copy(os.path.join(work, f"{name}.bx"), source)
+                compile_ms = min(time_process([sys.executable, "bxcc.py", source, "-" + level])
+                                 for _ in range(runs))
+                run_ms = min(time_process([source[:-3] + ".exe"]) for _ in range(runs))
+                instrs = asm_instructions(source[:-3] + ".s")
+                for i, value in enumerate((compile_ms, instrs, run_ms)):
+                    totals[level][i] += value
+                row += f"{compile_ms:>11.1f} ms {instrs:>7} {run_ms:>6.2f} ms"
+            print(row)
+        print(f"{'total':<16}" + "".join(f"{compile_ms:>11.1f} ms {instrs:>7} {run_ms:>6.2f} ms"
+                                         for compile_ms, instrs, run_ms in totals.values()))
+    finally:
+        shutil.rmtree(work)
+
+def bench_dominance(runs: int) -> None:
+    """ CFG.dominance on procs from 1k to 100k blocks, before and after the CFG
+        optimizations, the time per block should stay flat, see
+        tests/test_dominance.py """
+    import io
+    import contextlib
+
+    programs = [(f"{n // 1000}k block program", make_block_program(n)) for n in (1000, 10000, 100000)]
+    programs += [("nested ifs 30k deep", make_deep_program("nested_if", 30000)),
+                 ("else ifs 30k long", make_deep_program("else_if", 30000))]
+    for name, source in programs:
+        decl = procs_of(source)[0]
+        for optimized in (False, True):
+            timings = []
+            for _ in range(runs):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cfg = make_cfg(decl)
+                    if optimized:
+                        cfg.optimization()
+                start = time.perf_counter()
+                dominance = cfg.dominance()
+                timings.append((time.perf_counter() - start) * 1000)
+            size = len(dominance.reverse_postorder())
+            report(f"{name} {'optimized' if optimized else 'built'}", timings)
+            print(f"{'':<32} {size:>7} blocks {dominance.iterations()} sweeps "
+                  f"{min(timings) * 1000 / size:8.2f} us per block")
+
+benchmarks = {
+    "startup": bench_startup,
+    "imports": bench_imports,
+    "lexer": bench_lexer,
+    "dfa_lexer": bench_dfa_lexer,
+    "parse": bench_parse,
+    "ast_memory": bench_ast_memory,
+    "scopes": bench_scopes,
+    "fused": bench_fused,
+    "parallel_check": bench_parallel_check,
+    "ast_cache": bench_ast_cache,
+    "incremental": bench_incremental,
+    "tac_store": bench_tac_store,
+    "temps": bench_temps,
+    "folding": bench_folding,
+    "branches": bench_branches,
+    "setcc": bench_setcc,
+    "deep": bench_deep,
+    "order": bench_order,
+    "frames": bench_frames,
+    "stream": bench_stream,
+    "cfg_scaling": bench_cfg_scaling,
+    "cfg_edges": bench_cfg_edges,
+    "cfg_passes": bench_cfg_passes,
+    "levels": bench_levels,
+    "dominance": bench_dominance,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='BX compiler benchmarks')
+    parser.add_argument('benchmark', choices=list(benchmarks), nargs='+')
+    parser.add_argument('--runs', dest='runs', type=int, default=5,
+                        help='Number of runs per measurement')
+    args = parser.parse_args(sys.argv[1:])
+
+    for name in args.benchmark:
+        print(f"== {name}")
+        benchmarks[name](args.runs)
@@ -1,14 +1,129 @@
 import argparse
+import gc
+import os
 import sys
-from bxast import Prog
-from my_parser import run_parser
+from typing import List, Tuple, Union
+from bxast import *
 
-def get_ast(fname) -> Prog:
-    ast: Prog = run_parser(fname)
+# tree being checked by the pool, workers inherit it through fork
+_pool_ast: Prog = None
+
+def _annotated_nodes(proc: DeclProc) -> List[Union[ExpressionVar, ExpressionProcCall]]:
+    """ Returns the nodes of the proc body that type_check annotates, in a fixed order """
+    nodes = []
+    stack = [proc.get_body()]
+    while stack:
+        node = stack.pop()
+        kind = type(node)
+        if kind is ExpressionVar:
+            nodes.append(node)
+        elif kind is ExpressionOp:
+            stack.extend(node.arguments)
+        elif kind is ExpressionProcCall:
+            nodes.append(node)
+            stack.extend(node.get_params())
+        elif kind is StatementBlock:
+            stack.extend(node.statements)
+        elif kind is StatementAssign:
+            stack.append(node.lvalue)
+            stack.append(node.rvalue)
+        elif kind is StatementIfElse:
+            if node.if_rest is not None:
+                stack.append(node.if_rest)
+            stack.append(node.block)
+            stack.append(node.condition)
+        elif kind is StatementWhile:
+            stack.append(node.block)
+            stack.append(node.condition)
+        elif kind is StatementVardecl:
+            stack.append(node.init)
+        elif kind is StatementEval or kind is StatementReturn:
+            if node.expression is not None:
+                stack.append(node.expression)
+    return nodes
+
+def _check_chunk(chunk: List[int]) -> Tuple[List[list], SyntaxError]:
+    """ Worker: type checks the procs at the given decl indices in order.
+        Returns the annotations of the procs up to the first error and that error """
+    decls = _pool_ast.global_decls()
+    scope = _pool_ast.get_scope()
+    annotations = []
+    for index in chunk:
+        try:
+            decls[index].type_check(scope)
+        except SyntaxError as error:
+            return annotations, error
+        annotations.append([node.get_annotation() for node in _annotated_nodes(decls[index])])
+    return annotations, None
+
+def parallel_type_check(ast: Prog, jobs: int) -> None:
+    """ Same as ast.type_check() with the procs split across jobs processes.
+        A proc only reads the global scope, so the procs are checked
+        independently; the workers send back the types and names that
+        type_check records and those are copied onto this tree. The first
+        error in source order is raised, as in the sequential check """
+    global _pool_ast
+    decls = ast.global_decls()
+    procs = [index for index, decl in enumerate(decls) if isinstance(decl, DeclProc)]
+    # contiguous chunks, a few per worker to even out proc sizes
+    size = max(1, -(-len(procs) // (jobs * 4)))
+    chunks = [procs[i:i + size] for i in range(0, len(procs), size)]
+
+    import multiprocessing
+
+    _pool_ast = ast
+    # keep the collector of the workers off the inherited tree, traversing
+    # it would copy every page of it
+    gc.freeze()
+    try:
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            results = pool.imap(_check_chunk, chunks)
+            for chunk in chunks:
+                # collect the nodes while the workers are still checking
+                nodes = [_annotated_nodes(decls[index]) for index in chunk]
+                annotations, error = next(results)
+                for proc_nodes, proc_annotations in zip(nodes, annotations):
+                    for node, annotation in zip(proc_nodes, proc_annotations):
+                        node.set_annotation(annotation)
+                if error is not None:
+                    raise error
+    finally:
+        gc.unfreeze()
+        _pool_ast = None
+
+def get_ast(fname, dfa_lexer: bool = False, rd_parser: bool = False, fused: bool = False, jobs: int = 1,
+            cache_dir: str = None) -> Prog:
+    """ fused: leave the proc bodies to be type checked by ast2tac.ast_to_tac(ast, fused=True)
+        jobs: number of processes type checking the proc bodies
+        cache_dir: directory of the AST cache, a hit skips parsing and type checking """
+    if cache_dir is not None:
+        import ast_cache
+        ast = ast_cache.load_ast(cache_dir, fname, not fused)
+        if ast is not None:
+            print("ast loaded from cache")
+            return ast
+
+    if dfa_lexer and rd_parser:
+        # importing my_parser builds the ply lexer and parser, neither is used
+        from dfa_scanner import DFALexer
+        from rd_parser import RDParser
+        with open(fname) as f:
+            ast: Prog = RDParser(DFALexer()).parse(f.read())
+    else:
+        from my_parser import run_parser
+        ast: Prog = run_parser(fname, dfa_lexer, rd_parser)
     ast.global_type_check()
     print("global type_check done")
-    ast.type_check()
-    print("type_check done")
+    if not fused:
+        # workers beyond the cores only add the copying of the annotations
+        jobs = min(jobs, os.cpu_count() or 1)
+        if jobs > 1:
+            parallel_type_check(ast, jobs)
+        else:
+            ast.type_check()
+        print("type_check done")
+    if cache_dir is not None:
+        ast_cache.store_ast(cache_dir, fname, not fused, ast)
     return ast
 
 if __name__ == "__main__":
@@ -16,7 +131,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Get method for conversion and filetype.')
     parser.add_argument('filename', metavar="FILE", type=str, nargs=1)
     args = parser.parse_args(sys.argv[1:])
-    
+
     filename = args.filename[0]     # get the filename
 
-    ast = get_ast(filename)  # get the ast
\ No newline at end of file
+    ast = get_ast(filename)  # get the ast
@@ -1,4 +1,5 @@
-from typing import List, Tuple, Dict, Union
+from types import GeneratorType
+from typing import List, Tuple, Dict, Union, Any, Iterator
 from macros import Operations, BX_TYPE
 
 """
@@ -7,68 +8,161 @@ Authors: Yi Yao Tan
 """
 
 # ------------------------------------------------------------------------------#
-# Class to handle Scopes
+# Tree walking
 # ------------------------------------------------------------------------------#
 
+def walk(walker: Union[Iterator, Any]) -> Any:
+    """ Runs a tree walker without recursion and returns its result.
+        A walker is a generator that, instead of calling the walker of a sub
+        tree, yields it and is sent back its result; it can also yield the
+        result of a sub tree it handled on the spot. The pending walkers wait
+        on a list, so the depth of a tree is not bounded by the interpreter
+        stack. Anything but a generator is already a result """
+    if type(walker) is not GeneratorType:
+        return walker
+    stack = [walker]
+    send = walker.send
+    value = None
+    while True:
+        try:
+            child = send(value)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            send = stack[-1].send
+            value = stop.value
+            continue
+        if type(child) is GeneratorType:
+            stack.append(child)
+            send = child.send
+            value = None
+        else:
+            value = child
+
+# ------------------------------------------------------------------------------#
+# Classes to handle Scopes
+# ------------------------------------------------------------------------------#
+
+class SymbolTable:
+    """ Shadow stack symbol table: each name maps to the stack of its bindings
+        (innermost last) and each scope keeps an undo log of the names it bound.
+        Lookups are O(1) and leaving a scope costs O(names bound in it) """
+    def __init__(self) -> None:
+        self.__bindings: Dict[str, List[Tuple[int, object]]] = dict()
+        self.__undo_logs: List[List[str]] = list()
+
+    def __str__(self) -> str:
+        scopes = [dict() for _ in self.__undo_logs]
+        for name, stack in self.__bindings.items():
+            for depth, value in stack:
+                scopes[depth][name] = value
+        return str(scopes)
+
+    def __len__(self) -> int:
+        """ returns number of open scopes """
+        return len(self.__undo_logs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__bindings
+
+    def enter_scope(self) -> None:
+        """ opens a new innermost scope """
+        self.__undo_logs.append([])
+
+    def exit_scope(self) -> None:
+        """ closes the innermost scope and drops its bindings """
+        bindings = self.__bindings
+        for name in self.__undo_logs.pop():
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
+
+    def bind(self, name: str, value) -> None:
+        """ binds name in the innermost scope, replacing a binding from the same scope """
+        depth = len(self.__undo_logs) - 1
+        stack = self.__bindings.setdefault(name, [])
+        if stack and stack[-1][0] == depth:
+            stack[-1] = (depth, value)
+        else:
+            stack.append((depth, value))
+            self.__undo_logs[-1].append(name)
+
+    def bind_global(self, name: str, value) -> None:
+        """ binds name in the outermost scope """
+        stack = self.__bindings.setdefault(name, [])
+        if stack and stack[0][0] == 0:
+            stack[0] = (0, value)
+        else:
+            stack.insert(0, (0, value))
+            self.__undo_logs[0].append(name)
+
+    def lookup(self, name: str, default = None):
+        """ returns the innermost binding of name """
+        stack = self.__bindings.get(name)
+        return stack[-1][1] if stack else default
+
+    def lookup_global(self, name: str, default = None):
+        """ returns the binding of name in the outermost scope """
+        stack = self.__bindings.get(name)
+        return stack[0][1] if stack and stack[0][0] == 0 else default
+
+    def in_current_scope(self, name: str) -> bool:
+        """ checks if name is bound in the innermost scope """
+        stack = self.__bindings.get(name)
+        return bool(stack) and stack[-1][0] == len(self.__undo_logs) - 1
+
+    def in_global_scope(self, name: str) -> bool:
+        """ checks if name is bound in the outermost scope """
+        stack = self.__bindings.get(name)
+        return bool(stack) and stack[0][0] == 0
+
 class Scope:
     def __init__(self) -> None:
-        self.__scope_map: List[Dict[str, BX_TYPE]] = list()
+        self.__symbols: SymbolTable = SymbolTable()
         self.__global_vardecls: Dict[str, BX_TYPE] = dict()
 
     def __str__(self) -> str:
-        return str(self.__scope_map)
+        return str(self.__symbols)
 
     def scope_len(self) -> int:
         """ returns number of scopes """
-        return len(self.__scope_map)
+        return len(self.__symbols)
 
     def create_scope(self) -> None:
         """ appends a new scope when a block is entered"""
         # print("SCOPE CREATED")
-        self.__scope_map.append({})
+        self.__symbols.enter_scope()
 
     def delete_scope(self) -> None:
         """ pops a scope when exiting a block """
         # print("SCOPE DELETED")
-        self.__scope_map.pop()
+        self.__symbols.exit_scope()
 
     def get_type(self, variable: str) -> BX_TYPE:
         """ Returns the type of a variable """
-        for scope in self.__scope_map[::-1]:
-            if variable in scope:
-                return scope[variable]
+        if variable in self.__symbols:
+            return self.__symbols.lookup(variable)
         raise RuntimeError(f"variable {variable} not defined in the operation")
 
     def exists(self, variable: str) -> bool:
         """ Checks if a variable exists in any scope """
-        # print(self.__scope_map)
-        # print(variable)
-        for scope in self.__scope_map[::-1]:
-            if variable in scope:
-                return True
-        return False
+        return variable in self.__symbols
 
     def exists_in_current_scope(self, variable) -> bool:
         """ Checks if a variable (ExpressionVar) exists in current scope """
-        # print(self.__scope_map)
-        # print(variable)
-        if variable in self.__scope_map[-1]:
-            return True
-        return False
+        return self.__symbols.in_current_scope(variable)
 
     def add_variable(self, variable: str, ty: BX_TYPE) -> None:
         """ Adds a variable (ExpressionVar.name) in the current scope """
         # print(variable)
         if self.scope_len():
-            self.__scope_map[-1][variable] = ty
+            self.__symbols.bind(variable, ty)
 
     def exists_in_global_scope(self, variable: str) -> bool:
         """ Checks if a variable (ExpressionVar.name) exists in current scope """
-        # print(self.__scope_map[0])
-        # print(variable)
-        if variable in self.__scope_map[0]:
-            return True
-        return False
+        return self.__symbols.in_global_scope(variable)
 
     # ---------------------------------------------------------------------------#
     # Helpers for proc functions
@@ -99,14 +193,12 @@ class Scope:
 
     def get_global(self, name: str) -> Tuple[List[BX_TYPE], BX_TYPE] :
         """ Returns the type of a procedure or global variable from the global scope """
-        if self.exists_in_global_scope(name):
-            return self.__scope_map[0][name]
-        return None
+        return self.__symbols.lookup_global(name)
 
     def add_proc(self, proc_name: str, in_type: List[BX_TYPE], out_type: BX_TYPE) -> None:
         """ Adds a procedure in the current global scope """
         if self.scope_len():
-            self.__scope_map[0][proc_name] = (in_type, out_type)
+            self.__symbols.bind_global(proc_name, (in_type, out_type))
 
     def add_global_var(self, name:str, ty: BX_TYPE) -> None:
         """ Adds a global vardecl """
@@ -121,6 +213,10 @@ class Scope:
         return False
 
 class Node:
+    # nodes are allocated by the hundred thousand for generated programs,
+    # __slots__ drops the per-instance __dict__
+    __slots__ = ('location',)
+
     def __init__(self, location: List[int]):
         self.location = location
 
@@ -136,6 +232,8 @@ class Node:
 # ------------------------------------------------------------------------------#
 
 class Param(Node):
+    __slots__ = ('__name', '__type')
+
     def __init__(self, location: List[int], name: str, ty: BX_TYPE):
         super().__init__(location)
         self.__name: str = name
@@ -186,14 +284,23 @@ class ListParams:
 # ------------------------------------------------------------------------------#
 
 class Expression(Node):
+    __slots__ = ()
+
     def __init__(self,location: List[int]):
         super().__init__(location)
 
+    def type_check_walker(self, scope: Scope) -> Any:
+        """ Type checks an expression without sub expressions on the spot,
+            the others return a walker (see walk) """
+        return self.type_check(scope)
+
 class ExpressionBool(Expression):
+    __slots__ = ('value',)
+    __type = BX_TYPE.BOOL
+
     def __init__(self,location: List[int], value: bool):
         super().__init__(location)
         self.value: bool = value
-        self.__type = BX_TYPE.BOOL
 
     def get_type(self):
         return self.__type
@@ -206,6 +313,8 @@ class ExpressionBool(Expression):
             self.syntax_error(f"{self.value} value must be 'true' or 'false'.")
 
 class ExpressionProcCall(Expression):
+    __slots__ = ('__name', '__params', '__type')
+
     def __init__(self, location: List[int], name: str, params: List[Expression]):
         super().__init__(location)
         self.__name: str = name
@@ -223,11 +332,22 @@ class ExpressionProcCall(Expression):
         """ Return the name of the function """
         return self.__name
 
+    def get_annotation(self) -> Tuple[str, BX_TYPE]:
+        """ Returns what type_check records on the node: the resolved name and the type """
+        return self.__name, self.__type
+
+    def set_annotation(self, annotation: Tuple[str, BX_TYPE]) -> None:
+        """ Restores what type_check recorded on a copy of the node """
+        self.__name, self.__type = annotation
+
     def __str__(self):
         return "ExpressionProcCall(%s, %s)" % (self.__name, self.__params)
 
     def type_check(self, scope: Scope) -> None:
         """ Checks if the procedure exists and if the parameters are of the correct type """
+        walk(self.type_check_walker(scope))
+
+    def type_check_walker(self, scope: Scope) -> Iterator:
         # if a print call then change the call to reserved print call statement
         if self.__name == "print":
             if len(self.__params) != 1:
@@ -235,7 +355,7 @@ class ExpressionProcCall(Expression):
 
             # print("entered print call")
             # set requirements for print call
-            _type = self.__params[0].type_check(scope)
+            _type = yield self.__params[0].type_check_walker(scope)
             _type = self.__params[0].get_type()
             # print(type(self.__params[0]))
             # print(self.__params[0].get_type())
@@ -261,11 +381,13 @@ class ExpressionProcCall(Expression):
                 self.syntax_error(f"Procedure '{self.__name}' expects {len(in_types)} parameters, but {len(self.__params)} were given.")
             # check correct params
             for i, parameter in enumerate(self.__params):
-                parameter.type_check(scope)
+                yield parameter.type_check_walker(scope)
                 if parameter.get_type() != in_types[i]:
                     self.syntax_error(f"Parameter {i} of procedure '{self.__name}' must be of type {in_types[i]}.")
 
 class ExpressionVar(Expression):
+    __slots__ = ('name', 'type')
+
     def __init__(self, location: List[int], name: str):
         super().__init__(location)
         self.name: str = name
@@ -275,6 +397,14 @@ class ExpressionVar(Expression):
     def get_type(self) -> None:
         return self.type
 
+    def get_annotation(self) -> BX_TYPE:
+        """ Returns what type_check records on the node """
+        return self.type
+
+    def set_annotation(self, annotation: BX_TYPE) -> None:
+        """ Restores what type_check recorded on a copy of the node """
+        self.type = annotation
+
     def __str__(self):
         return "ExpressionVar({})".format(self.name)
 
@@ -286,11 +416,13 @@ class ExpressionVar(Expression):
             self.type = scope.get_type(self.name)
 
 class ExpressionInt(Expression):
+    __slots__ = ('value',)
+    __max = 1<<63
+    __type = BX_TYPE.INT
+
     def __init__(self, location: List[int], value):
         super().__init__(location)
         self.value = value
-        self.__max = 1<<63
-        self.__type = BX_TYPE.INT
 
     def get_type(self) -> BX_TYPE:
         return self.__type
@@ -303,6 +435,9 @@ class ExpressionInt(Expression):
             self.syntax_error(" number too large")
 
 class ExpressionOp(Expression):
+    __slots__ = ('operator', 'arguments', '__type', 'expected_argument_type')
+    operations: Operations = Operations
+
     def __init__(self, location: List[int], operator: str, arguments: List[Expression]):
         """ operator  : string of the operator
             arguments : list of expressions     """
@@ -311,7 +446,6 @@ class ExpressionOp(Expression):
         self.arguments = arguments
         self.__type: BX_TYPE = None
         self.expected_argument_type: Tuple[BX_TYPE] = None
-        self.operations: Operations = Operations
         self.__type_init()
 
     def get_type(self) -> BX_TYPE:
@@ -341,22 +475,39 @@ class ExpressionOp(Expression):
             self.syntax_error(f"Unkown operator {self.operator}")
 
     def type_check(self, scope: Scope) -> None:
+        walk(self.type_check_walker(scope))
+
+    def type_check_walker(self, scope: Scope) -> Union[Iterator, None]:
+        """ Checks on the spot if the arguments have no sub expressions """
         # print(F"expression op: {self}, scope: {scope}")
         if len(self.arguments) != len(self.expected_argument_type):
             self.syntax_error(f"{self.operator} takes {len(self.expected_argument_type)} \
                                 arguments got {len(self.arguments)}")
 
+        for arg in self.arguments:
+            if isinstance(arg, (ExpressionOp, ExpressionProcCall)):
+                return self.__check_arguments(scope)
         for index, arg in enumerate(self.arguments):
-            # print(f"checking arg {arg} of {self.operator}")
             arg.type_check(scope)
-            if isinstance(arg, ExpressionVar):
-                arg_type = scope.get_type(arg.name)
-            else:
-                arg_type = arg.get_type()
-            # print(F"arg type {arg_type}")
-            expected_type = self.expected_argument_type[index]
-            if arg_type != expected_type:
-                self.syntax_error(f"Argument {index+1} for operation {self.operator} should have type {expected_type} but has {arg_type}")
+            self.__check_argument(index, arg, scope)
+
+    def __check_arguments(self, scope: Scope) -> Iterator:
+        """ Walker checking the arguments in turn """
+        for index, arg in enumerate(self.arguments):
+            # print(f"checking arg {arg} of {self.operator}")
+            yield arg.type_check_walker(scope)
+            self.__check_argument(index, arg, scope)
+
+    def __check_argument(self, index: int, arg: Expression, scope: Scope) -> None:
+        """ Checks the type of a checked argument """
+        if isinstance(arg, ExpressionVar):
+            arg_type = scope.get_type(arg.name)
+        else:
+            arg_type = arg.get_type()
+        # print(F"arg type {arg_type}")
+        expected_type = self.expected_argument_type[index]
+        if arg_type != expected_type:
+            self.syntax_error(f"Argument {index+1} for operation {self.operator} should have type {expected_type} but has {arg_type}")
 
 #------------------------------------------------------------
 # Utility for parser
@@ -388,10 +539,19 @@ class ListVarDecl:
 # ------------------------------------------------------------------------------#
 
 class Statement(Node):
+    __slots__ = ()
+
     def __init__(self,location: List[int]):
         super().__init__(location)
 
+    def type_check_walker(self, scope: Scope, ongoingloop: bool) -> Any:
+        """ Type checks a statement without sub statements on the spot,
+            the others return a walker (see walk) """
+        return self.type_check(scope, ongoingloop)
+
 class StatementEval(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self,location: List[int], expression: Expression):
         super().__init__(location)
         self.expression: Expression = expression
@@ -404,6 +564,8 @@ class StatementEval(Statement):
         return "eval(%s)" % (self.expression)
 
 class StatementReturn(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self,location: List[int], expression: Union[ExpressionVar, ExpressionProcCall]):
         super().__init__(location)
         self.expression: Union[ExpressionVar, ExpressionProcCall] = expression
@@ -427,6 +589,8 @@ class StatementReturn(Statement):
         return "return(%s)" % (self.expression)
 
 class StatementVardecl(Statement):
+    __slots__ = ('variable', '__type', 'init', '__global')
+
     def __init__(self,location: List[int], variable: ExpressionVar, type: BX_TYPE, init: Expression):
         super().__init__(location)
         self.variable: ExpressionVar = variable
@@ -467,6 +631,8 @@ class StatementVardecl(Statement):
             self.syntax_error(f"type mismatch for var {self.variable.name}")
 
 class StatementAssign(Statement):
+    __slots__ = ('lvalue', 'rvalue')
+
     def __init__(self, location: List[int], lvalue: ExpressionVar, rvalue: Expression):
         super().__init__(location)
         self.lvalue: ExpressionVar = lvalue
@@ -489,28 +655,39 @@ class StatementAssign(Statement):
 # ------------------------------------------------------------------------------#
 
 class StatementBlock(Statement):
+    __slots__ = ('statements',)
+
     def __init__(self,location: List[int], statements: List[Statement]):
         super().__init__(location)
         self.statements: List[Statement] = statements
         # print("Created BLOCK class")
 
     def type_check(self, scope: Scope, ongoingloop: bool, args: List[Param] = None) -> None:
+        walk(self.type_check_walker(scope, ongoingloop, args))
+
+    def type_check_walker(self, scope: Scope, ongoingloop: bool, args: List[Param] = None) -> Iterator:
         # print("entered BLOCK type_check")
+        self.enter(scope, args)
+        # print("block scope ", scope)
+        for statement in self.statements:
+            # print(statement)
+            yield statement.type_check_walker(scope, ongoingloop)
+        scope.delete_scope()
+
+    def enter(self, scope: Scope, args: List[Param] = None) -> None:
+        """ Creates the block scope and adds the proc arguments to it """
         scope.create_scope()
         if args is not None:
             for arg in args:
                 arg.type_check(scope)
                 scope.add_variable(arg.get_name(), arg.get_type())
-        # print("block scope ", scope)
-        for statement in self.statements:
-            # print(statement)
-            statement.type_check(scope, ongoingloop)
-        scope.delete_scope()
 
     def __str__(self):
         return "block(%s)" % (self.statements)
 
 class StatementIfElse(Statement):
+    __slots__ = ('condition', 'block', 'if_rest')
+
     def __init__(self, location: List[int], condition: Expression, block : StatementBlock, ifrest):
         super().__init__(location)
         """if_body is a block, condition is an expression"""
@@ -522,16 +699,25 @@ class StatementIfElse(Statement):
         return "ifelse(%s,%s,%s)" % (self.condition,self.block,self.if_rest)
 
     def type_check(self, scope: Scope, ongoingloop: bool) -> None:
+        walk(self.type_check_walker(scope, ongoingloop))
+
+    def type_check_walker(self, scope: Scope, ongoingloop: bool) -> Iterator:
+        self.check_condition(scope)
+        yield self.block.type_check_walker(scope, ongoingloop)
+        if self.if_rest is not None: yield self.if_rest.type_check_walker(scope, ongoingloop)
+
+    def check_condition(self, scope: Scope) -> None:
+        """ Type checks the condition only, not the branches """
         # print(self.condition)
         if isinstance(self.condition, ExpressionVar):
             self.condition.type_check(scope)
         if self.condition.get_type() != BX_TYPE.BOOL:
             self.syntax_error(f' conditional expression does not have bool type')
         self.condition.type_check(scope)
-        self.block.type_check(scope, ongoingloop)
-        if self.if_rest is not None: self.if_rest.type_check(scope, ongoingloop)
 
 class StatementWhile(Statement):
+    __slots__ = ('condition', 'block')
+
     def __init__(self, location: List[int], condition: Expression, block: StatementBlock):
         super().__init__(location)
         self.condition: Expression = condition
@@ -541,12 +727,21 @@ class StatementWhile(Statement):
         return "while(%s,%s)" % (self.condition,self.block)
 
     def type_check(self, scope: Scope, ongoingloop: bool) -> None:
+        walk(self.type_check_walker(scope, ongoingloop))
+
+    def type_check_walker(self, scope: Scope, ongoingloop: bool) -> Iterator:
+        self.check_condition(scope)
+        yield self.block.type_check_walker(scope, True)
+
+    def check_condition(self, scope: Scope) -> None:
+        """ Type checks the condition only, not the body """
         self.condition.type_check(scope)
         if self.condition.get_type() != BX_TYPE.BOOL:
             self.syntax_error(f'condition in while statement is not Bool type {self.condition}')
-        self.block.type_check(scope, True)
 
 class StatementJump(Statement):
+    __slots__ = ('keyword',)
+
     def __init__(self, location: List[int], keyword):
         super().__init__(location)
         self.keyword = keyword
@@ -563,6 +758,8 @@ class StatementJump(Statement):
 # ------------------------------------------------------------------------------#
 
 class DeclProc(Node):
+    __slots__ = ('__name', '__arguments', '__returntype', '__body')
+
     def __init__(self,location: List[int], name : str, arguments: List[Param], returntype: BX_TYPE, body: StatementBlock):
         super().__init__(location)
         self.__name: str = name
@@ -597,7 +794,10 @@ class DeclProc(Node):
         # print(self.__arguments)
         self.__body.type_check(scope, False, self.__arguments)
         scope.unset_proc_return_type()
+        self.check_returns()
 
+    def check_returns(self) -> None:
+        """ Checks that a proc with a return type always returns """
         # check if the func has a return statement        
         if self.__returntype != BX_TYPE.VOID:
             ret_stat = False
@@ -607,35 +807,35 @@ class DeclProc(Node):
                     break
                 # if all if else statements have ret then func will always ret
                 if isinstance(stat, StatementIfElse):
-                    if self.__ifelse_has_ret(stat):
+                    if walk(self.__ifelse_has_ret(stat)):
                         ret_stat = True
                         break
 
             if not ret_stat:
                 self.syntax_error(f" function {self.__name} of type {self.__returntype} has no return statement")
 
-    def __ifelse_has_ret(self, statement: StatementIfElse) -> bool:
-        """ Checks if the if else statement block has return statement """
+    def __ifelse_has_ret(self, statement: StatementIfElse) -> Iterator:
+        """ Checks if the if else statement block has return statement, as a walker """
         # check if if statement has a ret
-        if not self.__block_has_ret(statement.block):
+        if not (yield self.__block_has_ret(statement.block)):
             return False
         # check if other conditionals have ret
         if statement.if_rest is not None:
             # check if next to next ifrest is else
             if isinstance(statement.if_rest.if_rest, StatementBlock):
                 # if it is then check both elif and else blocks here
-                if self.__block_has_ret(statement.if_rest.block):
-                    return self.__block_has_ret(statement.if_rest.block)
+                if (yield self.__block_has_ret(statement.if_rest.block)):
+                    return (yield self.__block_has_ret(statement.if_rest.block))
                 return False
-            elif not self.__ifelse_has_ret(statement.if_rest):
+            elif not (yield self.__ifelse_has_ret(statement.if_rest)):
                 return False
         return False
 
-    def __block_has_ret(self, statement: StatementBlock):
-        """ check if the ifrest block has a ret statement """
+    def __block_has_ret(self, statement: StatementBlock) -> Iterator:
+        """ check if the ifrest block has a ret statement, as a walker """
         for sub_stat in statement.statements:
             if isinstance(sub_stat, StatementIfElse):
-                return self.__ifelse_has_ret(sub_stat)
+                return (yield self.__ifelse_has_ret(sub_stat))
             if isinstance(sub_stat, StatementReturn):
                 return True        
         return False
@@ -649,10 +849,15 @@ class DeclProc(Node):
     def get_args(self) -> List[Param]:
         return self.__arguments
 
+    def get_returntype(self) -> BX_TYPE:
+        return self.__returntype
+
     def get_body(self) -> StatementBlock:
         return self.__body
 
 class Prog(Node):
+    __slots__ = ('__decls', '__scope')
+
     def __init__(self,location: List[int], decls: List[Union[DeclProc, StatementVardecl]]):
         super().__init__(location)
         self.__decls: List[Union[DeclProc, StatementVardecl]] = decls
@@ -663,6 +868,10 @@ class Prog(Node):
         """ Return all the global declarations """
         return self.__decls
 
+    def get_scope(self) -> Scope:
+        """ Return the global scope filled by global_type_check """
+        return self.__scope
+
     def __str__(self):
         return "Prog(%s)" % (self.__decls)
 
@@ -697,5 +906,7 @@ class Prog(Node):
                 declaration.type_check(self.__scope)
 
 class Decl(Node):
+    __slots__ = ()
+
     def __init__(self,location: List[int]):
         super().__init__(location)
\ No newline at end of file
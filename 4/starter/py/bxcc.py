@@ -1,10 +1,9 @@
 import sys, argparse
-from typing import List
+from typing import Iterator
 
-import ast2tac
-import bx2front
-import tac_cfopt
-import tac2x64
+# the phases are imported when they are reached: the front end builds the
+# ply tables on import, which --compile-tac never needs, and the back end
+# is not needed by --stop-tac
 
 def main(args: list) -> None:
     """ Main function to convert source code to asm """
@@ -17,6 +16,7 @@ def main(args: list) -> None:
             print(f'File {filename} is not a tac json file')
             sys.exit(1)
         else:
+            import tac2x64
             tac2x64.compile_tac(filename)
             sys.exit(0)
 
@@ -25,31 +25,64 @@ def main(args: list) -> None:
         print(f'File {filename} is not a bx file')
         sys.exit(1)
 
+    import bx2front
+    import ast2tac
+    import opt_levels
+    level = opt_levels.get_level(args.level)
+
     # run the bx2front.py file and get the ast
-    ast = bx2front.get_ast(filename)
-    
-    # run ast2tac to get tac list
-    tac_instr: List[dict] = ast2tac.ast_to_tac(ast)
-    if args.keeptac:    # write the tac file
-        ast2tac.write_tacfile(filename, tac_instr)
-    # stop if only tac conversion requested
-    if args.stoptac:
-        sys.exit(0)
+    # cached procs skip type checking, so the cache needs the fused mode
+    fused = args.fused or args.cachedir is not None
+    ast = bx2front.get_ast(filename, args.dfalexer, args.rdparser, fused, args.jobs, args.astcachedir)
+    cache = None
+    cfg_stats = dict() if args.cfgstats else None
+    if args.cachedir is not None:
+        import proc_cache
+        cache = proc_cache.ProcCache(args.cachedir, filename, ast, level.name)
 
-    # if CFG optimizations not requested then create asm and return
-    if args.nocfg:
-        tac2x64.convert_instr_to_asm(filename[:-3], tac_instr)
-        sys.exit(0)
+    try:
+        # the phases are chained generators: each proc goes through ast2tac,
+        # the CFG optimizations and tac2x64 and is written out before the
+        # next proc is generated, so only one proc is held at a time
+        tac_instr: Iterator[dict] = ast2tac.iter_tac(ast, fused, cache, level.fold, level.order, level.recycle)
+        if args.keeptac:    # write the tac file
+            tac_instr = ast2tac.stream_tacfile(filename, tac_instr)
+        # stop if only tac conversion requested
+        if args.stoptac:
+            drain(tac_instr)
+            sys.exit(0)
 
-    # Do CFG optimizations
-    serial_tac = tac_cfopt.get_serialized_tac(tac_instr)
-    # stop if only CFG requested and write serialized tac
-    tac_cfopt.write_serial_tac(filename[:-3], serial_tac)
-    if args.stopcfg:
-        sys.exit(0)
-    
-    # generate .s and .exe files
-    tac2x64.convert_instr_to_asm(filename[:-3], serial_tac)
+        # if CFG optimizations not requested, or none at this level, then
+        # create asm and return
+        if args.nocfg or not level.cfg_passes:
+            import tac2x64
+            tac2x64.convert_instr_to_asm(filename[:-3], tac_instr, cache, "asm_nocfg",
+                                         level.elide_jumps, level.forward_stores)
+            sys.exit(0)
+
+        # Do CFG optimizations
+        import tac_cfopt
+        serial_tac = tac_cfopt.iter_serialized_tac(tac_instr, cache, cfg_stats, level.cfg_passes, level.cfg_budget)
+        # stop if only CFG requested and write serialized tac
+        serial_tac = tac_cfopt.stream_serial_tac(filename[:-3], serial_tac)
+        if args.stopcfg:
+            drain(serial_tac)
+            sys.exit(0)
+
+        # generate .s and .exe files
+        import tac2x64
+        tac2x64.convert_instr_to_asm(filename[:-3], serial_tac, cache, "asm",
+                                     level.elide_jumps, level.forward_stores)
+    finally:
+        if cache is not None:
+            print(*cache.report(), sep="\n")
+        if cfg_stats:
+            print(*cfg_stats.values(), sep="\n")
+
+def drain(decls: Iterator[dict]) -> None:
+    """ Runs the phases of every declaration, for their files """
+    for _ in decls:
+        pass
 
 if __name__=="__main__":
 
@@ -62,8 +95,25 @@ if __name__=="__main__":
                         help='Compile from tac to x64')
     parse.add_argument('--stop-cfg', dest='stopcfg', action='store_true', default=False,
                         help='Perform CFG optimization and stop')
+    parse.add_argument('-O', dest='level', choices=['0', '1', '2', '3'], default='2',
+                        help='Optimization level: 0 translates as is, 1 runs the CFG passes once, '
+                             '2 runs them to a fixpoint, 3 also runs the back end peephole (default: 2)')
     parse.add_argument('--no-cfg', dest='nocfg', action='store_true', default=False,
                         help='Do not perform CFG optimization')
+    parse.add_argument('--cfg-stats', dest='cfgstats', action='store_true', default=False,
+                        help='Print the runs, changes and time of every CFG pass')
+    parse.add_argument('--dfa-lexer', dest='dfalexer', action='store_true', default=False,
+                        help='Scan with the table-driven DFA lexer instead of ply')
+    parse.add_argument('--rd-parser', dest='rdparser', action='store_true', default=False,
+                        help='Parse with the hand-written recursive descent parser instead of ply')
+    parse.add_argument('--fused', dest='fused', action='store_true', default=False,
+                        help='Type check proc bodies while generating tac in a single walk')
+    parse.add_argument('--jobs', dest='jobs', type=int, default=1,
+                        help='Type check the procs with this many processes')
+    parse.add_argument('--cache-dir', dest='cachedir', type=str, default=None,
+                        help='Reuse the tac, optimized tac and asm of unchanged procs stored in this directory')
+    parse.add_argument('--ast-cache-dir', dest='astcachedir', type=str, default=None,
+                        help='Reuse the parsed and type checked AST of an unchanged file stored in this directory')
     parse.add_argument('filename', metavar="FILE", type=str, nargs=1)
     args = parse.parse_args(sys.argv[1:])
 
@@ -1,4 +1,10 @@
-from typing import List, Set, Dict, Tuple
+import time
+from typing import List, Set, Dict, Tuple, Optional, Callable, TYPE_CHECKING
+from tac_store import TacStore, OPCODES, OPCODE_IDS, JMP, NONE
+
+# dominance.py reads Block, so it is only imported at run time on first use
+if TYPE_CHECKING:
+    from dominance import Dominance
 
 # ------------------------------------------------------------------------------#
 # Block Class
@@ -16,45 +22,154 @@ class Block:
                     "jl", "jle",
                     "jnl", "jnle",]
 
-    def __init__(self, instr: List[dict]) -> None:
-        self.__instrs: List[dict] = instr
-        self.__label: str = self.__instrs[0]["args"][0]
-        self.__successors: List[str] = list()
-        self.__pred: List[str] = list()
-        self.__cond_jmps: List[Tuple[int, dict]] = list()
+    # opcode ids of the above, the instructions are read from the TacStore arrays
+    jcc_ids = frozenset(OPCODE_IDS[jcc] for jcc in jccs)
+    __no_jmp_jcc_ids = frozenset(OPCODE_IDS[jcc] for jcc in __no_jmp_jccs)
+
+    def __init__(self, store: TacStore, instr: List[int]) -> None:
+        """ store: instructions of the proc
+            instr: indices of the block instructions in the store """
+        self.__store: TacStore = store
+        self.__instrs: List[int] = instr
+        self.__id: int = -1             # index in the block list of the CFG
+        self.__label: str = store.operands[store.args1[self.__instrs[0]]]
+        # number of jmp and jcc instrs of the block to each succ label, kept up
+        # to date by the instr helpers below
+        self.__successors: Dict[str, int] = dict()
+        # pred labels, only kept once the block is in a CFG (see attach)
+        self.__pred: Dict[str, None] = dict()
+        self.__lookup: Optional[Callable[[str], "Block"]] = None
+        self.__on_change: Optional[Callable[[str], None]] = None
+        self.__cond_jmps: List[Tuple[int, int]] = list()
+        self.__link_instrs(self.__instrs)
         self.update_cond_jmps()
 
+    # ---------------------------------------------------------------------------#
+    # Edge helpers
+
+    def attach(self, lookup: Callable[[str], "Block"], on_change: Callable[[str], None]) -> None:
+        """ Makes the block add itself to the preds of its succs, now and on
+            every later edit of its jumps
+            lookup: returns the block of a label in the CFG
+            on_change: called with the label of every block whose instrs or
+                       preds an edit changes """
+        self.__lookup = lookup
+        self.__on_change = on_change
+        for label in self.__successors:
+            lookup(label).add_pred(self.__label)
+
+    def add_pred(self, label: str) -> None:
+        """ Adds a pred label to the block """
+        self.__pred[label] = None
+
+    def remove_pred(self, label: str) -> None:
+        """ Removes a pred label from the block """
+        del self.__pred[label]
+
+    def __link(self, label: str) -> None:
+        """ Counts a new jump of the block to the label """
+        count = self.__successors.get(label, 0)
+        self.__successors[label] = count + 1
+        if self.__lookup is None:
+            return
+        self.__on_change(self.__label)
+        if count == 0:
+            self.__lookup(label).add_pred(self.__label)
+            self.__on_change(label)
+
+    def __unlink(self, label: str) -> None:
+        """ Uncounts a removed jump of the block to the label """
+        count = self.__successors[label] - 1
+        if count > 0:
+            self.__successors[label] = count
+        else:
+            del self.__successors[label]
+        if self.__lookup is None:
+            return
+        self.__on_change(self.__label)
+        if count == 0:
+            self.__lookup(label).remove_pred(self.__label)
+            self.__on_change(label)
+
+    def __link_instrs(self, instrs: List[int]) -> None:
+        """ Counts the jumps among instrs added to the block """
+        store = self.__store
+        opcodes, operands = store.opcodes, store.operands
+        jcc_ids = self.jcc_ids
+        for instr in instrs:
+            if opcodes[instr] in jcc_ids:
+                self.__link(operands[self.jmp_target(instr)])
+
+    def __unlink_instrs(self, instrs: List[int]) -> None:
+        """ Uncounts the jumps among instrs removed from the block """
+        store = self.__store
+        opcodes, operands = store.opcodes, store.operands
+        jcc_ids = self.jcc_ids
+        for instr in instrs:
+            if opcodes[instr] in jcc_ids:
+                self.__unlink(operands[self.jmp_target(instr)])
+
     # ---------------------------------------------------------------------------#
     # Instr helpers
 
     def add_jmp(self, label: str) -> None:
         """ Adds a jmp instr to the end of block """
+        store = self.__store
         if len(self.__instrs) > 0:
-            assert(self.__instrs[-1]["opcode"] != "jmp"), f"a jmp instr already exists {self.__instrs[-1]}"
-        self.__instrs.append({"opcode": "jmp", "args": [label], "result": None})
+            assert(store.opcodes[self.__instrs[-1]] != JMP), f"a jmp instr already exists {store.view(self.__instrs[-1])}"
+        self.__instrs.append(store.append(JMP, store.intern(label)))
+        self.__link(label)
 
     def last_instr_opcode(self) -> str:
         """ Returns the opcode of the last instr """
         assert(len(self.__instrs) > 0), f"There are no instr in: {self}"
-        return self.__instrs[-1]["opcode"]
+        return OPCODES[self.__store.opcodes[self.__instrs[-1]]]
 
     def last_instr_label(self) -> str:
         """ Returns the dest label of the last jmp instr """
         assert(len(self.__instrs) > 0), f"There are no instr in: {self}"
-        return self.__instrs[-1]["args"][-1]
+        return self.__store.operands[self.jmp_target(self.__instrs[-1])]
+
+    def jmp_target(self, instr: int) -> int:
+        """ Returns the operand id of the label a jmp or jcc instr jumps to """
+        store = self.__store
+        return store.args3[instr] or store.args2[instr] or store.args1[instr]
+
+    def jcc_operands(self, instr: int) -> Tuple[int, int]:
+        """ Returns the operand ids compared by a jcc instr, the second is NONE
+            when the jcc tests a single temp """
+        store = self.__store
+        return (store.args1[instr], store.args2[instr] if store.args3[instr] else NONE)
 
     def remove_last_jmp(self) -> None:
         """ Removes the last jmp instr of the block for coalescing """
-        assert(self.__instrs[-1]["opcode"] == "jmp"), f"Last instr is not jmp in the block {self.__instrs[-1]}"
-        self.__instrs = self.__instrs[:-1]
+        assert(self.__store.opcodes[self.__instrs[-1]] == JMP), f"Last instr is not jmp in the block {self.__store.view(self.__instrs[-1])}"
+        self.__unlink(self.__store.operands[self.jmp_target(self.__instrs.pop())])
 
-    def instructions(self) -> List[dict]:
-        """ Returns all block instrs """
+    def instructions(self) -> List[int]:
+        """ Returns the store indices of all block instrs """
         return self.__instrs
 
-    def add_instrs(self, instrs: List[dict]) -> None:
+    def get_store(self) -> TacStore:
+        """ Returns the store holding the block instrs """
+        return self.__store
+
+    def add_instrs(self, instrs: List[int]) -> None:
         """ Add instrs to the block for coalesce """
         self.__instrs += instrs
+        self.__link_instrs(instrs)
+        self.update_cond_jmps()
+        if self.__on_change is not None:
+            self.__on_change(self.__label)
+
+    def take_instrs(self) -> List[int]:
+        """ Removes and returns all instrs after the label for coalesce, the
+            block is left without succs """
+        instrs = self.__instrs[1:]
+        self.__unlink_instrs(instrs)
+        del self.__instrs[1:]
+        self.__cond_jmps = list()
+        return instrs
 
     # ---------------------------------------------------------------------------#
     # jcc instr helpers
@@ -62,46 +177,49 @@ class Block:
     def update_cond_jmps(self) -> None:
         """ Updates list of all cond jumps """
         cond_js = []
+        opcodes = self.__store.opcodes
         for index, instr in enumerate(self.__instrs):
-            if instr["opcode"] in self.__no_jmp_jccs:
+            if opcodes[instr] in self.__no_jmp_jcc_ids:
                 cond_js.append((index, instr))
         self.__cond_jmps = cond_js
 
-    def get_cond_jmps(self) -> List[Tuple[int, dict]]:
-        """ Returns cond jmps list with instr indexes """
+    def get_cond_jmps(self) -> List[Tuple[int, int]]:
+        """ Returns cond jmps list with block and store indexes """
         return self.__cond_jmps
 
-    def jcc_with_temp(self, temp: str) -> List[Tuple[int, dict]]:
-        """ Checks and returns all jcc instr with the temp """
+    def jcc_with_temp(self, temp: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """ Checks and returns all jcc instr comparing the temps (see jcc_operands) """
         cond_jmps = self.get_cond_jmps()
         jccs_with_temp = []
+        store = self.__store
         for index, instr in cond_jmps:
-            assert(instr["opcode"] in self.jccs), f"Wrong instr in cond_jmps: {instr}"
-            if instr["args"][0] == temp:
+            assert(store.opcodes[instr] in self.jcc_ids), f"Wrong instr in cond_jmps: {store.view(instr)}"
+            if self.jcc_operands(instr) == temp:
                 jccs_with_temp.append((index, instr))
         return jccs_with_temp
 
-    def is_temp_modified(self, start_index: int, stop_index: int, temp: str) -> bool:
-        """ Checks if the temp has been modified in the prev instr """
+    def is_temp_modified(self, start_index: int, stop_index: int, temp: Tuple[int, int]) -> bool:
+        """ Checks if one of the temps (see jcc_operands) has been modified in the prev instr """
         assert(start_index <= stop_index), f"start_index cannot be greater than stop_index for temp: {temp}"
         assert(stop_index < len(self.__instrs)), f"stop_index cannot be greater than instrs len for temp: {temp}"
+        results = self.__store.results
         for i in range(start_index, stop_index):
-            if self.__instrs[i]["result"] == temp:
+            result = results[self.__instrs[i]]
+            if result != NONE and result in temp:
                 return True 
         return False
 
     def del_after_cond_jmp(self, index: int) -> None:
         """ Removes all code after cond jmp """
         assert(index < len(self.__instrs)), f"index: {index} out of bounds for block instrs: {self.__instrs}"
-        self.__instrs = self.__instrs[:index]
+        self.__unlink_instrs(self.__instrs[index:])
+        del self.__instrs[index:]
     
     def del_cond_jmp(self, index: int) -> None:
         """ Deletes the cond jmp at given index """
         assert(index < len(self.__instrs)), f"Instr index: {index} out of range for {self.__instrs}"
-        if index == len(self.__instrs)-1:
-            self.__instrs = self.__instrs[:index]
-        else:
-            self.__instrs = self.__instrs[:index] + self.__instrs[index+1:]
+        self.__unlink_instrs([self.__instrs[index]])
+        del self.__instrs[index]
 
     # ---------------------------------------------------------------------------#
     # Label helpers
@@ -110,21 +228,25 @@ class Block:
         """ Returns the name of the block's label """
         return self.__label
 
-    def set_succ(self, succ: List[str]) -> None:
-        """ Sets the successor for the curr block """
-        self.__successors = succ
+    def get_id(self) -> int:
+        """ Returns the index of the block in the block list of its CFG """
+        return self.__id
 
-    def set_pred(self, preds: List[str]) -> None:
-        """ Sets the predecessor for the curr block """
-        self.__pred = preds
+    def set_id(self, block_id: int) -> None:
+        """ Sets the index of the block in the block list of its CFG """
+        self.__id = block_id
 
     def successors(self) -> List[str]:
         """ Returns all successors for current block """
-        return self.__successors
+        return list(self.__successors)
 
     def predecessors(self) -> list:
         """ Returns all predecessors for current block """
-        return self.__pred
+        return list(self.__pred)
+
+    def jumps_to(self, label: str) -> int:
+        """ Returns the number of jmp and jcc instrs of the block to the label """
+        return self.__successors.get(label, 0)
 
     def has_one_succ(self) -> bool:
         """ If block has one succ return True """
@@ -137,6 +259,35 @@ class Block:
         return len(self.__pred) == 1
 
 
+# ------------------------------------------------------------------------------#
+# Pass statistics
+# ------------------------------------------------------------------------------#
+
+class PassStats:
+    """ Counters of one CFG pass summed over its runs """
+    __slots__ = ('name', 'runs', 'visited', 'changes', 'removed', 'seconds')
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.runs: int = 0
+        self.visited: int = 0       # blocks (or pairs of blocks) looked at
+        self.changes: int = 0       # jccs resolved, jumps threaded or blocks merged
+        self.removed: int = 0       # blocks deleted
+        self.seconds: float = 0.0
+
+    def add(self, other: "PassStats") -> None:
+        """ Adds the counters of other, e.g. of another proc """
+        self.runs += other.runs
+        self.visited += other.visited
+        self.changes += other.changes
+        self.removed += other.removed
+        self.seconds += other.seconds
+
+    def __str__(self) -> str:
+        return (f"{self.name:<12} {self.runs:>6} runs {self.visited:>9} visited "
+                f"{self.changes:>8} changes {self.removed:>8} removed {self.seconds * 1000:10.2f} ms")
+
+
 # ------------------------------------------------------------------------------#
 # CFG Class
 # ------------------------------------------------------------------------------#
@@ -144,111 +295,147 @@ class Block:
 class CFG:
     """ Creates CFG representation for internal use """
 
-    def __init__(self, blocks: List[Block], func_name: str) -> None:
+    def __init__(self, blocks: List[Block], func_name: str, verify: bool = False,
+                 passes: Optional[Tuple[str, ...]] = None) -> None:
+        """ verify: cross-check the edges kept by the blocks against a full
+            rebuild from the instrs after every operation, for debugging
+            passes: names of the passes of a round in pass_registry, in order,
+                    by default CFG.passes """
         self.__proc_name: str = func_name
-        self.__blocks: List[Block] = blocks
+        # blocks by id, a deleted block leaves None until the list is compacted
+        self.__blocks: List[Optional[Block]] = blocks
         self.__num_blocks: int = len(self.__blocks)
         self.__entry_block: Block = self.__blocks[0]
-        self.__successors: Dict[str, List[str]] = dict()
-        self.__labels_to_blocks: Dict[str, Block] = {block.get_block_label(): block for block in self.__blocks}
-        self.__predecessors: Dict[str, List[str]] = dict()
+        self.__label_ids: Dict[str, int] = dict()
         self.__deleted_labels: Set[str] = set()
-        self.__ret_blocks: List[Block] = list()
-        self.__update_graph()
+        self.__verify: bool = verify
+        # analyses of the current blocks and edges, dropped on every edit
+        self.__dominance: Optional["Dominance"] = None
+        self.__compact()
+        # labels of the blocks changed since each pass last ran, the passes
+        # only look at these and their neighbours
+        self.__passes: Tuple[str, ...] = self.passes if passes is None else tuple(passes)
+        for name in self.__passes:
+            assert(name in self.pass_registry), f"Unknown CFG pass {name}"
+        self.__pending: Dict[str, Set[str]] = {name: set(self.__label_ids) for name in self.__passes}
+        # whether an edge changed since the last UCE, it starts with one
+        self.__uce_pending: bool = True
+        self.__stats: Dict[str, PassStats] = {name: PassStats(name) for name in ("uce",) + self.__passes}
+        self.__rounds: int = 0
+        # the blocks keep their succs and preds from here on
+        for block in self.__blocks:
+            block.attach(self.__block, self.__touch)
+        self.__check_graph("CFG creation")
 
     # ---------------------------------------------------------------------------#
     # Helper functions
 
-    def __update_edges(self) -> None:
-        """ Updates all edges in cfg blocks """
-        edges = {}
-        for block in self.__blocks:
-            # block_lab = block.get_block_label()
-            # print(block_lab)
-            dest = []
-            # if block_lab == "%.L10":
-            #     print(block.instructions())
-            for instr in block.instructions():
-                if instr["opcode"] in Block.jccs:
-                    if instr["args"][-1] not in dest:
-                        dest.append(instr["args"][-1])
-            edges[block.get_block_label()] = dest
-            # if block_lab == "%.L10":
-            #     print(dest)
-            block.set_succ(dest)
-        self.__successors = edges
-
-    def __update_pred_edges(self) -> None:
-        """ Updates the pred graph in the blocks """
-        pred_graph = {block.get_block_label(): [] for block in self.__blocks}
-        for block in self.__blocks:
-            # print(pred_graph)
-            # print(block.successors())
-            for label in block.successors():
-                assert(label in pred_graph), f"unidentified block label {label}"
-                pred_graph[label].append(block.get_block_label())
-        self.__predecessors = pred_graph
-        # update pred list in every block
-        for lab, preds in pred_graph.items():
-            self.__labels_to_blocks[lab].set_pred(preds)
+    def __block(self, label: str) -> Block:
+        """ Returns the block of the label """
+        return self.__blocks[self.__label_ids[label]]
+
+    def __touch(self, label: str) -> None:
+        """ Queues the block of the label for every pass after a change """
+        for labels in self.__pending.values():
+            labels.add(label)
+        self.__uce_pending = True
+        self.__dominance = None
 
     def __next(self, label: str) -> List[str]:
         """ Returns the succ labels of the curr label """
-        return self.__successors[label]
+        return self.__block(label).successors()
 
     def __prev(self, block_lab: str) -> List[str]:
         """ Returns the predecessor blocks for the current block """
-        pred_labels = self.__predecessors[block_lab]
-        return pred_labels
+        return self.__block(block_lab).predecessors()
 
-    def __update_graph(self) -> None:
-        """ updates edges in the CFG graph """
-        # update edges
-        self.__update_edges()
-        # print("successors: ", self.__successors)
-        # print("predecessors: ", self.__predecessors)
-        # print("blocks remaining: ", [block.get_block_label() for block in self.__blocks])
-        # update pred graph
-        self.__update_pred_edges()
-        # print("successors: ", self.__successors)
-        # print("predecessors: ", self.__predecessors)
+    def __rebuild_graph(self) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+        """ Returns the succ and pred labels of every block computed from all
+            the instrs, as the blocks should have kept them """
+        successors = {}
+        jcc_ids = Block.jcc_ids
+        for block in self.__blocks:
+            store = block.get_store()
+            opcodes, operands = store.opcodes, store.operands
+            successors[block.get_block_label()] = {operands[block.jmp_target(instr)]
+                                                   for instr in block.instructions()
+                                                   if opcodes[instr] in jcc_ids}
+        predecessors = {label: set() for label in successors}
+        for label, succs in successors.items():
+            for succ in succs:
+                assert(succ in predecessors), f"unidentified block label {succ}"
+                predecessors[succ].add(label)
+        return successors, predecessors
+
+    def __check_graph(self, operation: str) -> None:
+        """ Compares the edges of the blocks with a full rebuild if the CFG
+            verifies itself """
+        if not self.__verify:
+            return
+        successors, predecessors = self.__rebuild_graph()
+        for block in self.__blocks:
+            label = block.get_block_label()
+            assert(set(block.successors()) == successors[label]), \
+                f"succs of {label} after {operation}: {block.successors()} instead of {sorted(successors[label])}"
+            assert(set(block.predecessors()) == predecessors[label]), \
+                f"preds of {label} after {operation}: {block.predecessors()} instead of {sorted(predecessors[label])}"
 
     def __del_block(self, block: Block) -> None:
-        """ Delete the given block because it has no pred """
-        self.__blocks.remove(block)
-        self.__num_blocks = len(self.__blocks)
-        del self.__labels_to_blocks[block.get_block_label()]
+        """ Delete the given block because it has no pred, its place in the
+            block list is kept until __compact """
+        self.__blocks[block.get_id()] = None
+        self.__num_blocks -= 1
+        del self.__label_ids[block.get_block_label()]
+
+    def __compact(self) -> None:
+        """ Drops the places of the deleted blocks and renumbers the others in
+            order, the passes other than __uce only see compact lists """
+        self.__blocks = [block for block in self.__blocks if block is not None]
+        self.__label_ids = dict()
+        for block_id, block in enumerate(self.__blocks):
+            block.set_id(block_id)
+            self.__label_ids[block.get_block_label()] = block_id
         self.__entry_block = self.__blocks[0]
+        self.__dominance = None
 
     def __coalesce_blocks(self, block1: Block, block2: Block) -> Block:
-        """ Coalesce and return the first block """
+        """ Coalesce and return the first block, block2 is left with its label
+            only and no pred, for the next UCE """
         block1.remove_last_jmp()
-        block1.add_instrs(block2.instructions()[1:])
+        block1.add_instrs(block2.take_instrs())
         return block1
 
     def __coalescable(self, block1: Block, block2: Block) -> bool:
         """ Checks if given blocks are coalescable """
-        if block1.has_one_succ() and block2.has_one_pred():
-            assert(block1.last_instr_opcode() == "jmp"), f"Last instr in block is not jmp: {block2.instructions()}"
+        # a block merged in an earlier round may hold its only jump in a jcc
+        # and end with ret, and the jcc may meet the jmp
+        if block1.has_one_succ() and block2.has_one_pred() and block1.last_instr_opcode() == "jmp":
             assert(block2.last_instr_opcode() in ["jmp", "ret"]), f"Last instr in block is not jmp: {block2.instructions()}"
-            if block1.successors()[0] == block2.get_block_label():
+            if block1.successors()[0] == block2.get_block_label() and block1.jumps_to(block2.get_block_label()) == 1:
                 if block2.predecessors()[0] == block1.get_block_label():
                     return True
         return False
 
-    def __thread(self, block1: Block, block2: Block) -> None:
-        """ Threads two blocks """
-        # block2 can only have 2 instr including label and jmp
-        if len(block2.instructions()) == 2 and block2.last_instr_opcode() == "jmp":
-            # block2 can only have one pred
-            if len(self.__prev(block2.get_block_label())) == 1:
-                assert(block1.last_instr_opcode() == "jmp"), f"Last instr in block is not jmp: {block2.instructions()}"
-                # the two blocks should be connected to each other
-                if block1.last_instr_label() == block2.get_block_label():
+    def __thread(self, block1: Block, block2: Block) -> bool:
+        """ Threads two blocks, returns whether block1 was changed """
+        label2 = block2.get_block_label()
+        # block2 can only have 2 instr including label and jmp, to another block
+        if len(block2.instructions()) == 2 and block2.last_instr_opcode() == "jmp" and block2.last_instr_label() != label2:
+            # block2 can only have one pred, which ends with a jmp unless a
+            # merge of an earlier round left a jcc to block2 before a ret
+            if len(self.__prev(label2)) == 1 and block1.last_instr_opcode() == "jmp":
+                # the two blocks should be connected to each other, by the jmp only
+                if block1.last_instr_label() == label2 and block1.jumps_to(label2) == 1:
                     # print(block1.get_block_label(), block2.get_block_label())
+                    # block2 is unreachable now, its jmp goes with it so that
+                    # its target may be threaded or coalesced further
                     block1.remove_last_jmp()
-                    block1.add_jmp(block2.last_instr_label())
+                    block1.add_instrs(block2.take_instrs())
+                    return True
+        return False
 
+    # jcc t tests the sign of t and jcc a, b the sign of a - b, so both forms
+    # imply the same jccs on the same operands
     __jcc_direct_implication = {"jz":["jz"], "jnz":["jnz"],
                     "jl":["jl", "jle", "jnz"], "jle":["jle"],
                     "jnl":["jnl"], "jnle":["jnle", "jnl", "jnz"],}
@@ -257,21 +444,26 @@ class CFG:
                  "jl":["jnl", "jnle", "jz"], "jle":["jnle"],
                  "jnl":["jl"], "jnle":["jz", "jl", "jle"],}
 
-    def __check_jcc(self, block: Block) -> None:
-        """ Checks and updates block if it has removable cond jmp """
+    def __check_jcc(self, block: Block) -> int:
+        """ Checks and updates block if it has removable cond jmp, returns the
+            number of jccs of the dest blocks that were resolved """
+        resolved = 0
         jcc_instrs = block.get_cond_jmps()
+        store = block.get_store()
         # print(jcc_instrs)
         for index, instr in jcc_instrs:
-            dest_block_lab = instr["args"][-1]
-            dest_block = self.__labels_to_blocks[dest_block_lab]
-            temp = instr["args"][0]         # temporary compared in the jcc instr
-            jcc = instr["opcode"]           # jcc command
+            dest_block_lab = store.operands[block.jmp_target(instr)]
+            dest_block = self.__block(dest_block_lab)
+            temp = block.jcc_operands(instr)    # temporaries compared in the jcc instr (operand ids)
+            jcc = OPCODES[store.opcodes[instr]]     # jcc command
             
             # print(self.__prev(dest_block_lab))
             # print(block.get_block_label())
 
-            # if dest block has > one pred we can't modify the instr
-            if self.__prev(dest_block_lab) != [block.get_block_label()]:
+            # if dest block has > one pred we can't modify the instr, nor if
+            # the block also jumps there without the condition (once threading
+            # of an earlier round made the jcc and the jmp meet)
+            if self.__prev(dest_block_lab) != [block.get_block_label()] or block.jumps_to(dest_block_lab) > 1:
                 break
             
             # if no jcc in the dest block uses the temp for comparison, we can skip
@@ -292,16 +484,18 @@ class CFG:
                     break
 
                 # if jcc instr is a direct implication then it will be True
-                if dest_instr["opcode"] in self.__jcc_direct_implication[jcc]:
-                    dest_lab = dest_instr["args"][-1]
+                dest_jcc = OPCODES[store.opcodes[dest_instr]]
+                if dest_jcc in self.__jcc_direct_implication[jcc]:
+                    dest_lab = store.operands[dest_block.jmp_target(dest_instr)]
                     # delete all instr after curr jcc
                     dest_block.del_after_cond_jmp(dest_index)
                     # add uncond jmp instr to label of deleted jcc instr
                     dest_block.add_jmp(dest_lab)
+                    resolved += 1
                     break
                 
                 # if jcc instr is a direct neg implication then it will be False
-                if dest_instr["opcode"] in self.__jcc_neg_implications[jcc]:
+                if dest_jcc in self.__jcc_neg_implications[jcc]:
                     # add the instr to be deleted later
                     # print(dest_index, dest_instr)
                     instr_index_to_delete.append(dest_index)
@@ -311,17 +505,29 @@ class CFG:
             # delete False cond jmps in reverse
             for index in instr_index_to_delete[::-1]:
                 dest_block.del_cond_jmp(index)
+            resolved += len(instr_index_to_delete)
 
             # update cond jmps list in the block
             dest_block.update_cond_jmps()
+        return resolved
 
     # ---------------------------------------------------------------------------#
     # CFG Operations
 
+    def pending_blocks(self, name: str) -> List[Block]:
+        """ Takes the labels queued for the pass and returns their blocks that
+            are still in the CFG, in block order """
+        labels = self.__pending[name]
+        self.__pending[name] = set()
+        label_ids = self.__label_ids
+        block_ids = sorted(label_ids[label] for label in labels if label in label_ids)
+        self.__stats[name].visited += len(block_ids)
+        return [self.__blocks[block_id] for block_id in block_ids]
+
     def __uce(self) -> None:
         """ Unreachable Code Elimination """
         visited_blocks = {self.__entry_block.get_block_label()}
-        to_visit = self.__entry_block.successors()
+        to_visit = list(self.__entry_block.successors())
         # print("successors: ", self.__successors)
         # print("predecessors: ", self.__predecessors)
         # print("blocks remaining: ", [block.instructions() for block in self.__blocks if block.get_block_label() == "%.L10"])
@@ -330,17 +536,22 @@ class CFG:
             label = to_visit.pop()
             if label not in visited_blocks:
                 visited_blocks.add(label)
-                for lab in self.__next(label):
-                    if lab != label and lab not in to_visit: 
-                        to_visit.append(lab)
-        # now delete UC
-        to_delete = []
+                to_visit.extend(self.__next(label))
+        # now delete UC, the reachable blocks forget their unreachable preds
+        removed = 0
         for block in self.__blocks:
-            if block.get_block_label() not in visited_blocks:
-                to_delete.append(block)
-        for block in to_delete:
-            self.__deleted_labels.add(block.get_block_label())
-            self.__del_block(block)
+            label = block.get_block_label()
+            if label not in visited_blocks:
+                for succ in block.successors():
+                    if succ in visited_blocks:
+                        self.__block(succ).remove_pred(label)
+                        self.__touch(succ)
+                self.__deleted_labels.add(label)
+                self.__del_block(block)
+                removed += 1
+        if self.__num_blocks < len(self.__blocks):
+            self.__compact()
+        self.__uce_pending = False
 
         # print("successors: ", self.__successors)
         # print("predecessors: ", self.__predecessors)
@@ -349,100 +560,175 @@ class CFG:
         #     print(block.instructions())
         print("UCE done")
 
-        self.__update_graph()
+        self.__check_graph("UCE")
+        stats = self.__stats["uce"]
+        stats.visited += len(visited_blocks) + removed
+        stats.removed += removed
 
-    def __coalesce(self) -> None:
+    def __coalesce(self) -> int:
         """ Coalesce two blocks if one succ and one pred """
-        # we go bottom-up because if two blocks can be coalesced then 
-        # the bottom block is shifted to the one above. This is faster to
-        # implement than top-bottom where we'll need to run nested for loop 
-        index = self.__num_blocks-1
-        while index > 0:
-            block = self.__blocks[index]
-            prev_block = self.__blocks[index-1]
-            if self.__coalescable(prev_block, block):
-                self.__blocks[index-1] = self.__coalesce_blocks(prev_block, block)
-            index -= 1
-        self.__update_graph()
+        # a queued block absorbs its succ for as long as they are coalescable,
+        # which merges a whole chain into its first block. The absorbed blocks
+        # keep their label only and are unreachable until the next UCE
+        merged = 0
+        for block in self.pending_blocks("coalesce"):
+            while block.has_one_succ():
+                succ = self.__block(block.successors()[0])
+                if succ is block or not self.__coalescable(block, succ):
+                    break
+                self.__coalesce_blocks(block, succ)
+                merged += 1
+        self.__check_graph("coalescing")
 
         # for block in self.__blocks:
         #     print(block.instructions())
         print("Coalesce done")
 
-        self.__uce()
+        return merged
 
-    def __jmp_thread(self) -> None:
+    def __jmp_thread(self) -> int:
         """ Implement jmp threading for uncond jumps """       
-        # we implement same idea described in coalescing
-        index = self.__num_blocks - 1
-        while index > 0:
-            block = self.__blocks[index]
-            prev_block = self.__blocks[index-1]
-            self.__thread(prev_block, block)
-            index -= 1
-        self.__update_graph()
+        # we implement same idea described in coalescing: a queued block
+        # follows its jmp through as many jmp-only blocks as it can
+        threaded = 0
+        for block in self.pending_blocks("jmp_thread"):
+            while block.last_instr_opcode() == "jmp":
+                succ = self.__block(block.last_instr_label())
+                if succ is block or not self.__thread(block, succ):
+                    break
+                threaded += 1
+        self.__check_graph("jmp threading")
 
         # for block in self.__blocks:
         #     print(block.instructions())
         print("jmp thread done")
-        
-        self.__uce()
-        self.__coalesce()
 
-    def __jmp_cond_mod(self) -> None:
+        return threaded
+
+    def __jmp_cond_mod(self) -> int:
         """ Jump threading to convert cond jmps to uncond jmps """     
-        for block in self.__blocks:
-            self.__check_jcc(block)
-            if block not in self.__ret_blocks:
-                self.__ret_blocks.append(block)
-        self.__update_graph()
+        # a block is checked again when it or a block it jumps to changed
+        block_ids = set()
+        for block in self.pending_blocks("jmp_cond"):
+            block_ids.add(block.get_id())
+            for label in block.predecessors():
+                block_ids.add(self.__label_ids[label])
+        resolved = 0
+        for block_id in sorted(block_ids):
+            resolved += self.__check_jcc(self.__blocks[block_id])
+        self.__check_graph("cond jmp threading")
 
         # for block in self.__blocks:
         #     print(block.instructions())
         print("jmp cond done")
 
-        self.__uce()
-        self.__jmp_thread()
-
-    def optimization(self) -> None:
-        """ Carry out CFG optimizations """
-        self.__jmp_cond_mod()
+        return resolved
+
+    # passes by name: a pass takes the CFG, works on the blocks of
+    # pending_blocks(name) and returns the number of changes it made
+    pass_registry: Dict[str, Callable[["CFG"], int]] = {
+        "jmp_cond": __jmp_cond_mod,
+        "jmp_thread": __jmp_thread,
+        "coalesce": __coalesce,
+    }
+
+    # default passes of a round in order, UCE runs after every pass that
+    # changed an edge
+    passes: Tuple[str, ...] = ("jmp_cond", "jmp_thread", "coalesce")
+
+    @classmethod
+    def register_pass(cls, name: str, function: Callable[["CFG"], int]) -> None:
+        """ Adds a pass to the registry, see pass_registry """
+        assert(name not in cls.pass_registry and name != "uce"), f"CFG pass {name} already exists"
+        cls.pass_registry[name] = function
+
+    def __run_pass(self, name: str) -> bool:
+        """ Runs the pass on its queued blocks, then UCE if needed, returns
+            whether the pass changed the CFG """
+        stats = self.__stats[name]
+        start = time.perf_counter()
+        changes = self.pass_registry[name](self)
+        stats.runs += 1
+        stats.changes += changes
+        stats.seconds += time.perf_counter() - start
+        if self.__uce_pending:
+            stats = self.__stats["uce"]
+            start = time.perf_counter()
+            self.__uce()
+            stats.runs += 1
+            stats.seconds += time.perf_counter() - start
+        return changes > 0
+
+    def optimization(self, budget: int = 16) -> None:
+        """ Carry out CFG optimizations: rounds of the passes over the blocks
+            changed since each pass last ran, until a round changes nothing
+            or budget rounds ran """
+        while self.__rounds < budget:
+            self.__rounds += 1
+            changed = False
+            for name in self.__passes:
+                changed = self.__run_pass(name) or changed
+            if not changed:
+                break
         # exit(0)
 
+    def pass_stats(self) -> List[PassStats]:
+        """ Returns the statistics of UCE and of every pass """
+        return list(self.__stats.values())
+
+    def get_rounds(self) -> int:
+        """ Returns the number of rounds optimization ran """
+        return self.__rounds
+
+    # ---------------------------------------------------------------------------#
+    # Analyses
+
+    def dominance(self) -> "Dominance":
+        """ Returns the dominance analysis of the blocks, see dominance.py,
+            computed again on the first call after an edit """
+        if self.__dominance is None:
+            from dominance import Dominance
+            self.__dominance = Dominance(self.__blocks)
+        return self.__dominance
+
     # ---------------------------------------------------------------------------#
     # Serialization
 
     def __serialize(self) -> List[Block]:
         """ Serialisation from CFG to TAC """
+        blocks = self.__blocks
         curr_block: Block = self.__entry_block
         scheduled: List[Block] = list()
-        remaining_blocks: List[Block] = self.__blocks.copy()
-        # print(self.__labels_to_blocks)
+        scheduled_ids: Set[int] = set()
+        # the blocks before the first remaining one are all scheduled
+        first_remaining = 0
         
         # All blocks end with jmp or ret so we string jmp blocks together
         while len(scheduled) < self.__num_blocks:
             scheduled.append(curr_block)
-            remaining_blocks.remove(curr_block)
+            scheduled_ids.add(curr_block.get_id())
+            while first_remaining < len(blocks) and first_remaining in scheduled_ids:
+                first_remaining += 1
             last_instr_code = curr_block.last_instr_opcode()
             # once we hit a ret block we must add first unscheduled block
             if last_instr_code == "ret":
-                if len(remaining_blocks) > 0:
-                    curr_block = remaining_blocks[0]
+                if first_remaining < len(blocks):
+                    curr_block = blocks[first_remaining]
                 continue
             assert(last_instr_code == "jmp"), f"Last instr should be jmp: {curr_block.instructions()[-1]}"
             next_lab = curr_block.last_instr_label()
-            curr_block = self.__labels_to_blocks[next_lab]
+            curr_block = self.__block(next_lab)
             # if curr block is a loop then we get out of it if blocks remain
-            if curr_block in scheduled:
-                if len(remaining_blocks) > 0:
-                    curr_block = remaining_blocks[0]
+            if curr_block.get_id() in scheduled_ids:
+                if first_remaining < len(blocks):
+                    curr_block = blocks[first_remaining]
         
         return scheduled
 
-    def serialized_tac(self) -> List[dict]:
+    def serialized_tac(self) -> TacStore:
         """ Returns serialized Blocks converted to TAC form """
         blocks = self.__serialize()
         tac_instrs = []
         for block in blocks:
             tac_instrs += block.instructions()
-        return tac_instrs
+        return self.__entry_block.get_store().select(tac_instrs)
@@ -0,0 +1,211 @@
+"""
+    Table-driven DFA scanner for BX.
+
+    It produces the same token stream as the ply rules in scanner.py
+    (including their quirks, e.g. `-1` is a single NUMBER and a comment
+    swallows its newline without bumping the line count) but avoids the
+    per-token regex dispatch and LexToken allocation of ply.lex.
+"""
+
+from typing import Dict, Iterator, List, Union
+from scanner import reserved
+
+# ------------------------------------------------------------------------------#
+# Token representation
+# ------------------------------------------------------------------------------#
+
+class Token:
+    """ Compact token record exposing the attributes ply.yacc reads.
+        ply.yacc sets attributes on tokens during error recovery, so
+        this is a __slots__ class rather than a tuple """
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type: str, value: Union[str, int], lineno: int, lexpos: int) -> None:
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __iter__(self) -> Iterator:
+        return iter((self.type, self.value, self.lineno, self.lexpos))
+
+    def __repr__(self) -> str:
+        # same format as ply's LexToken so that error messages do not change
+        return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
+
+# ------------------------------------------------------------------------------#
+# DFA construction
+# ------------------------------------------------------------------------------#
+
+# operator lexemes and their token types (see t_* rules in scanner.py)
+_operators: Dict[str, str] = {
+    "+": "PLUS", "-": "MINUS", "*": "MULTIPLY", "/": "DIVIDE", "%": "PERCENT",
+    "=": "EQUALS", ";": "SEMICOLON", ":": "COLON", ",": "COMMA",
+    "(": "LPAREN", ")": "RPAREN", "{": "LBRACE", "}": "RBRACE",
+    "&": "BITWISE_AND", "|": "BITWISE_OR", "^": "BITWISE_XOR", "~": "BITWISE_NEGATION",
+    "<<": "LOGICAL_SHIFT_LEFT", ">>": "LOGICAL_SHIFT_RIGHT",
+    "==": "CMPE", "!=": "CMPNE", "<": "CMPL", "<=": "CMPLE", ">": "CMPG", ">=": "CMPGE",
+    "&&": "AND", "||": "OR", "!": "NOT",
+}
+
+# pseudo token types that need extra work when accepted
+_IDENT = "IDENT"
+_NUMBER = "NUMBER"
+_NEWLINE = "newline"
+_COMMENT = "comment"
+
+# character classes: every operator character gets its own class
+_C_OTHER, _C_SPACE, _C_NEWLINE, _C_LETTER, _C_ZERO, _C_DIGIT, _C_UNDERSCORE = range(7)
+_char_classes: Dict[str, int] = {" ": _C_SPACE, "\t": _C_SPACE, "\n": _C_NEWLINE, "_": _C_UNDERSCORE, "0": _C_ZERO}
+for _ch in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz":
+    _char_classes[_ch] = _C_LETTER
+for _ch in "123456789":
+    _char_classes[_ch] = _C_DIGIT
+_num_classes: int = _C_UNDERSCORE + 1
+for _ch in sorted(set("".join(_operators))):
+    _char_classes[_ch] = _num_classes
+    _num_classes += 1
+
+class _ClassTable(dict):
+    """ str.translate table mapping every character to its class """
+    def __missing__(self, code: int) -> int:
+        return _C_OTHER
+
+_translate_table = _ClassTable({ord(ch): cls for ch, cls in _char_classes.items()})
+
+# transition table (-1 is the dead state, -2 marks ignored characters in the
+# start state) and accepted token type per state
+_SKIP = -2
+_delta: List[List[int]] = []
+_accept: List[str] = []
+
+def _new_state(accept: str = None) -> int:
+    """ adds a state to the DFA and returns its number """
+    _delta.append([-1] * _num_classes)
+    _accept.append(accept)
+    return len(_delta) - 1
+
+def _build_dfa() -> None:
+    """ Builds the transition table for the BX token rules """
+    start = _new_state()
+    _delta[start][_C_SPACE] = _SKIP
+
+    # identifiers and reserved words
+    ident = _new_state(_IDENT)
+    _delta[start][_C_LETTER] = ident
+    for cls in (_C_LETTER, _C_ZERO, _C_DIGIT, _C_UNDERSCORE):
+        _delta[ident][cls] = ident
+
+    # numbers: 0 | -?[1-9][0-9]*
+    zero = _new_state(_NUMBER)
+    _delta[start][_C_ZERO] = zero
+    number = _new_state(_NUMBER)
+    _delta[start][_C_DIGIT] = number
+    _delta[number][_C_ZERO] = number
+    _delta[number][_C_DIGIT] = number
+
+    _delta[start][_C_NEWLINE] = _new_state(_NEWLINE)
+
+    # operators as a trie over their characters
+    for lexeme in sorted(_operators, key=len):
+        state = start
+        for ch in lexeme[:-1]:
+            state = _delta[state][_char_classes[ch]]
+        _delta[state][_char_classes[lexeme[-1]]] = _new_state(_operators[lexeme])
+
+    # the NUMBER rule takes priority over MINUS for negative literals
+    _delta[_delta[start][_char_classes["-"]]][_C_DIGIT] = number
+
+    # comments: //.*\n?
+    slash = _delta[start][_char_classes["/"]]
+    comment = _new_state(_COMMENT)
+    _delta[slash][_char_classes["/"]] = comment
+    for cls in range(_num_classes):
+        _delta[comment][cls] = comment
+    _delta[comment][_C_NEWLINE] = _new_state(_COMMENT)
+
+    # the scanner relies on every state but the start state being accepting
+    assert(None not in _accept[1:]), "DFA has a non-accepting inner state"
+
+_build_dfa()
+
+# ------------------------------------------------------------------------------#
+# Scanner
+# ------------------------------------------------------------------------------#
+
+class DFALexer:
+    """ Lexer object with the input()/token() interface used by ply.yacc """
+    def __init__(self) -> None:
+        self.lineno: int = 1
+        self.lexpos: int = 0
+        self.__tokens: Iterator[Token] = iter(())
+
+    def input(self, data: str) -> None:
+        """ Sets the text to be scanned """
+        self.lineno = 1
+        self.lexpos = 0
+        self.__tokens = self.__scan(data)
+
+    def token(self) -> Token:
+        """ Returns the next token or None at end of input """
+        return next(self.__tokens, None)
+
+    def __iter__(self) -> Iterator[Token]:
+        return self.__tokens
+
+    def __scan(self, data: str) -> Iterator[Token]:
+        """ Runs the DFA with maximal munch over the data """
+        codes = data.translate(_translate_table).encode("latin-1")
+        delta, accept = _delta, _accept
+        start = delta[0]
+        length = len(data)
+        lineno = 1
+        pos = 0
+
+        while pos < length:
+            state = start[codes[pos]]
+            if state < 0:
+                if state != _SKIP:
+                    print(f"Lexing error: Illegal Character '{data[pos]}' on line {lineno} ")
+                pos += 1
+                continue
+
+            # every state but the start state is accepting, so the longest
+            # run through the automaton is the maximal munch
+            end = pos + 1
+            row = delta[state]
+            while end < length:
+                nxt = row[codes[end]]
+                if nxt < 0:
+                    break
+                if nxt != state:
+                    state = nxt
+                    row = delta[state]
+                end += 1
+            kind = accept[state]
+
+            if kind is _NEWLINE:
+                lineno += 1
+            elif kind is not _COMMENT:
+                lexeme = data[pos:end]
+                if kind is _IDENT:
+                    kind = reserved.get(lexeme, _IDENT)
+                    value = lexeme
+                elif kind is _NUMBER:
+                    value = int(lexeme)
+                else:
+                    value = lexeme
+                # keep the position attributes in sync like ply's lexer does
+                self.lineno = lineno
+                self.lexpos = end
+                yield Token(kind, value, lineno, pos)
+            pos = end
+
+        self.lineno = lineno
+        self.lexpos = length + 1
+
+def tokenize(data: str) -> List[Token]:
+    """ Returns the list of all tokens in data """
+    lexer = DFALexer()
+    lexer.input(data)
+    return list(lexer)
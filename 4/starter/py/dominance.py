@@ -0,0 +1,229 @@
+"""
+    Dominance analysis of the blocks of a CFG.
+
+    The blocks reachable from the entry are numbered in reverse postorder
+    and every array below is indexed by that number, so the entry is 0 and
+    a block comes after its immediate dominator. The immediate dominators
+    are found with the iterative algorithm of Cooper, Harvey and Kennedy
+    ("A Simple, Fast Dominance Algorithm"), which walks the blocks in
+    reverse postorder until no idom changes, two or three sweeps on the
+    CFGs bx produces. The dominator tree is numbered by a preorder walk so
+    that dominates is two comparisons, and the dominance frontiers are
+    collected by walking up from the preds of every join block.
+
+    The preds, children and frontiers of the blocks are kept as one flat
+    list of rpo numbers each, the entries of block n running from start[n]
+    to start[n + 1], rather than one list per block: a list per block of a
+    100k block proc is enough allocations to set off the garbage collector
+    over the whole heap of the compiler several times.
+
+    Unreachable blocks, which UCE has not removed yet, are left out: they
+    have no idom and dominate nothing.
+"""
+
+from typing import List, Dict, Tuple, Iterable, Optional
+from cfg import Block
+
+class Dominance:
+    """ Reverse postorder, dominator tree and dominance frontiers of the
+        blocks of a CFG, see cfg.CFG.dominance """
+
+    def __init__(self, blocks: List[Block]) -> None:
+        """ blocks: the blocks of the CFG, the entry first """
+        label_ids = {block.get_block_label(): block_id for block_id, block in enumerate(blocks)}
+        order = self.__reverse_postorder(blocks, label_ids)
+        # rpo numbers by label, blocks by rpo number
+        self.__rpo: Dict[str, int] = dict()
+        self.__blocks: List[Block] = list()
+        for block_id in order:
+            self.__rpo[blocks[block_id].get_block_label()] = len(self.__blocks)
+            self.__blocks.append(blocks[block_id])
+        rpo = self.__rpo
+        pred_start, preds = [0], []
+        for block in self.__blocks:
+            preds.extend(rpo[label] for label in block.predecessors() if label in rpo)
+            pred_start.append(len(preds))
+        self.__iterations: int = 0
+        self.__idom: List[int] = self.__immediate_dominators(pred_start, preds)
+        nodes = range(1, len(self.__blocks))
+        self.__child_start, self.__children = self.__group([self.__idom[node] for node in nodes], nodes)
+        self.__pre: List[int] = list()
+        self.__last: List[int] = list()
+        self.__number_tree()
+        self.__frontier_start, self.__frontiers = self.__dominance_frontiers(pred_start, preds)
+
+    # ---------------------------------------------------------------------------#
+    # Analysis
+
+    def __group(self, keys: Iterable[int], values: Iterable[int]) -> Tuple[List[int], List[int]]:
+        """ Returns the start list and the flat list of the values grouped by
+            their keys, rpo numbers of blocks, in the order they come """
+        start = [0] * (len(self.__blocks) + 1)
+        keys = list(keys)
+        for key in keys:
+            start[key + 1] += 1
+        for node in range(len(self.__blocks)):
+            start[node + 1] += start[node]
+        flat = [0] * len(keys)
+        free = start[:-1]
+        for key, value in zip(keys, values):
+            flat[free[key]] = value
+            free[key] += 1
+        return start, flat
+
+    def __reverse_postorder(self, blocks: List[Block], label_ids: Dict[str, int]) -> List[int]:
+        """ Returns the ids of the blocks reachable from the entry in reverse
+            postorder, the walk keeps its own stack for deep procs and only
+            holds the succs of the blocks on it """
+        visited = bytearray(len(blocks))
+        postorder: List[int] = list()
+        if not blocks:
+            return postorder
+        visited[0] = 1
+        stack, succs, next_succ = [0], [blocks[0].successors()], [0]
+        while stack:
+            node_succs = succs[-1]
+            index = next_succ[-1]
+            if index < len(node_succs):
+                next_succ[-1] = index + 1
+                succ = label_ids[node_succs[index]]
+                if not visited[succ]:
+                    visited[succ] = 1
+                    stack.append(succ)
+                    succs.append(blocks[succ].successors())
+                    next_succ.append(0)
+            else:
+                postorder.append(stack.pop())
+                succs.pop()
+                next_succ.pop()
+        postorder.reverse()
+        return postorder
+
+    def __immediate_dominators(self, pred_start: List[int], preds: List[int]) -> List[int]:
+        """ Returns the idom of every block by rpo number, the entry is its own
+            idom """
+        size = len(pred_start) - 1
+        idom = [-1] * size
+        if not size:
+            return idom
+        idom[0] = 0
+        changed = True
+        while changed:
+            changed = False
+            self.__iterations += 1
+            for node in range(1, size):
+                new_idom = -1
+                for index in range(pred_start[node], pred_start[node + 1]):
+                    pred = preds[index]
+                    if idom[pred] < 0:      # not reached by this sweep yet
+                        continue
+                    if new_idom < 0:
+                        new_idom = pred
+                        continue
+                    # intersect: climb the tree from the later block until
+                    # both fingers meet at the common dominator
+                    finger1, finger2 = pred, new_idom
+                    while finger1 != finger2:
+                        while finger1 > finger2:
+                            finger1 = idom[finger1]
+                        while finger2 > finger1:
+                            finger2 = idom[finger2]
+                    new_idom = finger1
+                if idom[node] != new_idom:
+                    idom[node] = new_idom
+                    changed = True
+        return idom
+
+    def __number_tree(self) -> None:
+        """ Numbers the dominator tree in preorder, a block dominates the
+            blocks numbered from its own number to the last of its subtree """
+        size = len(self.__blocks)
+        self.__pre = [0] * size
+        self.__last = [0] * size
+        if not size:
+            return
+        child_start, children = self.__child_start, self.__children
+        count = 0
+        stack, next_child = [0], [child_start[0]]
+        self.__pre[0] = count
+        while stack:
+            node = stack[-1]
+            index = next_child[-1]
+            if index < child_start[node + 1]:
+                next_child[-1] = index + 1
+                child = children[index]
+                count += 1
+                self.__pre[child] = count
+                stack.append(child)
+                next_child.append(child_start[child])
+            else:
+                self.__last[node] = count
+                stack.pop()
+                next_child.pop()
+
+    def __dominance_frontiers(self, pred_start: List[int], preds: List[int]) -> Tuple[List[int], List[int]]:
+        """ Returns the start list and the flat list of the dominance frontiers
+            by rpo number: each pred of a join block and its dominators up to
+            the idom of the join have the join in their frontier """
+        idom = self.__idom
+        # last join added to the frontier of every block
+        last_join = [-1] * (len(pred_start) - 1)
+        runners, joins = [], []
+        for node in range(len(pred_start) - 1):
+            if pred_start[node + 1] - pred_start[node] < 2:
+                continue
+            for index in range(pred_start[node], pred_start[node + 1]):
+                runner = preds[index]
+                while runner != idom[node]:
+                    # the walks of the earlier preds went on from here
+                    if last_join[runner] == node:
+                        break
+                    last_join[runner] = node
+                    runners.append(runner)
+                    joins.append(node)
+                    runner = idom[runner]
+        return self.__group(runners, joins)
+
+    # ---------------------------------------------------------------------------#
+    # Queries
+
+    def __labels(self, start: List[int], flat: List[int], label: str) -> List[str]:
+        """ Returns the labels of the entries of the block of the label in the
+            flat list """
+        node = self.__rpo[label]
+        return [self.__blocks[entry].get_block_label() for entry in flat[start[node]:start[node + 1]]]
+
+    def reverse_postorder(self) -> List[Block]:
+        """ Returns the blocks reachable from the entry in reverse postorder """
+        return list(self.__blocks)
+
+    def is_reachable(self, label: str) -> bool:
+        """ Returns whether the block of the label is reachable from the entry """
+        return label in self.__rpo
+
+    def idom(self, label: str) -> Optional[str]:
+        """ Returns the label of the immediate dominator of the block, None for
+            the entry """
+        node = self.__rpo[label]
+        if node == 0:
+            return None
+        return self.__blocks[self.__idom[node]].get_block_label()
+
+    def dominates(self, label1: str, label2: str) -> bool:
+        """ Returns whether the first block dominates the second, every block
+            dominates itself """
+        node1, node2 = self.__rpo[label1], self.__rpo[label2]
+        return self.__pre[node1] <= self.__pre[node2] <= self.__last[node1]
+
+    def children(self, label: str) -> List[str]:
+        """ Returns the labels of the blocks the block immediately dominates """
+        return self.__labels(self.__child_start, self.__children, label)
+
+    def frontier(self, label: str) -> List[str]:
+        """ Returns the labels of the dominance frontier of the block """
+        return self.__labels(self.__frontier_start, self.__frontiers, label)
+
+    def iterations(self) -> int:
+        """ Returns the number of sweeps the idoms took to settle, the last
+            one changes nothing """
+        return self.__iterations
@@ -3,6 +3,7 @@
 """
 
 from typing import List, Any
+from tac_store import Temp, Label
 
 # ---------------------------------------------------------------------#
 # Macros used in bxast
@@ -68,6 +69,69 @@ class tacMacros:
         "cmple": "jle", "cmpge": "jnl",
     }
 
+    # r = setcc a, b is 1 if a compares to b as jcc a, b would jump, else 0
+    set_map = {
+        "cmpe": "setz", "cmpne": "setnz",
+        "cmpl": "setl", "cmpg": "setnle",
+        "cmple": "setle", "cmpge": "setnl",
+    }
+
+    negated_map = {
+        "cmpe": "cmpne", "cmpne": "cmpe",
+        "cmpl": "cmpge", "cmpge": "cmpl",
+        "cmpg": "cmple", "cmple": "cmpg",
+    }
+
+    @staticmethod
+    def wrap(value: int) -> int:
+        """ Returns the value as a signed 64-bit two's complement integer """
+        return ((value + (1 << 63)) & ((1 << 64) - 1)) - (1 << 63)
+
+    @staticmethod
+    def _div(u: int, v: int) -> int:
+        """ Division rounding towards zero as idivq, None where idivq traps """
+        if v == 0 or (u == -(1 << 63) and v == -1):
+            return None
+        quotient = abs(u) // abs(v)
+        return quotient if (u < 0) == (v < 0) else -quotient
+
+    @staticmethod
+    def _mod(u: int, v: int) -> int:
+        """ Remainder of _div, it has the sign of u """
+        quotient = tacMacros._div(u, v)
+        return None if quotient is None else u - v * quotient
+
+    # evaluation of the operators on constant operands as tacrun and x64 do it,
+    # a None result leaves the operation to run time
+    fold_binops = {
+        "add": (lambda u, v: u + v),
+        "sub": (lambda u, v: u - v),
+        "mul": (lambda u, v: u * v),
+        "div": (lambda u, v: tacMacros._div(u, v)),
+        "mod": (lambda u, v: tacMacros._mod(u, v)),
+        "and": (lambda u, v: u & v),
+        "or":  (lambda u, v: u | v),
+        "xor": (lambda u, v: u ^ v),
+        # salq and sarq only use the low 6 bits of the count, tacrun does not
+        "shl": (lambda u, v: u << v if 0 <= v < 64 else None),
+        "shr": (lambda u, v: u >> v if 0 <= v < 64 else None),
+    }
+
+    fold_unops = {
+        "neg": (lambda u: -u),
+        "not": (lambda u: ~u),
+    }
+
+    # a comparison jcc a, b, L jumps on the sign of a - b, without overflow
+    fold_jumps = {
+        "jz":   (lambda k: k == 0),
+        "jnz":  (lambda k: k != 0),
+        "jl":   (lambda k: k < 0),
+        "jle":  (lambda k: k <= 0),
+        "jnl":  (lambda k: k >= 0),
+        "jnle": (lambda k: k > 0),
+    }
+
 # ---------------------------------------------------------------------#
 # Macros used in x64
 # ---------------------------------------------------------------------#
@@ -103,6 +167,8 @@ class x64Macros:
     _unops = { 'neg': 'negq',
                'not': 'notq'}
 
+    _setcc = ("setz", "setnz", "setl", "setle", "setnl", "setnle")
+
     _jcc = ["je", "jz",       # Src2 == Src1
            "jne", "jnz",      # Src2 != Src1
            "jl", "jnge",      # Src2 < Src1
@@ -132,22 +198,16 @@ class x64Macros:
     # ---------------------------------------------------------------------#
         
     @staticmethod
-    def _assert_temporary(temp: str, instr: dict) -> None:
+    def _assert_temporary(temp: Any, instr: dict) -> None:
         """ Checks if temporary is of correct format """
-        assert (isinstance(temp, str)), f"Comparison can only happen with str in {instr}"
-        if temp[0] == "@":
-            assert (temp[1:].isalpha()), f'Global variable must be alpha in {instr}'
-        else:
-            assert (temp[0] == '%' and \
-                    temp[1:].isnumeric()), f'Invalid format for temporary in {instr}'
+        if not isinstance(temp, Temp):
+            assert (isinstance(temp, str) and temp[0] == "@" and \
+                    temp[1:].isalpha()), f'Invalid format for temporary in {instr}'
 
     @staticmethod
-    def _assert_label(arg: str, instr: dict) -> None:
+    def _assert_label(arg: Any, instr: dict) -> None:
         """ Checks if label is of correct format """
-        assert (isinstance(arg, str) and \
-                arg.startswith('%.L') and \
-                arg[3:] == "entry" or arg[3:].isnumeric()), \
-                f'Invalid format for label in {instr}'
+        assert (isinstance(arg, Label)), f'Invalid format for label in {instr}'
 
     @staticmethod
     def _assert_argument_numb(args: List, num: int, instr: dict) -> None:
@@ -5,6 +5,8 @@ from scanner import tokens
 import sys
 import scanner
 import ply.lex as lex
+from dfa_scanner import DFALexer
+from rd_parser import RDParser
 
 """
 Authors: Yi Yao Tan 
@@ -38,7 +40,7 @@ __binop_dict = {
                 '||': "logical-or",
 }
 
-lexer = lex.lex(module=scanner)
+lexer = lex.lex(module=scanner, tabcache=True)
 previous_functions = []
 precedence = (
     ('left', 'OR'),
@@ -322,14 +324,20 @@ def p_error(p):
         print(f"Syntax error: at EOF")
     sys.exit(1)
 
-parser = yacc.yacc()
+parser = yacc.yacc(tabcache=True)
 
-def run_parser(filename):
-    """Parse a file and return the AST"""
+def run_parser(filename, dfa_lexer: bool = False, rd_parser: bool = False):
+    """Parse a file and return the AST
+       dfa_lexer: scan with the table-driven dfa_scanner instead of ply.lex
+       rd_parser: parse with the hand-written rd_parser instead of ply.yacc"""
     with open(filename) as f:
         data = f.read()
 
-    result = parser.parse(data, lexer=lexer,tracking=True)
+    scan = DFALexer() if dfa_lexer else lexer
+    if rd_parser:
+        result = RDParser(scan).parse(data)
+    else:
+        result = parser.parse(data, lexer=scan,tracking=True)
     # print(result)
     return result 
 
@@ -0,0 +1,60 @@
+"""
+    Optimization levels of bxcc.
+
+    A level names the options of every phase: the ast2tac flags, the
+    pipeline of CFG passes picked from cfg.CFG.pass_registry with the budget
+    of rounds they run for, and the tac2x64 options. -O0 translates the
+    source as it is, -O1 runs every pass once, -O2, the default, runs the
+    passes to a fixpoint and -O3 adds the peephole of the back end.
+"""
+
+from typing import Dict, Tuple
+from cfg import CFG
+
+class OptLevel:
+    """ Options of the phases at one optimization level """
+    __slots__ = ('name', 'fold', 'order', 'recycle', 'cfg_passes', 'cfg_budget',
+                 'elide_jumps', 'forward_stores')
+
+    def __init__(self, name: str, fold: bool, order: bool, recycle: bool,
+                 cfg_passes: Tuple[str, ...], cfg_budget: int,
+                 elide_jumps: bool, forward_stores: bool) -> None:
+        """ fold, order, recycle: see ast2tac.iter_tac
+            cfg_passes: names of the CFG passes of a round, none skips the CFG
+            cfg_budget: rounds the CFG passes run for at most
+            elide_jumps, forward_stores: see tac2x64.Procx64 """
+        self.name: str = name
+        self.fold: bool = fold
+        self.order: bool = order
+        self.recycle: bool = recycle
+        self.cfg_passes: Tuple[str, ...] = cfg_passes
+        self.cfg_budget: int = cfg_budget
+        self.elide_jumps: bool = elide_jumps
+        self.forward_stores: bool = forward_stores
+
+    def __str__(self) -> str:
+        return self.name
+
+# the passes of the default round of cfg.CFG, in its order
+CFG_PASSES: Tuple[str, ...] = tuple(CFG.passes)
+
+LEVELS: Dict[str, OptLevel] = {
+    "O0": OptLevel("O0", fold=False, order=False, recycle=False, cfg_passes=(), cfg_budget=0,
+                   elide_jumps=False, forward_stores=False),
+    "O1": OptLevel("O1", fold=True, order=True, recycle=True, cfg_passes=CFG_PASSES, cfg_budget=1,
+                   elide_jumps=True, forward_stores=False),
+    "O2": OptLevel("O2", fold=True, order=True, recycle=True, cfg_passes=CFG_PASSES, cfg_budget=16,
+                   elide_jumps=True, forward_stores=False),
+    "O3": OptLevel("O3", fold=True, order=True, recycle=True, cfg_passes=CFG_PASSES, cfg_budget=64,
+                   elide_jumps=True, forward_stores=True),
+}
+
+DEFAULT_LEVEL = "O2"
+
+def get_level(name: str) -> OptLevel:
+    """ Returns the level of the name, with or without its leading O """
+    if not name.startswith("O"):
+        name = "O" + name
+    if name not in LEVELS:
+        raise ValueError(f"Unknown optimization level {name}, expected one of {', '.join(LEVELS)}")
+    return LEVELS[name]
@@ -0,0 +1,123 @@
+"""
+    Content addressed cache of per proc compilation results.
+
+    Every proc is keyed by the hash of its source text, of the optimization
+    level and of the global signatures (procs and global variables) whose
+    names appear in it, so editing one proc only invalidates that proc and,
+    through a changed signature, the procs that refer to it. The entries of a
+    proc are its tac, its CFG optimized tac and its assembly; a stage that hits skips
+    ast2tac (and type checking), cfg.CFG.optimization or Procx64.
+"""
+
+import gc
+import os
+import re
+import pickle
+import hashlib
+from typing import Dict, List, Tuple
+from bxast import Prog, DeclProc
+
+# modules whose code decides the output of the cached stages
+_COMPILER_MODULES = ("bxast.py", "ast2tac.py", "tac_store.py", "macros.py", "cfg.py", "tac_cfopt.py", "tac2x64.py",
+                     "opt_levels.py")
+
+_ident = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+def compiler_fingerprint(modules: Tuple[str, ...]) -> bytes:
+    """ Hash of the compiler sources, so that entries die with the code that made them """
+    h = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in modules:
+        with open(os.path.join(directory, name), "rb") as fp:
+            h.update(fp.read())
+    return h.digest()
+
+def load_entry(path: str):
+    """ Returns the value pickled at path or None """
+    # unpickling allocates many containers, which triggers collections
+    # that traverse the whole live AST; the entries hold no cycles
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as fp:
+            return pickle.load(fp)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+
+def store_entry(path: str, value) -> None:
+    """ Pickles the value to path, readers see either no entry or a complete one """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(tmp, "wb") as fp:
+            pickle.dump(value, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, RecursionError):
+        # a read-only or full cache, or a tree too deep for the pickler,
+        # only costs the next build its hits
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    finally:
+        if enabled:
+            gc.enable()
+
+class ProcCache:
+    """ Per proc cache of one build, entries are looked up by proc name and stage """
+    def __init__(self, directory: str, filename: str, ast: Prog, level: str = "O2") -> None:
+        """ ast must have passed global_type_check
+            level: name of the opt_levels level the entries are made at """
+        self.__dir: str = directory
+        self.__level: str = level
+        self.__keys: Dict[str, str] = dict()
+        self.__lookups: Dict[str, int] = dict()
+        self.__hits: Dict[str, int] = dict()
+        os.makedirs(directory, exist_ok=True)
+        with open(filename) as fp:
+            self.__index(fp.read(), ast)
+
+    def __index(self, source: str, ast: Prog) -> None:
+        """ Computes the key of every proc """
+        fingerprint = compiler_fingerprint(_COMPILER_MODULES)
+        scope = ast.get_scope()
+        procs = [decl for decl in ast.global_decls() if isinstance(decl, DeclProc)]
+        for index, proc in enumerate(procs):
+            # the proc text runs from its def up to the next def
+            start = proc.location[1]
+            end = procs[index + 1].location[1] if index + 1 < len(procs) else len(source)
+            text = source[start:end].rstrip()
+            h = hashlib.sha256(fingerprint)
+            h.update(f"{self.__level}\0".encode())
+            h.update(text.encode())
+            for name in sorted(set(_ident.findall(text))):
+                signature = scope.get_global(name)
+                if signature is not None:
+                    h.update(f"\0{name}:{signature}".encode())
+            self.__keys[proc.get_name()] = h.hexdigest()
+
+    def __path(self, proc_name: str, stage: str) -> str:
+        return os.path.join(self.__dir, f"{self.__keys[proc_name]}.{stage}.pickle")
+
+    def get(self, proc_name: str, stage: str):
+        """ Returns the cached result of the stage for the proc or None """
+        self.__lookups[stage] = self.__lookups.get(stage, 0) + 1
+        value = load_entry(self.__path(proc_name, stage))
+        if value is None:
+            return None
+        self.__hits[stage] = self.__hits.get(stage, 0) + 1
+        return value
+
+    def put(self, proc_name: str, stage: str, value) -> None:
+        """ Stores the result of the stage for the proc """
+        store_entry(self.__path(proc_name, stage), value)
+
+    def report(self) -> List[str]:
+        """ Returns one hit rate line per stage looked up in this build """
+        lines = []
+        for stage, lookups in self.__lookups.items():
+            hits = self.__hits.get(stage, 0)
+            lines.append(f"proc cache {stage}: {hits}/{lookups} hits ({100 * hits / lookups:.1f}%)")
+        return lines
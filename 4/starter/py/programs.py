@@ -0,0 +1,253 @@
+"""
+    Programs the benchmarks and the tests run on: bx sources generated at
+    any size, loop heavy programs that run long enough to time, and the
+    live temporaries of their tac and the CFGs of their procs.
+"""
+
+def make_program(num_procs: int, stmts_per_proc: int) -> str:
+    """ Generates a well typed BX program with num_procs procs """
+    lines = ["var counter = 0 : int;", "var flag = true : bool;"]
+    for p in range(num_procs):
+        lines.append(f"def p{p}(a, b : int) : int {{  // proc {p}")
+        lines.append("    var x = a * 3 + (b << 2) - -7, y = 0 : int;")
+        for s in range(stmts_per_proc):
+            lines.append(f"    if (x >= {s} && !(y == x % 5) || flag) {{")
+            lines.append(f"        y = y + (x ^ {s + 1}) / 2 & ~b | a >> 1;")
+            lines.append("    } else {")
+            lines.append(f"        while (y < {s}) {{ y = y + 1; if (y != 3) {{ break; }} }}")
+            lines.append("    }")
+        if p > 0:
+            lines.append(f"    return p{p - 1}(y, x) + counter;")
+        else:
+            lines.append("    return y + counter;")
+        lines.append("}")
+    lines.append("def main() {")
+    lines.append(f"    print(p{num_procs - 1}(1, 2));")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_nested_program(depth: int, refs: int) -> str:
+    """ Generates a program with depth nested blocks, each declaring a variable,
+        and refs references to outer variables in the innermost block """
+    lines = ["def main() {", "    var v0 = 0 : int;"]
+    for d in range(1, depth + 1):
+        lines.append(f"{'  ' * d}{{ var v{d} = v{d - 1} + 1 : int;")
+    for r in range(refs):
+        lines.append(f"{'  ' * depth}  v{depth} = v{depth} + v{r % depth};")
+    lines.append(f"{'  ' * depth}  print(v{depth});")
+    lines.append("}" * depth)
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_temp_program(num_procs: int, stmts_per_proc: int) -> str:
+    """ Generates a program of long arithmetic expressions, each statement needs
+        a few dozen temporaries """
+    lines = []
+    for p in range(num_procs):
+        lines.append(f"def t{p}(a, b, c : int) : int {{")
+        lines.append("    var x = a, y = b, z = c : int;")
+        for s in range(stmts_per_proc):
+            lines.append(f"    x = ((x + {s}) * (y - z) ^ (a << 2 | b >> 1)) + ((x - y) * (z + {s + 1}) & ~(a * b - c));")
+            lines.append(f"    y = (y * 3 + x / 7 - z % 5) * ((a + b) - (c - x)) + -(x ^ y | z & {s});")
+            lines.append(f"    if (x > y && (z < {s} || !(x == z))) {{ z = z + (x - y) * 2; }}")
+        lines.append("    return x + y + z;")
+        lines.append("}")
+    lines.append("def main() {")
+    lines.append(f"    print(t{num_procs - 1}(1, 2, 3));")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_frame_program(stmts: int, iterations: int) -> str:
+    """ Generates a main looping over stmts long arithmetic statements, each
+        needing a few dozen temporaries """
+    lines = ["def main() {", "    var i = 0, x = 1, y = 2, z = 3, a = 4, b = 5, c = 6 : int;",
+             f"    while (i < {iterations}) {{"]
+    for s in range(stmts):
+        lines.append(f"        x = ((x + {s}) * (y - z) ^ (a << 2 | b >> 1)) + ((x - y) * (z + {s + 1}) & ~(a * b - c));")
+        lines.append(f"        y = (y * 3 + x / 7 - z % 5) * ((a + b) - (c - x)) + -(x ^ y | z & {s});")
+    lines.append("        i = i + 1;")
+    lines.append("    }")
+    lines.append("    print(x + y + z);")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_block_program(num_blocks: int) -> str:
+    """ Generates a main whose CFG has about num_blocks blocks: conditionals,
+        loops with breaks and conditions on comparisons """
+    lines = ["def main() {", "    var x = 0, y = 1 : int;"]
+    for i in range(num_blocks // 15):
+        lines.append(f"    if (x < {i} && y != x) {{ x = x + {i % 7}; }} else {{ y = y + 1; }}")
+        lines.append(f"    while (y > {i}) {{ y = y - 3; if (y == x) {{ break; }} }}")
+    lines.append("    print(x + y);")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_else_chain_program(chains: int, depth: int) -> str:
+    """ Generates a main with chains of if/else nested depth deep in their else
+        branches, all testing the same bool, in a loop that flips it """
+    lines = ["def main() {", "    var i = 0, x = 0 : int;", "    while (i < 4) {",
+             "        var b = i % 2 == 0 : bool;"]
+    for c in range(chains):
+        chain = f"x = x + {c};"
+        for d in range(depth):
+            chain = f"if (b) {{ x = x - {d + 1}; }} else {{ {chain} }}"
+        lines.append("        " + chain)
+    lines += ["        i = i + 1;", "    }", "    print(x);", "}"]
+    return "\n".join(lines) + "\n"
+
+def make_constant_program(count: int, seed: int) -> str:
+    """ Generates prints of random constant expressions and conditions, with
+        overflows, negative divisions and shifts, and identities around a
+        variable and a call """
+    import random
+    rng = random.Random(seed)
+    binops = ["+", "-", "*", "/", "%", "&", "|", "^", "<<", ">>"]
+    def expr(depth: int) -> str:
+        if depth == 0 or rng.random() < 0.2:
+            return rng.choice([str(rng.randint(0, 20)), str(rng.randint(0, 1 << 62)), "a", "f()"])
+        op = rng.choice(binops + ["-", "~"])
+        if rng.random() < 0.2:
+            return f"{op if op in ('-', '~') else '-'}({expr(depth - 1)})"
+        if op in ("<<", ">>"):
+            return f"({expr(depth - 1)} {op} {rng.randint(0, 63)})"
+        if op in ("/", "%"):
+            return f"({expr(depth - 1)} {op} {rng.choice(['3', '-7', '(0 - 5)', 'a', '1'])})"
+        return f"({expr(depth - 1)} {op if op != '~' else '+'} {expr(depth - 1)})"
+    def cond(depth: int) -> str:
+        if depth == 0 or rng.random() < 0.3:
+            cmp = rng.choice(["<", "<=", ">", ">=", "==", "!="])
+            return f"({expr(2)} {cmp} {expr(2)})"
+        return rng.choice([f"!{cond(depth - 1)}", f"({cond(depth - 1)} && {cond(depth - 1)})",
+                           f"({cond(depth - 1)} || {cond(depth - 1)})", "true", "false"])
+    lines = ["def f() : int { print(99); return 5; }", "def main() {", "    var a = 7 : int;"]
+    for i in range(count):
+        lines.append(f"    print({expr(4)});")
+        lines.append(f"    if ({cond(3)}) {{ print({i}); }} else {{ print(-{i}); }}")
+        lines.append("    print(f() * 0 + a * 0 + (a << 0) + (0 + a) * 1);")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def make_deep_program(kind: str, depth: int) -> str:
+    """ Generates a main with one construct nested depth times: an else if
+        chain, nested ifs, a && chain or a right nested sum """
+    if kind == "else_if":
+        body = "    if (x == 0) { print(0); }" + "".join(f" else if (x == {i}) {{ print({i}); }}"
+                                                     for i in range(1, depth))
+    elif kind == "nested_if":
+        body = "    " + "if (x < 5) { " * depth + "print(x);" + " }" * depth
+    elif kind == "and_chain":
+        body = "    if (" + " && ".join(f"x < {i + 5}" for i in range(depth)) + ") { print(1); }"
+    else:
+        body = "    print(" + "(x + " * depth + "1" + ")" * depth + ");"
+    return "def main() {\n    var x = 3 : int;\n" + body + "\n}\n"
+
+FIZZBUZZ_LOOP = """
+def main() {
+  var cur = 0, fizz = 0, buzz = 0, both = 0, other = 0 : int;
+  while (cur <= 3000000) {
+    if ((cur % 3) == 0) {
+      if ((cur % 5) == 0) { both = both + 1; } else { fizz = fizz + 1; }
+    } else if ((cur % 5) == 0) {
+      buzz = buzz + 1;
+    } else {
+      other = other + 1;
+    }
+    cur = cur + 1;
+  }
+  print(fizz); print(buzz); print(both); print(other);
+}
+"""
+
+COLLATZ_LOOP = """
+def main() {
+  var n = 1, steps = 0 : int;
+  while (n < 200000) {
+    var c = n : int;
+    while (c != 1) {
+      if (c % 2 == 0) { c = c / 2; } else { c = 3 * c + 1; }
+      steps = steps + 1;
+    }
+    n = n + 1;
+  }
+  print(steps);
+}
+"""
+
+BOOL_LOOP = """
+var small = false, even = false : bool;
+def below(a, b : int) : bool { return a < b; }
+def count(b : bool) : int { if (b) { return 1; } return 0; }
+def main() {
+  var i = 0, total = 0 : int;
+  while (i < 3000000) {
+    small = i % 7 < i % 5;
+    even = !(i % 2 != 0);
+    total = total + count(small) + count(even) + count(below(i % 3, 1));
+    i = i + 1;
+  }
+  print(total);
+}
+"""
+
+def max_live_temps(body) -> int:
+    """ Returns the largest number of temporaries live at once in a proc body,
+        by backward liveness over its instructions """
+    from tac_store import Temp
+    size = len(body)
+    labels = {body.args(i)[0]: i for i in range(size) if body.opcode(i) == "label"}
+    succs, uses, defs = [], [], []
+    for i in range(size):
+        opcode, args = body.opcode(i), body.args(i)
+        uses.append({arg for arg in args if isinstance(arg, Temp)})
+        defs.append(body.result(i))
+        if opcode == "jmp":
+            succs.append([labels[args[0]]])
+        elif opcode == "ret":
+            succs.append([])
+        elif opcode[0] == "j":
+            succs.append([labels[args[-1]]] + ([i + 1] if i + 1 < size else []))
+        else:
+            succs.append([i + 1] if i + 1 < size else [])
+    live = [set() for _ in range(size)]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(size)):
+            live_in = set().union(*(live[succ] for succ in succs[i]))
+            live_in.discard(defs[i])
+            live_in |= uses[i]
+            if live_in != live[i]:
+                live[i] = live_in
+                changed = True
+    return max((len(temps) for temps in live), default=0)
+
+def order_live_temps(source: str, order: bool) -> dict:
+    """ Returns the max live temporaries of each proc of a program """
+    import io
+    import contextlib
+    import ast2tac
+    import bx2front
+    with contextlib.redirect_stdout(io.StringIO()):
+        tac = ast2tac.ast_to_tac(bx2front.get_ast(source, True, True), order=order)
+    return {decl["proc"]: max_live_temps(decl["body"]) for decl in tac if "proc" in decl}
+
+def procs_of(text: str) -> list:
+    """ Returns the tac of the procs of a program """
+    import io
+    import contextlib
+    import ast2tac
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    ast = RDParser(DFALexer()).parse(text)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast.global_type_check()
+        ast.type_check()
+        return [decl for decl in ast2tac.ast_to_tac(ast) if "proc" in decl]
+
+def make_cfg(decl: dict, verify: bool = False):
+    """ Returns the CFG of the tac of a proc, see cfg.CFG for verify """
+    import tac_cfopt
+    from cfg import CFG
+    label = tac_cfopt.get_max_label(decl["labels"]) + 1 if decl["labels"] else 0
+    creator = tac_cfopt.CFG_creator(decl["proc"][1:], decl["body"], label)
+    return CFG(creator.return_blocks(), decl["proc"][1:], verify)
@@ -0,0 +1,344 @@
+"""
+    Hand-written recursive descent parser for BX.
+
+    Statements and declarations are parsed by recursive descent, expressions
+    by operator precedence with explicit operand/operator stacks so that long
+    operator chains and parentheses do not recurse. The AST is identical to
+    the one built by my_parser, including node locations, which mirror the
+    positions ply's position tracking assigns.
+"""
+
+import sys
+from typing import List, Tuple, Iterator
+from bxast import *
+
+# binary operator token -> (precedence level, associativity, bxast operator)
+# the levels follow my_parser.precedence
+_binops = {
+    "OR":                   (1, "left", "logical-or"),
+    "AND":                  (2, "left", "logical-and"),
+    "BITWISE_OR":           (3, "left", "bitwise-or"),
+    "BITWISE_XOR":          (4, "left", "bitwise-xor"),
+    "BITWISE_AND":          (5, "left", "bitwise-and"),
+    "CMPE":                 (6, "nonassoc", "cmpe"),
+    "CMPNE":                (6, "nonassoc", "cmpne"),
+    "CMPL":                 (7, "nonassoc", "cmpl"),
+    "CMPLE":                (7, "nonassoc", "cmple"),
+    "CMPG":                 (7, "nonassoc", "cmpg"),
+    "CMPGE":                (7, "nonassoc", "cmpge"),
+    "LOGICAL_SHIFT_LEFT":   (8, "left", "logical-shift-left"),
+    "LOGICAL_SHIFT_RIGHT":  (8, "left", "logical-shift-right"),
+    "PLUS":                 (9, "left", "addition"),
+    "MINUS":                (9, "left", "substraction"),
+    "MULTIPLY":             (10, "left", "multiplication"),
+    "DIVIDE":               (10, "left", "division"),
+    "PERCENT":              (10, "left", "modulus"),
+}
+
+# prefix operator token -> bxast operator
+# they bind tighter than every binary operator
+_unops = {
+    "MINUS": "opposite",
+    "NOT": "not",
+    "BITWISE_NEGATION": "bitwise-negation",
+}
+
+# kinds of entries on the operator stack
+_PAREN, _UNOP, _BINOP = range(3)
+
+class RDParser:
+    """ Parses BX source read from a lexer with the ply input()/token() interface """
+    def __init__(self, lexer) -> None:
+        self.__lexer = lexer
+        self.__tok = None
+
+    # ------------------------------------------------------------------------------#
+    # token helpers
+
+    def __advance(self):
+        """ Reads the next token and returns it """
+        self.__tok = self.__lexer.token()
+        return self.__tok
+
+    def __at(self, type: str) -> bool:
+        """ Checks the type of the current token """
+        return self.__tok is not None and self.__tok.type == type
+
+    def __expect(self, type: str):
+        """ Consumes and returns the current token if it has the given type """
+        tok = self.__tok
+        if tok is None or tok.type != type:
+            self.__error()
+        self.__advance()
+        return tok
+
+    def __empty_location(self) -> List[int]:
+        """ Location ply gives an empty production: the lexer state after the lookahead,
+            which is the current token here """
+        return [self.__lexer.lineno, self.__lexer.lexpos]
+
+    def __location(self) -> List[int]:
+        """ Location of the current token """
+        if self.__tok is None:
+            self.__error()
+        return [self.__tok.lineno, self.__tok.lexpos]
+
+    def __error(self) -> None:
+        """ Reports a syntax error at the current token, same as my_parser.p_error """
+        if self.__tok:
+            print(f"error: {self.__tok}")
+        else:
+            print("Syntax error: at EOF")
+        sys.exit(1)
+
+    # ------------------------------------------------------------------------------#
+    # declarations
+
+    def parse(self, data: str) -> Prog:
+        """ Parses the data and returns the AST """
+        self.__lexer.input(data)
+        self.__advance()
+        location = self.__empty_location()
+        decls = []
+        while self.__tok is not None:
+            if self.__at("VAR"):
+                decls.append(self.__vardecl())
+            elif self.__at("DEF"):
+                decls.append(self.__procdecl())
+            else:
+                self.__error()
+        return Prog(location, decls)
+
+    def __procdecl(self) -> DeclProc:
+        location = self.__location()
+        self.__expect("DEF")
+        name = self.__expect("IDENT").value
+        self.__expect("LPAREN")
+        params = []
+        while not self.__at("RPAREN"):
+            params += self.__param()
+            if not self.__at("COMMA"):
+                break
+            self.__advance()
+        self.__expect("RPAREN")
+        returntype = BX_TYPE.VOID
+        if self.__at("COLON"):
+            self.__advance()
+            returntype = self.__type()
+        return DeclProc(location, name, params, returntype, walk(self.__block()))
+
+    def __param(self) -> List[Param]:
+        # every name in the group is located at the first one
+        location = self.__location()
+        names = [(location, self.__expect("IDENT").value)]
+        while self.__at("COMMA"):
+            self.__advance()
+            names.append((location, self.__expect("IDENT").value))
+        self.__expect("COLON")
+        lp = ListParams([], self.__type())
+        lp.add_multi_param(names)
+        return lp.return_params_list()
+
+    def __type(self) -> BX_TYPE:
+        if self.__at("INT"):
+            self.__advance()
+            return BX_TYPE.INT
+        self.__expect("BOOL")
+        return BX_TYPE.BOOL
+
+    def __vardecl(self) -> List[StatementVardecl]:
+        self.__expect("VAR")
+        location = self.__location()
+        name = self.__expect("IDENT").value
+        self.__expect("EQUALS")
+        varinits = [(location, name, self.__expression()[0])]
+        # the remaining variables share the location of the empty varinitstar
+        location = self.__empty_location()
+        while self.__at("COMMA"):
+            self.__advance()
+            name = self.__expect("IDENT").value
+            self.__expect("EQUALS")
+            varinits.append((location, name, self.__expression()[0]))
+        self.__expect("COLON")
+        listvardecl = ListVarDecl([], self.__type())
+        self.__expect("SEMICOLON")
+        listvardecl.add_multi_var(varinits)
+        return listvardecl.return_vardecl_list()
+
+    # ------------------------------------------------------------------------------#
+    # statements, nested blocks are parsed by walkers (see bxast.walk)
+
+    def __block(self) -> Iterator:
+        location = self.__location()
+        self.__expect("LBRACE")
+        statements = []
+        while not self.__at("RBRACE"):
+            statement = yield self.__statement()
+            if isinstance(statement, list):
+                statements.extend(statement)
+            else:
+                statements.append(statement)
+        self.__advance()
+        return StatementBlock(location, statements)
+
+    def __statement(self) -> Iterator:
+        location = self.__location()
+        tok = self.__tok
+
+        if tok.type == "VAR":
+            return self.__vardecl()
+
+        elif tok.type == "LBRACE":
+            return (yield self.__block())
+
+        elif tok.type == "IF":
+            return (yield self.__ifelse())
+
+        elif tok.type == "WHILE":
+            self.__advance()
+            self.__expect("LPAREN")
+            condition = self.__expression()[0]
+            self.__expect("RPAREN")
+            return StatementWhile(location, condition, (yield self.__block()))
+
+        elif tok.type in ("BREAK", "CONTINUE"):
+            self.__advance()
+            self.__expect("SEMICOLON")
+            return StatementJump(location, tok.value)
+
+        elif tok.type == "RETURN":
+            self.__advance()
+            expression = None
+            if not self.__at("SEMICOLON"):
+                expression = self.__expression()[0]
+            self.__expect("SEMICOLON")
+            return StatementReturn(location, expression)
+
+        elif tok.type == "IDENT":
+            # either an assignment or an expression starting with a name
+            self.__advance()
+            if self.__at("EQUALS"):
+                self.__advance()
+                rvalue = self.__expression()[0]
+                self.__expect("SEMICOLON")
+                return StatementAssign(location, ExpressionVar(location, tok.value), rvalue)
+            expression, location = self.__expression(tok)
+
+        else:
+            expression, location = self.__expression()
+
+        self.__expect("SEMICOLON")
+        return StatementEval(location, expression)
+
+    def __ifelse(self) -> Iterator:
+        location = self.__location()
+        self.__expect("IF")
+        self.__expect("LPAREN")
+        condition = self.__expression()[0]
+        self.__expect("RPAREN")
+        block = yield self.__block()
+        ifrest = None
+        if self.__at("ELSE"):
+            self.__advance()
+            ifrest = (yield self.__ifelse()) if self.__at("IF") else (yield self.__block())
+        return StatementIfElse(location, condition, block, ifrest)
+
+    # ------------------------------------------------------------------------------#
+    # expressions
+
+    def __expression(self, ident = None) -> Tuple[Expression, List[int]]:
+        """ Parses an expression and returns it with the location of its first token.
+            ident is an already consumed IDENT token starting the expression """
+        operands: List[Tuple[Expression, List[int]]] = []
+        operators: List[tuple] = []
+        open_parens = 0
+
+        while True:
+            # operand position: prefix operators and open parentheses
+            if ident is None:
+                while self.__tok is not None and (self.__tok.type in _unops or self.__tok.type == "LPAREN"):
+                    if self.__tok.type == "LPAREN":
+                        operators.append((_PAREN, self.__location()))
+                        open_parens += 1
+                    else:
+                        operators.append((_UNOP, _unops[self.__tok.type], self.__location()))
+                    self.__advance()
+                operands.append(self.__primary())
+            else:
+                operands.append(self.__primary(ident))
+                ident = None
+
+            # operator position: close parentheses then a binary operator
+            while open_parens and self.__at("RPAREN"):
+                while operators[-1][0] != _PAREN:
+                    self.__reduce(operands, operators)
+                location = operators.pop()[1]
+                open_parens -= 1
+                operands[-1] = (operands[-1][0], location)
+                self.__advance()
+
+            if self.__tok is None or self.__tok.type not in _binops:
+                if open_parens:
+                    self.__error()
+                while operators:
+                    self.__reduce(operands, operators)
+                return operands[0]
+
+            level, assoc, operator = _binops[self.__tok.type]
+            while operators and operators[-1][0] != _PAREN:
+                top = operators[-1]
+                if top[0] == _BINOP and top[1] == level:
+                    if assoc == "nonassoc":
+                        self.__error()
+                elif top[0] == _BINOP and top[1] < level:
+                    break
+                self.__reduce(operands, operators)
+            operators.append((_BINOP, level, operator))
+            self.__advance()
+
+    def __reduce(self, operands: List[Tuple[Expression, List[int]]], operators: List[tuple]) -> None:
+        """ Applies the operator on top of the stack """
+        entry = operators.pop()
+        if entry[0] == _UNOP:
+            argument = operands.pop()[0]
+            operands.append((ExpressionOp(entry[2], entry[1], [argument]), entry[2]))
+        else:
+            right = operands.pop()[0]
+            left, location = operands.pop()
+            operands.append((ExpressionOp(location, entry[2], [left, right]), location))
+
+    def __primary(self, ident = None) -> Tuple[Expression, List[int]]:
+        """ Parses a literal, variable or call """
+        tok = ident
+        if tok is None:
+            tok = self.__tok
+            if tok is None:
+                self.__error()
+            self.__advance()
+        location = [tok.lineno, tok.lexpos]
+
+        if tok.type == "NUMBER":
+            return ExpressionInt(location, tok.value), location
+        elif tok.type == "TRUE":
+            return ExpressionBool(location, True), location
+        elif tok.type == "FALSE":
+            return ExpressionBool(location, False), location
+        elif tok.type != "IDENT":
+            self.__tok = tok
+            self.__error()
+
+        if not self.__at("LPAREN"):
+            return ExpressionVar(location, tok.value), location
+
+        # procedure call; arguments follow the expressionstar rule which also
+        # accepts a leading comma
+        self.__advance()
+        params = []
+        if not self.__at("RPAREN"):
+            if not self.__at("COMMA"):
+                params.append(self.__expression()[0])
+            while self.__at("COMMA"):
+                self.__advance()
+                params.append(self.__expression()[0])
+        self.__expect("RPAREN")
+        return ExpressionProcCall(location, tok.value, params), location
@@ -89,7 +89,7 @@ def t_newline(t):
 if __name__ == "__main__":
     # parser = argparse.ArgumentParser(description= "Lex files")
     # parser.add_argument("--")
-    lexer = lex.lex()
+    lexer = lex.lex(tabcache=True)
     file_to_lex = sys.argv[1]
     with open(file_to_lex, "r") as infile:
         for line in infile:
@@ -1,6 +1,7 @@
 import json, sys, os
-from typing import List, Dict
+from typing import List, Dict, Union, Iterable, Iterator
 from macros import x64Macros as Macros
+from tac_store import TacStore, InstrView, Temp, Label, OPCODES, JMP, proc_from_json
 
 """
 Authors: Yi Yao Tan 
@@ -13,20 +14,20 @@ Authors: Yi Yao Tan
 
 class Stack:
     def __init__(self, proc_args: list) -> None:
-        self.__temp_map: Dict[str, str] = dict()
-        self.__proc_args: List[str] = proc_args
+        self.__temp_map: Dict[Temp, str] = dict()
+        self.__proc_args: List[Temp] = proc_args
         self.__proc_args_num: int = len(self.__proc_args)
         # self.__args_temp_init()
 
-    def get_item(self, temp: str, instr: dict) -> str:
+    def get_item(self, temp: Union[Temp, str], instr: InstrView) -> str:
         """ Return the stack address of the temp """
         # if globl var then ret rip relative position
         # print(temp)
-        if temp[0] == "@":
+        if type(temp) is str:
             return f'{temp[1:]}(%rip)'
         return self.__lookup_temp(temp, instr)
 
-    def __lookup_temp(self, temp: str, instr: dict = None) -> str:
+    def __lookup_temp(self, temp: Temp, instr: InstrView = None) -> str:
         """ Returns the value of the temp from the stack 
             while simultaneously creating a hash table """
         Macros._assert_temporary(temp, instr)
@@ -105,11 +106,16 @@ class GlobalVarx64:
 # ---------------------------------------------------------------------#
 
 class Procx64():
-    def __init__(self, proc_instrs: List) -> None:
+    def __init__(self, proc_instrs: List, elide_jumps: bool = True, forward_stores: bool = False) -> None:
+        """ elide_jumps: comment out the jmps to the label that follows them
+            forward_stores: comment out the reloads of %r11 from the slot it
+                            was just stored to """
+        self.__elide_jumps: bool = elide_jumps
+        self.__forward_stores: bool = forward_stores
         self.__func_name: str = proc_instrs["proc"][1:]
         self.__args: list = proc_instrs["args"]
         self.__param_temps_for_call: list = list()
-        self.__tac_instr: list = proc_instrs["body"]
+        self.__tac_instr: TacStore = proc_instrs["body"]
         self.__temps: list = proc_instrs["temps"]
         self.__labels: list = proc_instrs["labels"]
         self.__asm_instr_proc: List = list()
@@ -120,41 +126,37 @@ class Procx64():
     # misc functions
     # ---------------------------------------------------------------------#
 
-    def __add_instr_comment(self, instr: dict) -> None:
+    def __add_instr_comment(self, opcode: str, args: list, result: str, instr: InstrView) -> None:
         """ Adds instrs as a comment in the assembly """
-        if instr['result'] == None:
-            if instr['opcode'] == 'jmp' or instr['opcode'] == 'call':
-                self.__asm_instr_proc.append(f'\t/*   {instr["opcode"]} {instr["args"][0]} [TAC] */')
-            elif instr['opcode'] in Macros._jcc:
-                self.__asm_instr_proc.append(f'\t/*   {instr["opcode"]} {instr["args"][0]}, {instr["args"][1]} [TAC] */')
-            elif instr['opcode'] == 'label':
-                self.__asm_instr_proc.append(f'\t/*  {instr["args"][0]}: [TAC] */')
-        elif len(instr["args"]) == 1:
-            self.__asm_instr_proc.append(f'\t/*   {instr["result"]} = {instr["opcode"]} {instr["args"][0]} [TAC] */')
-        elif len(instr["args"]) == 2:
-            self.__asm_instr_proc.append(f'\t/*   {instr["result"]} = {instr["opcode"]} {instr["args"][0]}, {instr["args"][1]} [TAC] */')
+        if result == None:
+            if opcode == 'jmp' or opcode == 'call':
+                self.__asm_instr_proc.append(f'\t/*   {opcode} {args[0]} [TAC] */')
+            elif opcode in Macros._jcc:
+                self.__asm_instr_proc.append(f'\t/*   {opcode} {", ".join(map(str, args))} [TAC] */')
+            elif opcode == 'label':
+                self.__asm_instr_proc.append(f'\t/*  {args[0]}: [TAC] */')
+        elif len(args) == 1:
+            self.__asm_instr_proc.append(f'\t/*   {result} = {opcode} {args[0]} [TAC] */')
+        elif len(args) == 2:
+            self.__asm_instr_proc.append(f'\t/*   {result} = {opcode} {args[0]}, {args[1]} [TAC] */')
         else:       # should have been caught before
             raise RuntimeError(f'Could not comment the instruction: {instr}')
 
-    def __check_previous_instr(self, index: int, field: str, value_to_check: str) -> bool:
-        """ Checks the previous instruction if a certain field in it has a certain value 
-            Requirement: To check if previous instr is jmp to current label
-                         To check if previous instr is a sub
-        """
-        # print(self.__tac_instr[index])
-        # print(self.__tac_instr[index][field], value_to_check)
-        if field == 'args':   # compare the jmp argument with current label
-            return self.__tac_instr[index][field][0] == value_to_check
-        return self.__tac_instr[index][field] == value_to_check
-
-    def __get_label_name(self, lab: str) -> str:
+    def __previous_is_jmp_to(self, index: int, label: Label) -> bool:
+        """ Checks if the instruction at index is a jmp to the label """
+        store = self.__tac_instr
+        return store.opcodes[index] == JMP and store.operands[store.args1[index]] == label
+
+    def __get_label_name(self, lab: Label) -> str:
         """ appends the function name to the current label to mark a local label """
-        return f'.{self.__func_name}{lab[1:]}'      
+        return f'.{self.__func_name}.L{lab.number}'
 
     def __create_asm_instr(self) -> None:
         """ Runs other functions to create asm instr for the current proc """
         # convert the tac to assembly
         self.__tac_to_asm()
+        if self.__forward_stores:
+            self.__forward()
         # add initial instr when entering proc
         self.__asm_instr_proc[:0] = self.__stack.start_proc(self.__func_name)
         # add final instr when exiting proc
@@ -164,6 +166,37 @@ class Procx64():
         """ Returns asm instrs for the current proc """
         return self.__asm_instr_proc
 
+    def __forward(self) -> None:
+        """ Forwards %r11 to the loads of the slot it was last stored to or
+            loaded from: a load into %r11 is commented out, a load into another
+            register becomes a register move """
+        slot = None       # memory operand whose value %r11 holds
+        for index, line in enumerate(self.__asm_instr_proc):
+            if line.startswith('\t/*'):
+                continue
+            # a label may be reached with anything in %r11, a call clobbers it
+            if not line.startswith('\t') or line.startswith('\tcallq'):
+                slot = None
+                continue
+            opcode, _, operands = line[1:].partition(' ')
+            operands = operands.split(', ')
+            if opcode == 'movq' and len(operands) == 2:
+                src, dst = operands
+                if dst == '%r11':
+                    if src == slot:
+                        self.__asm_instr_proc[index] = f'\t/* --{line[1:]}-- */'
+                    else:
+                        slot = src if '(' in src else None
+                elif src == '%r11':
+                    if '(' in dst:
+                        slot = dst
+                elif dst == slot:
+                    slot = None
+                elif src == slot and dst.startswith('%'):
+                    self.__asm_instr_proc[index] = f'\tmovq %r11, {dst}'
+            elif opcode not in ('cmpq', 'pushq') and ('%r11' in line or operands[-1] == slot):
+                slot = None
+
     # ---------------------------------------------------------------------#
     # tac to assembly conversion
     # ---------------------------------------------------------------------#
@@ -174,15 +207,17 @@ class Procx64():
         # initialize param instruction for the proc
         self.__asm_instr_proc = self.__stack.args_temp_init()        
 
-        for index, instr in enumerate(self.__tac_instr):
+        store = self.__tac_instr
+        opcodes, operands, results = store.opcodes, store.operands, store.results
+        for index in range(len(store)):
             
-            assert isinstance(instr, dict), f'Invalid type for instruction: {instr}'
+            instr = store.view(index)           # only decoded for error messages
             # print(f"instr: {instr}")          # DEBUG
 
-            self.__add_instr_comment(instr)     # Add coment in assembly file
-            opcode = instr['opcode']
-            args = instr['args']
-            result = instr['result']
+            opcode = OPCODES[opcodes[index]]
+            args = store.args(index)
+            result = operands[results[index]]
+            self.__add_instr_comment(opcode, args, result, instr)     # Add coment in assembly file
 
             if opcode == 'nop': pass
 
@@ -193,8 +228,7 @@ class Procx64():
                 Macros._assert_result(result, instr)
                 
                 # if previous instruction is jmp to current lab then comment the jmp
-                if self.__check_previous_instr(index-1, 'opcode', 'jmp'): 
-                    if self.__check_previous_instr(index-1, 'args', arg):
+                if self.__elide_jumps and self.__previous_is_jmp_to(index-1, arg):
                         previos_instr_txt = self.__asm_instr_proc[-2][1:]
                         self.__asm_instr_proc[-2] = f'\t/* --{previos_instr_txt}-- */'
                 self.__asm_instr_proc.append(self.__get_label_name(arg)+':')          # add label to the assembly
@@ -203,7 +237,11 @@ class Procx64():
                 Macros._assert_argument_numb(args, 1, instr)
                 assert isinstance(args[0], int)                         # check if instruction is in correct format
                 result = self.__stack.get_item(result, instr)        # get stack position to store result of temp
-                self.__asm_instr_proc.append(f'\tmovq ${args[0]}, {result}')    # add instruction as assembly
+                if -(1 << 31) <= args[0] < (1 << 31):
+                    self.__asm_instr_proc.append(f'\tmovq ${args[0]}, {result}')    # add instruction as assembly
+                else:       # movq only takes a sign extended 32-bit immediate
+                    self.__asm_instr_proc.append(f'\tmovabsq ${args[0]}, %r11')
+                    self.__asm_instr_proc.append(f'\tmovq %r11, {result}')
 
             elif opcode == 'copy':
                 # print(args, instr)
@@ -235,12 +273,36 @@ class Procx64():
                                         f'\t{un_op} %r11',
                                         f'\tmovq %r11, {result}'])
 
+            elif opcode in Macros._setcc:
+                Macros._assert_argument_numb(args, 2, instr)
+                arg1 = self.__stack.get_item(args[0], instr)
+                arg2 = self.__stack.get_item(args[1], instr)
+                result = self.__stack.get_item(result, instr)
+                self.__asm_instr_proc.extend([f'\tmovq {arg1}, %r11',
+                                        f'\tcmpq {arg2}, %r11',
+                                        f'\t{opcode} %r11b',
+                                        f'\tmovzbq %r11b, %r11',
+                                        f'\tmovq %r11, {result}'])
+
             elif opcode == 'jmp':
                 Macros._assert_argument_numb(args, 1, instr)
                 Macros._assert_result(result, instr)
                 arg = args[0]
                 self.__asm_instr_proc.append(f'\tjmp {self.__get_label_name(arg)}')
 
+            elif opcode in Macros._jcc and len(args) == 3:
+                # jcc a, b, L jumps if a compares to b as the jcc says
+                arg1, arg2, lab = args
+                Macros._assert_temporary(arg1, instr)
+                Macros._assert_temporary(arg2, instr)
+                Macros._assert_label(lab, instr)
+                Macros._assert_result(result, instr)
+                arg1 = self.__stack.get_item(arg1, instr)
+                arg2 = self.__stack.get_item(arg2, instr)
+                self.__asm_instr_proc.extend([f'\tmovq {arg1}, %r11',
+                                              f'\tcmpq {arg2}, %r11',
+                                              f'\t{opcode} {self.__get_label_name(lab)}'])
+
             elif opcode in Macros._jcc:
                 Macros._assert_argument_numb(args, 2, instr)
                 arg = args[0]
@@ -308,10 +370,14 @@ class Procx64():
 # ------------------------------------------------------------------------------#
 
 class tac2x64:
-    def __init__(self, tac: list) -> None:
+    def __init__(self, tac: list, cache = None, stage: str = "asm") -> None:
+        """ cache: proc_cache.ProcCache holding the assembly of unchanged procs
+            under the given stage name """
         self.__tac_list: List[dict] = tac
+        self.__cache = cache
+        self.__stage: str = stage
         self.__globl_vars_list: List[GlobalVarx64] = list()
-        self.__proc_list: List[Procx64] = list()
+        self.__proc_list: List[List[str]] = list()
         self.__x64_list: List[list] = list()
         self.__parse_tac()
         self.__asm_alloc()
@@ -322,21 +388,53 @@ class tac2x64:
             if "var" in member:
                 self.__globl_vars_list.append(GlobalVarx64(member))
             elif "proc" in member:
-                self.__proc_list.append(Procx64(member))
+                self.__proc_list.append(self.__proc_asm(member))
             else:
                 raise RuntimeError(f"Unexpected Tac type {member}")
 
+    def __proc_asm(self, member: dict) -> List[str]:
+        """ Returns the asm instr of a proc, from the cache if possible """
+        return proc_asm(member, self.__cache, self.__stage)
+
     def __asm_alloc(self) -> None:
         """ Allocates appropraite instrs for all globl decls """
         for var in self.__globl_vars_list:
             self.__x64_list.append(var.get_instr())
         for proc in self.__proc_list:
-            self.__x64_list.append(proc.return_asm_instr())
+            self.__x64_list.append(proc)
 
     def get_asm_instr(self) -> list:
         """ returns the asm instrs for the entire code """
         return self.__x64_list
 
+def proc_asm(member: dict, cache = None, stage: str = "asm", elide_jumps: bool = True,
+             forward_stores: bool = False) -> List[str]:
+    """ Returns the asm instr of a proc, from the cache if possible
+        cache, stage: see tac2x64, the cache must be keyed by the options
+        elide_jumps, forward_stores: see Procx64 """
+    if cache is None:
+        return Procx64(member, elide_jumps, forward_stores).return_asm_instr()
+    name = member["proc"][1:]
+    asm = cache.get(name, stage)
+    if asm is None:
+        asm = Procx64(member, elide_jumps, forward_stores).return_asm_instr()
+        cache.put(name, stage, asm)
+    return asm
+
+def iter_asm(tac: Iterable[dict], cache = None, stage: str = "asm", elide_jumps: bool = True,
+             forward_stores: bool = False) -> Iterator[List[str]]:
+    """ Yields the asm instrs of each global declaration as soon as it is read,
+        in the order of the tac
+        cache, stage: see tac2x64
+        elide_jumps, forward_stores: see Procx64 """
+    for member in tac:
+        if "var" in member:
+            yield GlobalVarx64(member).get_instr()
+        elif "proc" in member:
+            yield proc_asm(member, cache, stage, elide_jumps, forward_stores)
+        else:
+            raise RuntimeError(f"Unexpected Tac type {member}")
+
 # ------------------------------------------------------------------------------#
 # Main function drivers
 # ------------------------------------------------------------------------------#
@@ -351,28 +449,30 @@ def compile_tac(fname: str) -> None:
         raise ValueError(f'{fname} is not of the correct format .tac.json or .json')
 
     with open(fname, 'rb') as fp:
-        tac_jsn = json.load(fp)
+        tac_jsn = [proc_from_json(decl) for decl in json.load(fp)]
     convert_instr_to_asm(read_name, tac_jsn)
 
-def convert_instr_to_asm(fname: str, tac_jsn: list) -> None:
-    """ Converts tac instructions list to assembly """
-    # Check if fileformat is correct
-    assert isinstance(tac_jsn, list), f'Tac instr should be a list\n'
-
-    # Convert tac to assembly
-    x64_asm = tac2x64(tac_jsn)     # initialize tac2x64 class here 
-    asm = x64_asm.get_asm_instr()
-
+def convert_instr_to_asm(fname: str, tac_jsn: Iterable[dict], cache = None, stage: str = "asm",
+                         elide_jumps: bool = True, forward_stores: bool = False) -> None:
+    """ Converts tac instructions to assembly, the asm of each declaration is
+        written as soon as it is made, so that only one proc is held at a time
+        cache, stage: see tac2x64
+        elide_jumps, forward_stores: see Procx64 """
     # Save assembly code and create executable
     exe_name = fname + '.exe'
     asm_name = fname + '.s'
-    with open(asm_name, 'w') as afp:
-        total = []
-        for globl in asm:
-            total+=globl
-        tac_ = "\n".join(total)
-        afp.write(tac_)
-        # print(*asm, file=afp, sep='\n')
+    # the .s file only appears once complete
+    part = asm_name + '.part'
+    try:
+        with open(part, 'w') as afp:
+            separator = ''
+            for asm in iter_asm(tac_jsn, cache, stage, elide_jumps, forward_stores):
+                afp.write(separator + "\n".join(asm))
+                separator = '\n'
+    except BaseException:
+        os.remove(part)
+        raise
+    os.replace(part, asm_name)
     os.system(f'gcc -o {exe_name} {asm_name} bx_runtime.c')
     print(f"Compilation succesful for {fname}")
 
@@ -1,6 +1,7 @@
 import sys, argparse, json
 from cfg import *
-from typing import List
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+from tac_store import TacStore, Label, LABEL, RET, ENTRY, label, proc_from_json, write_procs
 
 # ------------------------------------------------------------------------------#
 # Basic Block Creator Class
@@ -10,50 +11,52 @@ class CFG_creator:
     """ Creates Basic Block structure for CFG """
     # import jcc instr from Block class in cfg.py
     jccs = Block.jccs
+    jcc_ids = Block.jcc_ids
 
-    def __init__(self, func_name: str, tac_instr: List[dict], label: str) -> None:
+    def __init__(self, func_name: str, tac_instr: TacStore, label: int) -> None:
         self.__func_name: str = func_name
-        self.__tac_instr: List[dict] = tac_instr
-        assert(tac_instr[-1]["opcode"] == "ret"), f"Last proc instr is not a ret in {func_name}"
-        self.__label_counter: int = int(label)
-        self.__new_labels: List[str] = list()
-        self.__updated_tac_instr: List[dict] = self.__add_labels()
+        # labels and jmps are appended to a copy, the tac of the caller stays as is
+        self.__tac_instr: TacStore = tac_instr.copy()
+        assert(tac_instr.opcodes[-1] == RET), f"Last proc instr is not a ret in {func_name}"
+        self.__label_counter: int = label
+        self.__new_labels: List[Label] = list()
+        # the blocks refer to the instructions by their index in the store
+        self.__updated_tac_instr: List[int] = self.__add_labels()
         self.__num_instr: int = len(self.__updated_tac_instr)
         self.__blocks: List[Block] = self.__block_inference()
 
     # ---------------------------------------------------------------------------#
     # Helper functions
 
-    def __create_new_label(self) -> str:
+    def __create_new_label(self) -> Label:
         """ Create and return a new label """
-        label = f"{self.__label_counter}"
+        new_label = label(self.__label_counter)
         self.__label_counter += 1
-        return label
+        return new_label
 
-    def __create_label_instr(self, name: str) -> dict:
-        """ Create and returns a label instr for the proc """
-        label_name = f"%.L{name}"
-        self.__new_labels.append(label_name)
-        return {"opcode": "label",
-                "args": [label_name],
-                "result": None}
+    def __create_label_instr(self, new_label: Label) -> int:
+        """ Create a label instr for the proc and returns its index """
+        self.__new_labels.append(new_label)
+        return self.__tac_instr.append(LABEL, self.__tac_instr.intern(new_label))
 
-    def __add_labels(self) -> List[dict]:
+    def __add_labels(self) -> List[int]:
         """ Divide proc code into basic blocks by adding labels """
-        new_tac_instr: List = []
+        new_tac_instr: List[int] = []
+        opcodes = self.__tac_instr.opcodes
+        num_instr = len(opcodes)
         # add entry label
-        new_tac_instr.append(self.__create_label_instr("entry"))
+        new_tac_instr.append(self.__create_label_instr(ENTRY))
         # parse tac instr to add lable after each jcc
-        for index, instr in enumerate(self.__tac_instr):
-            new_tac_instr.append(instr)
-            if instr["opcode"] in self.jccs:
+        for index in range(num_instr):
+            new_tac_instr.append(index)
+            if opcodes[index] in self.jcc_ids:
                 # if the next instruction is not already a label then add one
-                if self.__tac_instr[index+1]["opcode"] != "label":
+                if opcodes[index+1] != LABEL:
                     new_tac_instr.append(self.__create_label_instr(self.__create_new_label()))
 
         return new_tac_instr
 
-    def return_labs(self) -> List[str]:
+    def return_labs(self) -> List[Label]:
         """ Return list of new labels created """
         return self.__new_labels
 
@@ -68,6 +71,8 @@ class CFG_creator:
         """ Creates Blocks from the updated tac_instr """
         current_block_instr = []
         blocks: List[Block] = []
+        store = self.__tac_instr
+        opcodes = store.opcodes
 
         for index, instr in enumerate(self.__updated_tac_instr):
             # print(index)      # DEBUG
@@ -75,20 +80,20 @@ class CFG_creator:
             
             # append the first label instr and assert it is a label
             if not len(current_block_instr):
-                assert(instr["opcode"] == "label"), f'First instruction not a label {instr}'
+                assert(opcodes[instr] == LABEL), f'First instruction not a label {store.view(instr)}'
 
             # Create a block until last instr
             if index == len(self.__updated_tac_instr)-1:
                 current_block_instr.append(instr)
-                blocks.append(Block(current_block_instr))
+                blocks.append(Block(store, current_block_instr))
                 # print(current_block_instr)
                 current_block_instr = []
                 continue
 
             # end a block if next instr is label
-            if self.__updated_tac_instr[index+1]["opcode"] == "label":
+            if opcodes[self.__updated_tac_instr[index+1]] == LABEL:
                 current_block_instr.append(instr)
-                blocks.append(Block(current_block_instr))
+                blocks.append(Block(store, current_block_instr))
                 # print(current_block_instr)
                 current_block_instr = []
                 continue
@@ -116,13 +121,30 @@ class CFG_creator:
 # Main function
 # ------------------------------------------------------------------------------#
 
-def get_serialized_tac(tac_instr: List[dict]) -> List[dict]:
-    """ Creates the CFG for given tac instr """
-    serialized_tac = []
+def get_serialized_tac(tac_instr: List[dict], cache = None) -> List[dict]:
+    """ Creates the CFG for given tac instr
+        cache: proc_cache.ProcCache holding the optimized tac of unchanged procs """
+    return list(iter_serialized_tac(tac_instr, cache))
+
+def iter_serialized_tac(tac_instr: Iterable[dict], cache = None,
+                        stats: Optional[Dict[str, PassStats]] = None,
+                        passes: Optional[Tuple[str, ...]] = None, budget: int = 16) -> Iterator[dict]:
+    """ Yields the optimized tac of each global declaration as soon as it is
+        read, see get_serialized_tac
+        cache: the cache must be keyed by passes and budget
+        stats: sums the statistics of every pass over the optimized procs by
+               pass name, cached procs are not optimized
+        passes, budget: the passes of a round, by default CFG.passes, and the
+                        rounds they run for at most, see CFG.optimization """
     for decl in tac_instr:
         # print(decl)
         # print('\n')
-        if "proc" in decl:
+        proc_tac = None
+        if "proc" in decl and cache is not None:
+            proc_tac = cache.get(decl["proc"][1:], "cfg")
+        if proc_tac is not None:
+            yield proc_tac
+        elif "proc" in decl:
             # get the final prev label counter and 
             if len(decl["labels"]):
                 # print(sorted(decl["labels"]))
@@ -133,20 +155,23 @@ def get_serialized_tac(tac_instr: List[dict]) -> List[dict]:
             assert decl["proc"][0] == '@'
             cfg_reader = CFG_creator(decl["proc"][1:], decl["body"], label)
             basic_blocks = cfg_reader.return_blocks()
-            cfg = CFG(basic_blocks, decl["proc"][1:])
-            cfg.optimization()
+            cfg = CFG(basic_blocks, decl["proc"][1:], passes=passes)
+            cfg.optimization(budget)
+            if stats is not None:
+                for pass_stats in cfg.pass_stats():
+                    stats.setdefault(pass_stats.name, PassStats(pass_stats.name)).add(pass_stats)
             proc_tac = __create_tac(decl, cfg.serialized_tac(), cfg_reader.return_labs())
-            serialized_tac.append(proc_tac)
+            if cache is not None:
+                cache.put(decl["proc"][1:], "cfg", proc_tac)
+            yield proc_tac
         else:
-            serialized_tac.append(decl)
-    # print(serialized_tac)
-    return serialized_tac
+            yield decl
 
-def get_max_label(labels: List[str]) -> List[str]:
+def get_max_label(labels: List[Label]) -> int:
     """ Returns the max label in the list """
-    return max([int(lab[3:]) for lab in labels])
+    return max([lab.number for lab in labels])
 
-def __create_tac(declaration: Dict[str, List[dict]], new_instr: List[dict], new_labs: List[dict]) -> dict:
+def __create_tac(declaration: dict, new_instr: TacStore, new_labs: List[str]) -> dict:
     """ Recreates the tac form for the serialized instructions """
     return {"proc": declaration["proc"],
             "args": declaration["args"],
@@ -154,11 +179,14 @@ def __create_tac(declaration: Dict[str, List[dict]], new_instr: List[dict], new_
             "temps": declaration["temps"],
             "labels": declaration["labels"]+new_labs}
 
-def write_serial_tac(filename: str, serialized_tac: List[dict]) -> None:
+def write_serial_tac(filename: str, serialized_tac: Iterable[dict]) -> None:
     """ Wrties the serialized tac to a json file """
-    sname = filename + ".serial.json"
-    with open(sname, "w") as fp:
-        json.dump(serialized_tac, fp, indent=3)
+    for _ in stream_serial_tac(filename, serialized_tac):
+        pass
+
+def stream_serial_tac(filename: str, serialized_tac: Iterable[dict]) -> Iterator[dict]:
+    """ Writes the serialized tac to a json file while passing it on """
+    yield from write_procs(filename + ".serial.json", serialized_tac)
 
 if __name__ == "__main__":
 
@@ -170,7 +198,7 @@ if __name__ == "__main__":
     assert(filename[-5:] == ".json"), f"Wrong format for input file {filename}"
 
     with open(filename, 'r') as fp: # save the file
-        tac_instr = json.load(fp)
+        tac_instr = [proc_from_json(decl) for decl in json.load(fp)]
 
     serial_tac = get_serialized_tac(tac_instr)
     write_serial_tac(filename[:-5], serial_tac)
\ No newline at end of file
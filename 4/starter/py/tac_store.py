@@ -0,0 +1,271 @@
+"""
+    Struct of arrays storage for the TAC of a proc.
+
+    Instruction i is (opcodes[i], args1[i], args2[i], args3[i], results[i]):
+    the opcode as an id into OPCODES and the arguments and result as ids into
+    the operand table of the store, where every temporary, label, name and
+    integer is interned once. Id 0 is None and also marks a missing
+    argument; only the compare and branch form of the jccs, jl a, b, L,
+    has a third argument. The passes read the arrays directly and only decode operands
+    when they need their text; the list of dicts form of the .tac.json files
+    is produced by to_json and read back by from_json.
+
+    Temporaries and labels are numbered: temp(n) and label(n) return the one
+    Temp or Label of that number, so they are made and hashed once per
+    process instead of once per use, and the passes read the number instead
+    of parsing the text. They are str subclasses holding their %n and %.Ln
+    text, which the .tac.json files and the assembly use as is. Global
+    variables and procs stay "@name" strings.
+"""
+
+import os
+import json
+from array import array
+from typing import Dict, List, Union, Iterable, Iterator
+
+class Temp(str):
+    """ Temporary %number of a proc """
+    number: int
+
+    def __reduce__(self):
+        # unpickled temps are the interned ones again
+        return (temp, (self.number,))
+
+class Label(str):
+    """ Label %.Lnumber of a proc, the number is "entry" for the entry block """
+    number: Union[int, str]
+
+    def __reduce__(self):
+        return (label, (self.number,))
+
+def _make(kind: type, text: str, number: Union[int, str]):
+    value = str.__new__(kind, text)
+    value.number = number
+    return value
+
+_temps: List[Temp] = []
+_labels: List[Label] = []
+
+def temp(number: int) -> Temp:
+    """ Returns the temporary of the number """
+    while len(_temps) <= number:
+        _temps.append(_make(Temp, f'%{len(_temps)}', len(_temps)))
+    return _temps[number]
+
+def label(number: Union[int, str]) -> Label:
+    """ Returns the label of the number """
+    if number == "entry":
+        return ENTRY
+    while len(_labels) <= number:
+        _labels.append(_make(Label, f'%.L{len(_labels)}', len(_labels)))
+    return _labels[number]
+
+ENTRY: Label = _make(Label, '%.Lentry', "entry")
+
+Operand = Union[Temp, Label, str, int, None]
+
+def parse(value: Union[str, int, None]) -> Operand:
+    """ Returns the operand of its .tac.json form """
+    if type(value) is str and value[0] == '%':
+        if value.startswith('%.L'):
+            number = value[3:]
+            return label(int(number) if number.isnumeric() else number)
+        return temp(int(value[1:]))
+    return value
+
+OPCODES = ("nop", "label", "const", "copy",
+           "add", "sub", "mul", "div", "mod", "and", "or", "xor", "shl", "shr",
+           "neg", "not",
+           "jmp", "jz", "jnz", "jl", "jle", "jnl", "jnle",
+           "je", "jne", "jnge", "jng", "jg", "jge",
+           "setz", "setnz", "setl", "setle", "setnl", "setnle",
+           "param", "call", "ret")
+OPCODE_IDS: Dict[str, int] = {opcode: index for index, opcode in enumerate(OPCODES)}
+
+NOP, LABEL, CONST, COPY = (OPCODE_IDS[opcode] for opcode in ("nop", "label", "const", "copy"))
+JMP, PARAM, CALL, RET = (OPCODE_IDS[opcode] for opcode in ("jmp", "param", "call", "ret"))
+
+# operand id of None
+NONE = 0
+
+class InstrView:
+    """ Read only view of one instruction, decoded on access """
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: "TacStore", index: int) -> None:
+        self.store: TacStore = store
+        self.index: int = index
+
+    @property
+    def opcode(self) -> str:
+        return OPCODES[self.store.opcodes[self.index]]
+
+    @property
+    def args(self) -> List[Operand]:
+        return self.store.args(self.index)
+
+    @property
+    def result(self) -> Operand:
+        return self.store.operands[self.store.results[self.index]]
+
+    def __repr__(self) -> str:
+        return repr(self.store.instr(self.index))
+
+class TacStore:
+    """ Instructions of one proc, instructions are only appended and are
+        referred to by their index """
+    __slots__ = ('opcodes', 'args1', 'args2', 'args3', 'results', 'operands', '__operand_ids')
+
+    def __init__(self) -> None:
+        self.opcodes: array = array('B')
+        self.args1: array = array('i')
+        self.args2: array = array('i')
+        self.args3: array = array('i')
+        self.results: array = array('i')
+        self.operands: List[Operand] = [None]
+        self.__operand_ids: Dict[Operand, int] = {None: NONE}
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TacStore) and self.to_json() == other.to_json()
+
+    def __repr__(self) -> str:
+        return repr(self.to_json())
+
+    # ---------------------------------------------------------------------------#
+    # Building
+
+    def intern(self, value: Operand) -> int:
+        """ Returns the id of the operand, adding it to the table if needed """
+        operand_id = self.__operand_ids.get(value)
+        if operand_id is None:
+            operand_id = len(self.operands)
+            self.operands.append(value)
+            self.__operand_ids[value] = operand_id
+        return operand_id
+
+    def append(self, opcode: int, arg1: int = NONE, arg2: int = NONE, arg3: int = NONE, result: int = NONE) -> int:
+        """ Appends an instruction given by ids and returns its index """
+        self.opcodes.append(opcode)
+        self.args1.append(arg1)
+        self.args2.append(arg2)
+        self.args3.append(arg3)
+        self.results.append(result)
+        return len(self.opcodes) - 1
+
+    def emit(self, opcode: str, args: List[Operand], result: Operand) -> int:
+        """ Appends an instruction in the {"opcode", "args", "result"} form
+            and returns its index """
+        assert(len(args) <= 3), f"Too many arguments in {opcode} {args}"
+        intern = self.intern
+        return self.append(OPCODE_IDS[opcode],
+                           intern(args[0]) if args else NONE,
+                           intern(args[1]) if len(args) > 1 else NONE,
+                           intern(args[2]) if len(args) > 2 else NONE,
+                           intern(result))
+
+    def copy(self) -> "TacStore":
+        """ Returns a copy that can be appended to independently """
+        store = TacStore()
+        store.operands = self.operands.copy()
+        store.__operand_ids = self.__operand_ids.copy()
+        store.opcodes = self.opcodes[:]
+        store.args1 = self.args1[:]
+        store.args2 = self.args2[:]
+        store.args3 = self.args3[:]
+        store.results = self.results[:]
+        return store
+
+    def select(self, indices: List[int]) -> "TacStore":
+        """ Returns a new store holding the given instructions in that order """
+        store = TacStore()
+        store.operands = self.operands.copy()
+        store.__operand_ids = self.__operand_ids.copy()
+        opcodes, args1, args2, args3, results = self.opcodes, self.args1, self.args2, self.args3, self.results
+        store.opcodes = array('B', [opcodes[i] for i in indices])
+        store.args1 = array('i', [args1[i] for i in indices])
+        store.args2 = array('i', [args2[i] for i in indices])
+        store.args3 = array('i', [args3[i] for i in indices])
+        store.results = array('i', [results[i] for i in indices])
+        return store
+
+    # ---------------------------------------------------------------------------#
+    # Reading
+
+    def opcode(self, index: int) -> str:
+        """ Returns the opcode name of the instruction """
+        return OPCODES[self.opcodes[index]]
+
+    def args(self, index: int) -> List[Operand]:
+        """ Returns the decoded arguments of the instruction """
+        arg1, arg2, arg3 = self.args1[index], self.args2[index], self.args3[index]
+        if arg3:
+            return [self.operands[arg1], self.operands[arg2], self.operands[arg3]]
+        if arg2:
+            return [self.operands[arg1], self.operands[arg2]]
+        if arg1:
+            return [self.operands[arg1]]
+        return []
+
+    def result(self, index: int) -> Operand:
+        """ Returns the decoded result of the instruction """
+        return self.operands[self.results[index]]
+
+    def view(self, index: int) -> InstrView:
+        """ Returns a view of the instruction, e.g. for error messages """
+        return InstrView(self, index)
+
+    # ---------------------------------------------------------------------------#
+    # Conversion from and to the .tac.json form
+
+    def instr(self, index: int) -> dict:
+        """ Returns the instruction in the {"opcode", "args", "result"} form """
+        return {"opcode": OPCODES[self.opcodes[index]],
+                "args": self.args(index),
+                "result": self.operands[self.results[index]]}
+
+    def to_json(self) -> List[dict]:
+        """ Returns all instructions in the {"opcode", "args", "result"} form """
+        return [self.instr(index) for index in range(len(self.opcodes))]
+
+    @staticmethod
+    def from_json(instrs: List[dict]) -> "TacStore":
+        """ Builds a store from instructions in the {"opcode", "args", "result"} form """
+        store = TacStore()
+        for instr in instrs:
+            store.emit(instr["opcode"], [parse(arg) for arg in instr["args"]], parse(instr["result"]))
+        return store
+
+def proc_to_json(decl: dict) -> dict:
+    """ Returns a global declaration with the body of a proc in .tac.json form """
+    if "proc" not in decl:
+        return decl
+    return dict(decl, body=decl["body"].to_json())
+
+def proc_from_json(decl: dict) -> dict:
+    """ Returns a global declaration read from .tac.json with the body of a proc in a TacStore """
+    if "proc" not in decl:
+        return decl
+    return dict(decl, args=[parse(arg) for arg in decl["args"]], body=TacStore.from_json(decl["body"]),
+                temps=[parse(t) for t in decl["temps"]], labels=[parse(lab) for lab in decl["labels"]])
+
+def write_procs(filename: str, decls: Iterable[dict]) -> Iterator[dict]:
+    """ Writes the global declarations to a .json file while passing them on,
+        with the text json.dump(decls, indent=3) gives. The file is written
+        as filename.part and renamed when the last declaration is in """
+    part = filename + ".part"
+    try:
+        with open(part, "w") as fp:
+            separator = "[\n   "
+            for decl in decls:
+                # the members of the list are indented one level deeper
+                fp.write(separator + json.dumps(proc_to_json(decl), indent=3).replace("\n", "\n   "))
+                separator = ",\n   "
+                yield decl
+            fp.write("[]" if separator == "[\n   " else "\n]")
+    except BaseException:
+        os.remove(part)
+        raise
+    os.replace(part, filename)
@@ -0,0 +1,16 @@
+"""
+    The tests import the compiler modules from the py directory and run in
+    it, as bxcc.py does: gcc links the assembly with bx_runtime.c from there.
+"""
+
+import os
+import sys
+import pytest
+
+PY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PY_DIR)
+
+@pytest.fixture(autouse=True)
+def in_py_dir(monkeypatch):
+    """ Runs every test from the py directory """
+    monkeypatch.chdir(PY_DIR)
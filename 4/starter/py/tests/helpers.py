@@ -0,0 +1,71 @@
+"""
+    Helpers shared by the tests: the sources they run on and builds of
+    programs down to an executable.
+"""
+
+import io
+import os
+import glob
+import contextlib
+import subprocess
+from typing import List, Tuple
+
+PY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = sorted(glob.glob(os.path.join(PY_DIR, "..", "examples", "*.bx")))
+
+def bx_sources() -> List[str]:
+    """ Returns the text of every .bx file in the lab """
+    files = glob.glob(os.path.join(PY_DIR, "..", "..", "..", "**", "*.bx"), recursive=True)
+    sources = []
+    for name in sorted(files):
+        with open(name) as fp:
+            sources.append(fp.read())
+    return sources
+
+def dump_ast(node) -> str:
+    """ Renders an AST with all node attributes, for comparing ASTs """
+    from ast_fields import node_fields
+    if isinstance(node, list):
+        return "[" + ",".join(dump_ast(n) for n in node) + "]"
+    if hasattr(node, "__dict__") or hasattr(type(node), "__slots__"):
+        fields = sorted(node_fields(node).items())
+        return type(node).__name__ + "{" + ",".join(f"{k}={dump_ast(v)}" for k, v in fields) + "}"
+    return repr(node)
+
+def quiet():
+    """ Swallows what the phases print """
+    return contextlib.redirect_stdout(io.StringIO())
+
+def write_source(directory, name: str, text: str) -> str:
+    """ Writes a program to directory/name.bx and returns its path """
+    source = os.path.join(str(directory), f"{name}.bx")
+    with open(source, "w") as fp:
+        fp.write(text)
+    return source
+
+def tac_of(source: str, **flags) -> List[dict]:
+    """ Returns the tac of a .bx file, flags are passed to ast2tac.ast_to_tac """
+    import ast2tac
+    import bx2front
+    with quiet():
+        return ast2tac.ast_to_tac(bx2front.get_ast(source, True, True), **flags)
+
+def checked_ast(text: str):
+    """ Parses and type checks a program """
+    from dfa_scanner import DFALexer
+    from rd_parser import RDParser
+    ast = RDParser(DFALexer()).parse(text)
+    with quiet():
+        ast.global_type_check()
+        ast.type_check()
+    return ast
+
+def run_tac(tac: List[dict], base: str, cfg: bool = True) -> Tuple[int, str]:
+    """ Builds base.exe from the tac, through the CFG optimizations or not,
+        and returns its exit code and output """
+    import tac_cfopt
+    import tac2x64
+    with quiet():
+        tac2x64.convert_instr_to_asm(base, tac_cfopt.get_serialized_tac(tac) if cfg else tac)
+    result = subprocess.run([base + ".exe"], capture_output=True, text=True)
+    return result.returncode, result.stdout
@@ -0,0 +1,21 @@
+"""
+    ASTs loaded from the AST cache against freshly parsed ones.
+"""
+
+import io
+import contextlib
+import pytest
+import bx2front
+from programs import make_program
+from helpers import EXAMPLES, dump_ast, write_source
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_loaded_ast_matches_parsed(tmp_path, fused):
+    cache_dir = str(tmp_path / "cache")
+    for source in EXAMPLES + [write_source(tmp_path, "prog", make_program(20, 5))]:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            parsed = dump_ast(bx2front.get_ast(source, True, True, fused, cache_dir=cache_dir))
+            loaded = dump_ast(bx2front.get_ast(source, True, True, fused, cache_dir=cache_dir))
+        assert(out.getvalue().count("ast loaded from cache") == 1), f"{source} was not loaded from the cache"
+        assert(loaded == parsed), f"cached AST of {source} differs from the parsed one"
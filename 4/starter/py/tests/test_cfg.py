@@ -0,0 +1,51 @@
+"""
+    The CFG optimizations: the edges the blocks keep against a rebuild
+    from the instrs after every operation, and the passes run to a
+    fixpoint against builds without the CFG.
+"""
+
+import pytest
+import ast2tac
+from programs import make_block_program, make_else_chain_program, make_cfg, procs_of
+from helpers import EXAMPLES, checked_ast, quiet, run_tac, tac_of
+
+def optimize(decl: dict, verify: bool) -> list:
+    """ Returns the optimized tac of a proc """
+    with quiet():
+        cfg = make_cfg(decl, verify)
+        cfg.optimization()
+    return cfg.serialized_tac().to_json()
+
+@pytest.mark.parametrize("source", EXAMPLES)
+def test_edges_match_rebuild_on_examples(source):
+    """ CFG(verify=True) asserts the edges after every operation """
+    for decl in tac_of(source):
+        if "proc" in decl:
+            assert(optimize(decl, True) == optimize(decl, False)), f"verify changed {decl['proc']}"
+
+@pytest.mark.parametrize("text", [make_block_program(1000), make_else_chain_program(20, 6)])
+def test_edges_match_rebuild_on_generated(text):
+    for decl in procs_of(text):
+        assert(optimize(decl, True) == optimize(decl, False)), f"verify changed {decl['proc']}"
+
+@pytest.mark.parametrize("text", [make_block_program(2000), make_else_chain_program(50, 6)])
+def test_fixpoint_prints_as_without_cfg(tmp_path, text):
+    with quiet():
+        tac = ast2tac.ast_to_tac(checked_ast(text))
+    outputs = [run_tac(tac, str(tmp_path / f"prog{cfg}"), cfg) for cfg in (False, True)]
+    assert(outputs[0][0] == 0 and outputs[1] == outputs[0]), "the CFG changed the output"
+
+def test_fixpoint_needs_more_rounds_than_once():
+    """ Threading and coalescing the else chains open up more of both, a
+        single round leaves some behind """
+    decl = procs_of(make_else_chain_program(50, 6))[0]
+    sizes, rounds = [], []
+    for budget in (1, 16):
+        with quiet():
+            cfg = make_cfg(decl)
+            cfg.optimization(budget)
+        sizes.append(len(cfg.serialized_tac()))
+        rounds.append(cfg.get_rounds())
+    assert(rounds[0] == 1 and 1 < rounds[1] < 16), f"rounds {rounds}"
+    assert(sizes[1] < sizes[0]), f"the fixpoint left {sizes[1]} instrs, one round {sizes[0]}"
+    assert(sum(stats.changes for stats in cfg.pass_stats()) > 0)
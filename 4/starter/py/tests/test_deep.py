@@ -0,0 +1,19 @@
+"""
+    Deeply nested programs, well past the interpreter recursion limit, go
+    through the rd front end, tac generation and the CFG.
+"""
+
+import pytest
+from programs import make_deep_program
+from helpers import run_tac, tac_of, write_source
+
+DEPTH = 5000
+
+@pytest.mark.parametrize("kind", ["else_if", "nested_if", "and_chain", "sum"])
+def test_deep_nesting(tmp_path, kind):
+    source = write_source(tmp_path, kind, make_deep_program(kind, DEPTH))
+    tac = tac_of(source)
+    # x is 3: the else if chain and the nested ifs print it, the && chain
+    # prints 1 and the sum adds x DEPTH times to 1
+    expected = {"else_if": "3", "nested_if": "3", "and_chain": "1", "sum": str(3 * DEPTH + 1)}[kind]
+    assert(run_tac(tac, str(tmp_path / kind)) == (0, expected + "\n"))
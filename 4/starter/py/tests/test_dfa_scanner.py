@@ -0,0 +1,31 @@
+"""
+    The DFA scanner against the ply rules of scanner.py.
+"""
+
+import io
+import contextlib
+import pytest
+import ply.lex as lex
+import scanner
+import dfa_scanner
+from helpers import bx_sources
+
+CORNER_CASES = ["a-1 - -0 012 x--5 // c\n y <<= >>> != !! && & || | ~^ _x $ é \r\n",
+                "x //", "-", "a\n\n//x\n b"]
+
+@pytest.fixture(scope="module")
+def ply_lexer():
+    return lex.lex(module=scanner, tabcache=True)
+
+@pytest.mark.parametrize("data", bx_sources() + CORNER_CASES)
+def test_same_tokens_and_errors_as_ply(ply_lexer, data):
+    """ Token streams and the errors printed on bad input are the same """
+    ply_out, dfa_out = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(ply_out):
+        ply_lexer.input(data)
+        ply_lexer.lineno = 1
+        expected = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in ply_lexer]
+    with contextlib.redirect_stdout(dfa_out):
+        got = [tuple(tok) for tok in dfa_scanner.tokenize(data)]
+    assert(got == expected), f"token streams differ for:\n{data[:200]}"
+    assert(dfa_out.getvalue() == ply_out.getvalue()), f"lexing errors differ for:\n{data[:200]}"
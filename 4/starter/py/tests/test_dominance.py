@@ -0,0 +1,74 @@
+"""
+    The dominance of the CFGs against the textbook set equations, before
+    and after the CFG optimizations.
+"""
+
+import pytest
+from typing import Tuple
+from programs import (make_block_program, make_else_chain_program, make_cfg, procs_of,
+                      FIZZBUZZ_LOOP, COLLATZ_LOOP, BOOL_LOOP)
+from helpers import EXAMPLES, quiet
+
+def naive_dominance(cfg) -> Tuple[dict, dict, dict]:
+    """ Returns the dominators, idoms and frontiers of the reachable blocks of
+        the CFG by label, from the textbook set equations """
+    blocks = {block.get_block_label(): block for block in cfg.dominance().reverse_postorder()}
+    entry = next(iter(blocks))
+    doms = {label: set(blocks) for label in blocks}
+    doms[entry] = {entry}
+    changed = True
+    while changed:
+        changed = False
+        for label, block in blocks.items():
+            if label == entry:
+                continue
+            preds = [doms[pred] for pred in block.predecessors() if pred in blocks]
+            new = set.intersection(*preds) | {label}
+            if new != doms[label]:
+                doms[label], changed = new, True
+    # the idom is the strict dominator dominated by all the others
+    idoms = {label: max(dom - {label}, key=lambda d: len(doms[d]), default=None) for label, dom in doms.items()}
+    frontiers = {label: set() for label in blocks}
+    for label, block in blocks.items():
+        for pred in block.predecessors():
+            if pred in blocks:
+                for dom in doms[pred]:
+                    if dom == label or dom not in doms[label]:
+                        frontiers[dom].add(label)
+    return doms, idoms, frontiers
+
+def check(cfg) -> None:
+    dominance = cfg.dominance()
+    assert(cfg.dominance() is dominance), "the dominance of an unchanged CFG is computed again"
+    doms, idoms, frontiers = naive_dominance(cfg)
+    for label, dom in doms.items():
+        assert(dominance.idom(label) == idoms[label]), f"idom of {label}"
+        assert(set(dominance.frontier(label)) == frontiers[label]), f"frontier of {label}"
+        assert(all(dominance.dominates(other, label) == (other in dom) for other in doms)), \
+            f"dominators of {label}"
+        assert(all(dominance.idom(child) == label for child in dominance.children(label))), \
+            f"children of {label}"
+
+def read(source: str) -> str:
+    with open(source) as fp:
+        return fp.read()
+
+@pytest.mark.parametrize("text", [read(source) for source in EXAMPLES] +
+                         [make_block_program(600), make_else_chain_program(20, 6),
+                          FIZZBUZZ_LOOP, COLLATZ_LOOP, BOOL_LOOP])
+def test_dominance_matches_set_equations(text):
+    for decl in procs_of(text):
+        cfg = make_cfg(decl)
+        check(cfg)
+        with quiet():
+            cfg.optimization()
+        check(cfg)
+
+def test_edits_recompute_dominance():
+    decl = procs_of(make_else_chain_program(20, 6))[0]
+    cfg = make_cfg(decl)
+    dominance = cfg.dominance()
+    with quiet():
+        cfg.optimization()
+    assert(any(stats.changes or stats.removed for stats in cfg.pass_stats()))
+    assert(cfg.dominance() is not dominance), "an edit kept the dominance"
@@ -0,0 +1,30 @@
+"""
+    Folded builds against unfolded ones. The reference is x64 and not
+    tacrun, whose div and mod go through floats.
+"""
+
+import pytest
+from programs import make_constant_program
+from helpers import run_tac, tac_of, write_source
+
+# products by zero whose other operand traps, x*0 must not drop the division
+TRAP_PROGRAMS = [
+    "def main() { var x = 5 : int; var y = 0 : int; print((x / y) * 0); }",
+    "def main() { var x = 5 : int; var y = 0 : int; print(0 * (x % y)); }",
+    "def main() { var x = 0 - 9223372036854775807 - 1 : int; print((x / (0 - 1)) * 0); }",
+]
+
+def run_both(tmp_path, text: str):
+    """ Returns the exit code and output of the program unfolded and folded """
+    source = write_source(tmp_path, "prog", text)
+    return [run_tac(tac_of(source, fold=fold), str(tmp_path / f"prog{fold}")) for fold in (False, True)]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_constant_expressions(tmp_path, seed):
+    unfolded, folded = run_both(tmp_path, make_constant_program(100, seed))
+    assert(unfolded[0] == 0 and folded == unfolded), f"folding changed the output of program {seed}"
+
+@pytest.mark.parametrize("text", TRAP_PROGRAMS)
+def test_trapping_product_by_zero(tmp_path, text):
+    unfolded, folded = run_both(tmp_path, text + "\n")
+    assert(unfolded[0] != 0 and folded[0] == unfolded[0]), f"folding changed the trap of {text}"
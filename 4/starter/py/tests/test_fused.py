@@ -0,0 +1,25 @@
+"""
+    The fused type check and tac generation walk against the separate ones.
+"""
+
+import pytest
+import ast2tac
+from dfa_scanner import DFALexer
+from rd_parser import RDParser
+from programs import make_program
+from helpers import EXAMPLES, quiet
+
+PROGRAMS = [open(source).read() for source in EXAMPLES] + [make_program(20, 10)]
+
+@pytest.mark.parametrize("data", PROGRAMS)
+def test_same_tac_as_separate_walks(data):
+    """ The fused walk generates the tac of type_check then ast_to_tac """
+    tacs = []
+    for fused in (False, True):
+        ast = RDParser(DFALexer()).parse(data)
+        with quiet():
+            ast.global_type_check()
+            if not fused:
+                ast.type_check()
+            tacs.append(ast2tac.ast_to_tac(ast, fused))
+    assert(tacs[1] == tacs[0]), "fused mode generated different tac"
@@ -0,0 +1,55 @@
+"""
+    The optimization levels: the names they go by and the programs built at
+    every level against each other.
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+from opt_levels import LEVELS, get_level
+from programs import FIZZBUZZ_LOOP, COLLATZ_LOOP, BOOL_LOOP
+from helpers import EXAMPLES, write_source
+
+LOOPS = {"fizzbuzz_loop": FIZZBUZZ_LOOP, "collatz_loop": COLLATZ_LOOP, "bool_loop": BOOL_LOOP}
+
+def build(source: str, *flags: str) -> str:
+    """ Compiles the program with bxcc.py and returns what its executable prints """
+    subprocess.run([sys.executable, "bxcc.py", source, *flags], check=True, capture_output=True)
+    return subprocess.run([source[:-3] + ".exe"], check=True, capture_output=True, text=True).stdout
+
+def read_asm(source: str) -> str:
+    with open(source[:-3] + ".s") as fp:
+        return fp.read()
+
+def test_level_names():
+    assert(get_level("2") is get_level("O2") is LEVELS["O2"])
+    with pytest.raises(ValueError):
+        get_level("4")
+
+@pytest.mark.parametrize("name", sorted(LOOPS) + [os.path.basename(example)[:-3] for example in EXAMPLES])
+def test_levels_print_the_same(tmp_path, name):
+    outputs = set()
+    for level in LEVELS:
+        if name in LOOPS:
+            source = write_source(tmp_path, name + level, LOOPS[name])
+        else:
+            source = str(tmp_path / f"{name}{level}.bx")
+            shutil.copy(os.path.join("..", "examples", f"{name}.bx"), source)
+        outputs.add(build(source, "-" + level))
+    assert(len(outputs) == 1), f"the levels changed the output of {name}"
+
+def test_levels_keep_their_cache_entries_apart(tmp_path):
+    """ Builds at other levels sharing the cache do not hand each other
+        their entries """
+    cache_dir = str(tmp_path / "cache")
+    source = write_source(tmp_path, "prog", COLLATZ_LOOP)
+    clean = dict()
+    for level in ("O0", "O2"):
+        build(source, "-" + level)
+        clean[level] = read_asm(source)
+    assert(clean["O0"] != clean["O2"])
+    for level in ("O0", "O2", "O0", "O2"):
+        build(source, "-" + level, "--cache-dir", cache_dir)
+        assert(read_asm(source) == clean[level]), f"the cached {level} build differs from a clean one"
@@ -0,0 +1,27 @@
+"""
+    Operands in Sethi-Ullman order against source order.
+"""
+
+import pytest
+from programs import make_deep_program, make_temp_program, order_live_temps
+from helpers import EXAMPLES, run_tac, tac_of, write_source
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    work = tmp_path_factory.mktemp("order")
+    # the sum nests to the right, in source order each + keeps its left operand live
+    return EXAMPLES + [write_source(work, "temps", make_temp_program(3, 2)),
+                       write_source(work, "nested_sum", make_deep_program("sum", 100))]
+
+def test_same_output(sources, tmp_path):
+    for source in sources:
+        outputs = [run_tac(tac_of(source, order=order), str(tmp_path / f"out{order}")) for order in (False, True)]
+        assert(outputs[0][0] == 0 and outputs[1] == outputs[0]), f"ordering changed the output of {source}"
+
+def test_fewer_live_temps(sources):
+    for source in sources:
+        before, after = order_live_temps(source, False), order_live_temps(source, True)
+        for proc in before:
+            assert(after[proc] <= before[proc]), f"ordering made {proc} of {source} keep more temps live"
+    nested_sum = order_live_temps(sources[-1], True)
+    assert(nested_sum == {"@main": 3}), f"the nested sum keeps {nested_sum} temps live"
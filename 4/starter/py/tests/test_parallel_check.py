@@ -0,0 +1,40 @@
+"""
+    Proc type checking in a process pool against the sequential check.
+"""
+
+import pytest
+import ast2tac
+import bx2front
+from dfa_scanner import DFALexer
+from rd_parser import RDParser
+from programs import make_program
+from helpers import quiet
+
+PROGRAM = make_program(40, 5)
+
+def check(data: str, jobs: int):
+    """ Parses and type checks the program with the number of processes """
+    ast = RDParser(DFALexer()).parse(data)
+    ast.global_type_check()
+    if jobs > 1:
+        bx2front.parallel_type_check(ast, jobs)
+    else:
+        ast.type_check()
+    return ast
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_same_tac_as_sequential_check(jobs):
+    with quiet():
+        expected = ast2tac.ast_to_tac(check(PROGRAM, 1))
+        assert(ast2tac.ast_to_tac(check(PROGRAM, jobs)) == expected), f"tac differs with {jobs} jobs"
+
+def test_first_error_in_source_order():
+    """ The error of the first bad proc in the source is reported, the callers
+        of p10 and p30 no longer pass enough arguments """
+    bad = PROGRAM.replace("def p10(", "def p10(z : bool, ").replace("def p30(", "def p30(y : bool, ")
+    errors = []
+    for jobs in (1, 4):
+        with pytest.raises(SyntaxError) as error:
+            check(bad, jobs)
+        errors.append(str(error.value))
+    assert(errors[0] == errors[1]), f"different errors {errors}"
@@ -0,0 +1,100 @@
+"""
+    The table caches of ply: a rebuild of an unchanged grammar or lexer
+    loads its tables from __pycache__, an edited one builds them again.
+"""
+
+import sys
+import importlib.util
+from ply import lex, yacc
+
+GRAMMAR = '''
+tokens = ("NUM", "PLUS")
+
+t_PLUS = r"\\+"
+t_ignore = " "
+
+def t_NUM(t):
+    r"[0-9]+"
+    t.value = int(t.value)
+    return t
+
+def t_error(t):
+    raise SyntaxError(t.value)
+
+def p_expr_plus(p):
+    """expr : expr PLUS NUM"""
+    p[0] = p[1] + p[len(p) - 1]
+
+def p_expr_num(p):
+    """expr : NUM"""
+    p[0] = p[1]
+
+def p_error(p):
+    raise SyntaxError(p)
+'''
+
+def load_module(tmp_path, monkeypatch, text: str):
+    """ Writes the text to tmp_path/grammar.py and imports it, so that the
+        caches go to tmp_path/__pycache__ """
+    path = tmp_path / "grammar.py"
+    path.write_text(text)
+    spec = importlib.util.spec_from_file_location("grammar", str(path))
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, "grammar", module)
+    spec.loader.exec_module(module)
+    return module
+
+def spy(monkeypatch, owner, name: str) -> list:
+    """ Records whether each call of the cache reader of owner hit """
+    hits = []
+    read = getattr(owner, name)
+    def recording_read(*args):
+        table = read(*args)
+        hits.append(table is not None)
+        return table
+    monkeypatch.setattr(owner, name, recording_read)
+    return hits
+
+def build_parser(tmp_path, monkeypatch, text: str):
+    module = load_module(tmp_path, monkeypatch, text)
+    return lex.lex(module=module), yacc.yacc(module=module, tabcache=True)
+
+def test_yacc_rebuild_hits_cache(tmp_path, monkeypatch):
+    hits = spy(monkeypatch, yacc, "read_tabcache")
+    for _ in range(2):
+        lexer, parser = build_parser(tmp_path, monkeypatch, GRAMMAR)
+        assert(parser.parse("1 + 2 + 3", lexer=lexer) == 6)
+    assert(hits == [False, True])
+    assert(len(list((tmp_path / "__pycache__").glob("grammar.lrtab-*.pickle"))) == 1)
+
+def test_yacc_edited_rule_misses_cache(tmp_path, monkeypatch):
+    """ A rule docstring takes part in the fingerprint, the cached tables of
+        the old grammar would reject the new sentence """
+    hits = spy(monkeypatch, yacc, "read_tabcache")
+    build_parser(tmp_path, monkeypatch, GRAMMAR)
+    edited = GRAMMAR.replace('"""expr : expr PLUS NUM"""', '"""expr : expr PLUS NUM\n            | expr NUM"""')
+    lexer, parser = build_parser(tmp_path, monkeypatch, edited)
+    assert(hits == [False, False])
+    assert(parser.parse("1 + 2 3", lexer=lexer) == 6)
+    assert(len(list((tmp_path / "__pycache__").glob("grammar.lrtab-*.pickle"))) == 2)
+
+def tokens_of(lexer, text: str) -> list:
+    lexer.input(text)
+    return [(token.type, token.value) for token in iter(lexer.token, None)]
+
+def test_lex_rebuild_hits_cache(tmp_path, monkeypatch):
+    hits = spy(monkeypatch, lex, "_read_lextab")
+    for _ in range(2):
+        lexer = lex.lex(module=load_module(tmp_path, monkeypatch, GRAMMAR), tabcache=True)
+        assert(tokens_of(lexer, "12 + 3") == [("NUM", 12), ("PLUS", "+"), ("NUM", 3)])
+    assert(hits == [False, True])
+    assert(len(list((tmp_path / "__pycache__").glob("grammar.lextab-*.pickle"))) == 1)
+
+def test_lex_edited_regex_misses_cache(tmp_path, monkeypatch):
+    hits = spy(monkeypatch, lex, "_read_lextab")
+    lex.lex(module=load_module(tmp_path, monkeypatch, GRAMMAR), tabcache=True)
+    edited = GRAMMAR.replace('r"[0-9]+"', 'r"[0-9]"')
+    lexer = lex.lex(module=load_module(tmp_path, monkeypatch, edited), tabcache=True)
+    assert(hits == [False, False])
+    assert(tokens_of(lexer, "12") == [("NUM", 1), ("NUM", 2)])
+    assert(len(list((tmp_path / "__pycache__").glob("grammar.lextab-*.pickle"))) == 2)
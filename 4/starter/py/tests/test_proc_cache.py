@@ -0,0 +1,35 @@
+"""
+    Builds with the per proc cache against clean builds.
+"""
+
+import sys
+import subprocess
+from programs import make_program
+from helpers import write_source
+
+NUM_PROCS = 20
+
+def build(source: str, *flags: str) -> str:
+    """ Compiles the program with bxcc.py, returns what it printed """
+    return subprocess.run([sys.executable, "bxcc.py", source, *flags],
+                          check=True, capture_output=True, text=True).stdout
+
+def read_asm(source: str) -> str:
+    with open(source[:-3] + ".s") as fp:
+        return fp.read()
+
+def test_edited_build_matches_clean_build(tmp_path):
+    """ After one proc is edited, the cached build only misses that proc and
+        writes the assembly of a clean build """
+    cache_dir = str(tmp_path / "cache")
+    program = make_program(NUM_PROCS, 5)
+    source = write_source(tmp_path, "prog", program)
+    build(source, "--cache-dir", cache_dir)
+    assert(f"proc cache asm: {NUM_PROCS + 1}/{NUM_PROCS + 1} hits" in build(source, "--cache-dir", cache_dir))
+
+    edited = f"def p{NUM_PROCS // 2}(a, b : int) : int {{"
+    write_source(tmp_path, "prog", program.replace(edited, edited + " a = a + 1;"))
+    assert(f"proc cache asm: {NUM_PROCS}/{NUM_PROCS + 1} hits" in build(source, "--cache-dir", cache_dir))
+    cached_asm = read_asm(source)
+    build(source)
+    assert(read_asm(source) == cached_asm), "cached build differs from a clean build"
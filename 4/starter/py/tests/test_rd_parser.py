@@ -0,0 +1,39 @@
+"""
+    The recursive descent parser against ply.yacc, with both scanners.
+"""
+
+import io
+import contextlib
+import pytest
+import my_parser
+from dfa_scanner import DFALexer
+from rd_parser import RDParser
+from helpers import bx_sources, dump_ast
+
+CORNER_CASES = ["def main() { x = a < b < c; }", "def main() { f(, x); }",
+                "def f(a, b : int, ) { var x = 1, y = (2) : int; }", "def main() { x = (a; }", ""]
+
+def run(parse, data: str) -> str:
+    """ Returns what the parse prints and its AST, syntax errors exit after
+        printing the offending token """
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            result = dump_ast(parse(data))
+        except SystemExit as e:
+            result = f"exit {e.code}"
+    return out.getvalue() + result
+
+def ply_parse(data: str):
+    my_parser.lexer.lineno = 1
+    return my_parser.parser.parse(data, lexer=my_parser.lexer, tracking=True)
+
+@pytest.mark.parametrize("data", bx_sources() + CORNER_CASES)
+@pytest.mark.parametrize("scanner", ["ply", "dfa"])
+def test_same_ast_and_errors_as_ply(data, scanner):
+    """ Same AST, or same syntax error, as ply.yacc """
+    def rd_parse(data: str):
+        scan = my_parser.lexer if scanner == "ply" else DFALexer()
+        scan.lineno = 1
+        return RDParser(scan).parse(data)
+    assert(run(rd_parse, data) == run(ply_parse, data)), f"parsers differ for:\n{data[:200]}"
@@ -0,0 +1,25 @@
+"""
+    Builds recycling the temps of finished statements and closed scopes
+    against builds that do not.
+"""
+
+import pytest
+from programs import make_constant_program, make_program, make_temp_program
+from helpers import EXAMPLES, run_tac, tac_of, write_source
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    work = tmp_path_factory.mktemp("recycle")
+    return EXAMPLES + [write_source(work, "temps", make_temp_program(3, 10)),
+                       write_source(work, "program", make_program(5, 10)),
+                       write_source(work, "constants", make_constant_program(30, 0))]
+
+def test_same_output_with_fewer_temps(sources, tmp_path):
+    for source in sources:
+        temps, outputs = [], []
+        for recycle in (False, True):
+            tac = tac_of(source, recycle=recycle)
+            temps.append(sum(len(decl["temps"]) for decl in tac if "proc" in decl))
+            outputs.append(run_tac(tac, str(tmp_path / f"out{recycle}")))
+        assert(outputs[0][0] == 0 and outputs[1] == outputs[0]), f"recycling changed the output of {source}"
+        assert(temps[1] <= temps[0]), f"recycling used more temps in {source}"
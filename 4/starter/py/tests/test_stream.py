@@ -0,0 +1,21 @@
+"""
+    The streaming pipeline of chained generators against the phases run
+    on whole lists.
+"""
+
+import bx2front
+import ast2tac
+import tac_cfopt
+import tac2x64
+from programs import make_program
+from helpers import EXAMPLES, quiet, write_source
+
+def test_same_asm_as_lists(tmp_path):
+    for source in EXAMPLES + [write_source(tmp_path, "procs", make_program(30, 5))]:
+        with quiet():
+            ast = bx2front.get_ast(source, True, True)
+            listed = tac2x64.tac2x64(tac_cfopt.get_serialized_tac(ast2tac.ast_to_tac(ast))).get_asm_instr()
+            ast = bx2front.get_ast(source, True, True)
+            streamed = list(tac2x64.iter_asm(tac_cfopt.iter_serialized_tac(ast2tac.iter_tac(ast))))
+        assert([line for decl in streamed for line in decl] == [line for decl in listed for line in decl]), \
+            f"the pipelines wrote different assembly for {source}"
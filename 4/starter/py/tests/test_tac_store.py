@@ -0,0 +1,37 @@
+"""
+    The TacStore form of the tac against the list of dicts of the .tac.json files.
+"""
+
+import json
+import pytest
+from tac_store import OPCODE_IDS, proc_to_json, proc_from_json
+from programs import make_program
+from helpers import EXAMPLES, tac_of, write_source
+
+def json_text(source: str) -> str:
+    """ Returns the .tac.json text of a program """
+    return json.dumps([proc_to_json(decl) for decl in tac_of(source)])
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    return EXAMPLES + [write_source(tmp_path_factory.mktemp("tac_store"), "prog", make_program(20, 10))]
+
+def test_round_trip(sources):
+    for source in sources:
+        dicts = json.loads(json_text(source))
+        stores = [proc_from_json(decl) for decl in dicts]
+        assert([proc_to_json(decl) for decl in stores] == dicts), f"TacStore of {source} does not round trip"
+
+def test_arrays_match_dicts(sources):
+    """ The opcode and operand arrays hold the instructions of the dicts """
+    for source in sources:
+        for decl in json.loads(json_text(source)):
+            if "proc" not in decl:
+                continue
+            store = proc_from_json(decl)["body"]
+            assert(len(store) == len(decl["body"]))
+            for index, instr in enumerate(decl["body"]):
+                assert(store.opcodes[index] == OPCODE_IDS[instr["opcode"]])
+                assert(store.opcode(index) == instr["opcode"])
+                assert(list(store.args(index)) == instr["args"]), f"args of {instr} in {source}"
+                assert(store.result(index) == instr["result"]), f"result of {instr} in {source}"
@@ -0,0 +1,74 @@
+"""
+    tacrun on the instrs the back end of bx emits beyond the course TAC,
+    read from .tac text and from .tac.json alike.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+TACRUN = os.path.join("..", "tacrun", "tacrun.py")
+LOWEST = -(1 << 63)
+
+def render(instr: tuple) -> str:
+    """ Returns the .tac text of a (result, opcode, args) instr """
+    result, opcode, args = instr
+    if opcode == "label":
+        return f"{args[0]}:"
+    lhs = f"{result} = " if result is not None else ""
+    return f"  {lhs}{opcode} {', '.join(str(arg) for arg in args)};"
+
+def run_main(tmp_path, body: list, form: str) -> str:
+    """ Runs @main with the body, written in the form .tac or .tac.json,
+        and returns what it prints """
+    tac_file = str(tmp_path / f"prog{form}")
+    with open(tac_file, "w") as fp:
+        if form == ".tac":
+            fp.write("proc @main:\n" + "\n".join(render(instr) for instr in body) + "\n")
+        else:
+            json.dump([{"proc": "@main", "args": [],
+                        "body": [{"result": result, "opcode": opcode, "args": list(args)}
+                                 for result, opcode, args in body]}], fp)
+    return subprocess.run([sys.executable, TACRUN, tac_file], check=True,
+                          capture_output=True, text=True).stdout
+
+def load(temp: str, value: int) -> list:
+    """ Returns the instrs setting the temp to the value, the lexer of the
+        .tac text only reads nonnegative literals """
+    if value >= 0:
+        return [(temp, "const", (value,))]
+    return [(temp, "const", (-value,)), (temp, "neg", (temp,))]
+
+def print_temp(temp: str) -> list:
+    return [(None, "param", (1, temp)), (None, "call", ("@__bx_print_int", 1))]
+
+@pytest.mark.parametrize("form", [".tac", ".tac.json"])
+@pytest.mark.parametrize("opcode, u, v, taken", [
+    ("jnle", 5, 3, True), ("jnle", 3, 3, False),
+    ("jl", LOWEST, 1, True), ("jl", 1, LOWEST, False),
+    ("jz", 7, 7, True), ("jnz", 7, 7, False),
+])
+def test_three_operand_jcc(tmp_path, form, opcode, u, v, taken):
+    """ jcc u, v, L jumps on the sign of u - v, which overflows for the
+        lowest int """
+    body = load("%0", u) + load("%1", v) + [
+            (None, opcode, ("%0", "%1", "%.L1")),
+            ("%2", "const", (0,)), (None, "jmp", ("%.L2",)),
+            (None, "label", ("%.L1",)), ("%2", "const", (1,)),
+            (None, "label", ("%.L2",))] + print_temp("%2") + [(None, "ret", ())]
+    assert(run_main(tmp_path, body, form) == f"{int(taken)}\n")
+
+@pytest.mark.parametrize("form", [".tac", ".tac.json"])
+@pytest.mark.parametrize("opcode, outcomes", [
+    ("setz", "010"), ("setnz", "101"), ("setl", "100"),
+    ("setle", "110"), ("setnl", "011"), ("setnle", "001"),
+])
+def test_setcc(tmp_path, opcode, outcomes, form):
+    """ r = setcc u, v on u less than, equal to and greater than v, the
+        unequal pairs overflow u - v """
+    body = []
+    for u, v in ((LOWEST, 1), (4, 4), (1, LOWEST)):
+        body += load("%0", u) + load("%1", v) + [("%2", opcode, ("%0", "%1"))] + print_temp("%2")
+    assert(run_main(tmp_path, body + [(None, "ret", ())], form) == "".join(f"{c}\n" for c in outcomes))
@@ -39,6 +39,8 @@ import types
 import copy
 import os
 import inspect
+import pickle
+import hashlib
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -353,23 +355,7 @@ def _form_master_re(relist, reflags, ldict, toknames):
     regex = '|'.join(relist)
     try:
         lexre = re.compile(regex, reflags)
-
-        # Build the index to function map for the matching engine
-        lexindexfunc = [None] * (max(lexre.groupindex.values()) + 1)
-        lexindexnames = lexindexfunc[:]
-
-        for f, i in lexre.groupindex.items():
-            handle = ldict.get(f, None)
-            if type(handle) in (types.FunctionType, types.MethodType):
-                lexindexfunc[i] = (handle, toknames[f])
-                lexindexnames[i] = f
-            elif handle is not None:
-                lexindexnames[i] = f
-                if f.find('ignore_') > 0:
-                    lexindexfunc[i] = (None, None)
-                else:
-                    lexindexfunc[i] = (None, toknames[f])
-
+        lexindexfunc, lexindexnames = _form_master_index(lexre, ldict, toknames)
         return [(lexre, lexindexfunc)], [regex], [lexindexnames]
     except Exception:
         m = (len(relist) // 2) + 1
@@ -377,6 +363,25 @@ def _form_master_re(relist, reflags, ldict, toknames):
         rlist, rre, rnames = _form_master_re(relist[m:], reflags, ldict, toknames)
         return (llist+rlist), (lre+rre), (lnames+rnames)
 
+# Build the index to function map for the matching engine
+def _form_master_index(lexre, ldict, toknames):
+    lexindexfunc = [None] * (max(lexre.groupindex.values()) + 1)
+    lexindexnames = lexindexfunc[:]
+
+    for f, i in lexre.groupindex.items():
+        handle = ldict.get(f, None)
+        if type(handle) in (types.FunctionType, types.MethodType):
+            lexindexfunc[i] = (handle, toknames[f])
+            lexindexnames[i] = f
+        elif handle is not None:
+            lexindexnames[i] = f
+            if f.find('ignore_') > 0:
+                lexindexfunc[i] = (None, None)
+            else:
+                lexindexfunc[i] = (None, toknames[f])
+
+    return lexindexfunc, lexindexnames
+
 # -----------------------------------------------------------------------------
 # def _statetoken(s,names)
 #
@@ -709,13 +714,65 @@ class LexerReflect(object):
                     self.error = True
             linen += 1
 
+# -----------------------------------------------------------------------------
+#                           === Lexer spec cache ===
+#
+# With tabcache enabled, the master regular expression strings (already split
+# and ordered) are pickled into the __pycache__ directory next to the lexer
+# module.  The file is keyed by a fingerprint of the rule set, so a cache hit
+# lets lex() skip rule validation, sorting and the master regex assembly.
+# The master regexes themselves still have to be compiled by the re module.
+# -----------------------------------------------------------------------------
+
+lextab_version = 1
+
+def _lex_fingerprint(linfo, reflags):
+    parts = [__name__, str(lextab_version), str(reflags),
+             ' '.join(linfo.tokens), repr(linfo.literals), repr(sorted(linfo.stateinfo.items()))]
+    for state in sorted(linfo.stateinfo):
+        parts.append(state)
+        parts.extend('%s=%s' % (fname, _get_regex(f)) for fname, f in linfo.funcsym[state])
+        parts.extend('%s=%s' % (name, r) for name, r in linfo.strsym[state])
+        parts.append(repr(linfo.ignore.get(state)))
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+def _lextab_file(ldict, fingerprint):
+    srcfile = ldict.get('__file__') or 'lexer'
+    cachedir = os.path.join(os.path.dirname(os.path.abspath(srcfile)), '__pycache__')
+    base = os.path.splitext(os.path.basename(srcfile))[0]
+    return os.path.join(cachedir, '%s.lextab-%s.pickle' % (base, fingerprint[:16]))
+
+def _read_lextab(filename, fingerprint):
+    try:
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get('fingerprint') != fingerprint:
+        return None
+    return data['lexstateretext']
+
+def _write_lextab(filename, fingerprint, lexstateretext):
+    data = {'fingerprint': fingerprint, 'lexstateretext': lexstateretext}
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmpname, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+    except OSError:
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+
 # -----------------------------------------------------------------------------
 # lex(module)
 #
 # Build all of the regular expression rules from definitions in the supplied module
 # -----------------------------------------------------------------------------
 def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None, tabcache=False):
 
     global lexer
 
@@ -748,7 +805,15 @@ def lex(*, module=None, object=None, debug=False,
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
-    if linfo.validate_all():
+
+    # A cached spec was produced from an identical, already validated rule set
+    cached = None
+    if tabcache and not debug and not linfo.error:
+        fingerprint = _lex_fingerprint(linfo, reflags)
+        tabfile = _lextab_file(ldict, fingerprint)
+        cached = _read_lextab(tabfile, fingerprint)
+
+    if cached is None and linfo.validate_all():
         raise SyntaxError("Can't build lexer")
 
     # Dump some basic debugging information
@@ -773,38 +838,53 @@ def lex(*, module=None, object=None, debug=False,
     # Get the stateinfo dictionary
     stateinfo = linfo.stateinfo
 
-    regexs = {}
-    # Build the master regular expressions
-    for state in stateinfo:
-        regex_list = []
-
-        # Add rules defined by functions first
-        for fname, f in linfo.funcsym[state]:
-            regex_list.append('(?P<%s>%s)' % (fname, _get_regex(f)))
-            if debug:
-                debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", fname, _get_regex(f), state)
+    if cached is not None:
+        for state, re_texts in cached.items():
+            lexobj.lexstatere[state] = []
+            lexobj.lexstaterenames[state] = []
+            for text in re_texts:
+                lexre = re.compile(text, reflags)
+                lexindexfunc, lexindexnames = _form_master_index(lexre, ldict, linfo.toknames)
+                lexobj.lexstatere[state].append((lexre, lexindexfunc))
+                lexobj.lexstaterenames[state].append(lexindexnames)
+            lexobj.lexstateretext[state] = list(re_texts)
+    else:
+        regexs = {}
+        # Build the master regular expressions
+        for state in stateinfo:
+            regex_list = []
 
-        # Now add all of the simple rules
-        for name, r in linfo.strsym[state]:
-            regex_list.append('(?P<%s>%s)' % (name, r))
-            if debug:
-                debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", name, r, state)
+            # Add rules defined by functions first
+            for fname, f in linfo.funcsym[state]:
+                regex_list.append('(?P<%s>%s)' % (fname, _get_regex(f)))
+                if debug:
+                    debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", fname, _get_regex(f), state)
 
-        regexs[state] = regex_list
+            # Now add all of the simple rules
+            for name, r in linfo.strsym[state]:
+                regex_list.append('(?P<%s>%s)' % (name, r))
+                if debug:
+                    debuglog.info("lex: Adding rule %s -> '%s' (state '%s')", name, r, state)
 
-    # Build the master regular expressions
+            regexs[state] = regex_list
 
-    if debug:
-        debuglog.info('lex: ==== MASTER REGEXS FOLLOW ====')
+        # Build the master regular expressions
 
-    for state in regexs:
-        lexre, re_text, re_names = _form_master_re(regexs[state], reflags, ldict, linfo.toknames)
-        lexobj.lexstatere[state] = lexre
-        lexobj.lexstateretext[state] = re_text
-        lexobj.lexstaterenames[state] = re_names
         if debug:
-            for i, text in enumerate(re_text):
-                debuglog.info("lex: state '%s' : regex[%d] = '%s'", state, i, text)
+            debuglog.info('lex: ==== MASTER REGEXS FOLLOW ====')
+
+        for state in regexs:
+            lexre, re_text, re_names = _form_master_re(regexs[state], reflags, ldict, linfo.toknames)
+            lexobj.lexstatere[state] = lexre
+            lexobj.lexstateretext[state] = re_text
+            lexobj.lexstaterenames[state] = re_names
+            if debug:
+                for i, text in enumerate(re_text):
+                    debuglog.info("lex: state '%s' : regex[%d] = '%s'", state, i, text)
+
+        if tabcache and not debug:
+            _write_lextab(tabfile, fingerprint,
+                          {state: list(texts) for state, texts in lexobj.lexstateretext.items()})
 
     # For inclusive states, we need to add the regular expressions from the INITIAL state
     for state, stype in stateinfo.items():
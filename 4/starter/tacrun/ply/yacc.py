@@ -64,7 +64,10 @@
 import re
 import types
 import sys
+import os
 import inspect
+import pickle
+import hashlib
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -2262,6 +2265,97 @@ class ParserReflect(object):
 
         self.grammar = grammar
 
+# -----------------------------------------------------------------------------
+#                           === LR table cache ===
+#
+# Building the LALR tables is by far the most expensive part of yacc().  When
+# tabcache is enabled, the action/goto tables and a stripped-down copy of the
+# productions are pickled into the __pycache__ directory next to the grammar
+# module.  The file name is keyed by a fingerprint of the grammar (start symbol,
+# precedence, tokens, p_* function names and docstrings) and the fingerprint is
+# also stored inside the file and checked on load, so editing the grammar
+# simply produces a new cache entry.
+# -----------------------------------------------------------------------------
+
+tabcache_version = 1
+
+# Production stand-in restored from the table cache.  It only carries the
+# attributes that LRParser.parse() looks at.
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = pdict[self.func]
+
+# Table object restored from the cache, a drop-in for LRTable in LRParser
+class CachedLRTable(object):
+    def __init__(self, action, goto, productions):
+        self.lr_action      = action
+        self.lr_goto        = goto
+        self.lr_productions = productions
+
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
+def grammar_fingerprint(pinfo):
+    parts = [__name__, str(tabcache_version), pinfo.signature()]
+    parts.extend(f[2] for f in pinfo.pfuncs)
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+def tabcache_file(pdict, fingerprint):
+    srcfile = pdict.get('__file__') or 'parser'
+    cachedir = os.path.join(os.path.dirname(os.path.abspath(srcfile)), '__pycache__')
+    base = os.path.splitext(os.path.basename(srcfile))[0]
+    return os.path.join(cachedir, '%s.lrtab-%s.pickle' % (base, fingerprint[:16]))
+
+def read_tabcache(filename, fingerprint):
+    try:
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get('fingerprint') != fingerprint:
+        return None
+    productions = [MiniProduction(*p) for p in data['productions']]
+    return CachedLRTable(data['action'], data['goto'], productions)
+
+def write_tabcache(filename, fingerprint, lr):
+    data = {
+        'fingerprint': fingerprint,
+        'action': lr.lr_action,
+        'goto': lr.lr_goto,
+        'productions': [(str(p), p.name, p.len, p.func, p.file, p.line) for p in lr.lr_productions],
+    }
+    # Write to a private file first so that concurrent builds never see a
+    # partially written table
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmpname, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+    except OSError:
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+
 # -----------------------------------------------------------------------------
 # yacc(module)
 #
@@ -2270,7 +2364,7 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, tabcache=False):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2303,6 +2397,18 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # Try to reuse previously generated tables.  Debug mode always rebuilds
+    # since it needs the full grammar analysis for parser.out
+    if tabcache and not debug:
+        fingerprint = grammar_fingerprint(pinfo)
+        tabfile = tabcache_file(pinfo.pdict, fingerprint)
+        lr = read_tabcache(tabfile, fingerprint)
+        if lr is not None:
+            lr.bind_callables(pinfo.pdict)
+            parser = LRParser(lr, pinfo.error_func)
+            parse = parser.parse
+            return parser
+
     if debuglog is None:
         if debug:
             try:
@@ -2474,6 +2580,9 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    if tabcache and not debug:
+        write_tabcache(tabfile, fingerprint, lr)
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
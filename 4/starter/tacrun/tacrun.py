@@ -75,6 +75,8 @@ class Instr:
         result.write(f' {self.arg1}')
         if self.arg2 != None:
           result.write(f', {self.arg2}')
+        for arg in self.args[2:]:
+          result.write(f', {arg}')
       result.write(';')
     return result.getvalue()
 
@@ -189,7 +191,7 @@ class Lexer:
   def __init__(self, text, provenance="<unknown>"):
     self.text = text
     self.provenance = provenance
-    self.lexer = ply.lex.lex(module=self)
+    self.lexer = ply.lex.lex(module=self, tabcache=True)
     self.lexer.input(self.text)
 
 # ------------------------------------------------------------------------------
@@ -261,12 +263,14 @@ class Parser:
     p[0] = None if len(p) == 1 else p[1]
 
   def p_args(self, p):
-    '''args : arg COMMA arg
+    '''args : arg COMMA arg COMMA arg
+            | arg COMMA arg
             | arg
             | '''
     if len(p) == 1: p[0] = ()
     elif len(p) == 2: p[0] = (p[1],)
-    else: p[0] = (p[1], p[3])
+    elif len(p) == 4: p[0] = (p[1], p[3])
+    else: p[0] = (p[1], p[3], p[5])
 
   def p_arg(self, p):
     '''arg : TEMP
@@ -282,7 +286,7 @@ class Parser:
 
   def __init__(self, lexer):
     self.lexer = lexer
-    self.parser = ply.yacc.yacc(module=self, start='program')
+    self.parser = ply.yacc.yacc(module=self, start='program', tabcache=True)
 
   def parse(self):
     return self.parser.parse(lexer=self.lexer.lexer, tracking=True)
@@ -318,6 +322,11 @@ unops = {
   'neg' : (lambda u: twoc(-untwoc(u))),
   'not' : (lambda u: twoc(~untwoc(u))),
 }
+sets = {
+  'setz': 'jz', 'setnz': 'jnz',
+  'setl': 'jl', 'setle': 'jle',
+  'setnl': 'jnl', 'setnle': 'jnle',
+}
 jumps = {
   'jz':   (lambda k: k == 0),
   'jnz':  (lambda k: k != 0),
@@ -394,11 +403,23 @@ def execute(gvars, procs, proc_name, args, **kwargs):
       if instr.arg1 not in labels:
         raise RuntimeError(f'Unknown jump destination {instr.arg1}')
       pc = labels[instr.arg1]
+    elif instr.opcode in jumps and len(instr.args) == 3:
+      # jcc u, v, L: the jump of the sign of u - v, computed without overflow
+      u, v = untwoc(values[instr.arg1]), untwoc(values[instr.arg2])
+      dest = instr.args[2]
+      if dest not in labels:
+        raise RuntimeError(f'Unknown jump destination {dest}')
+      pc = labels[dest] if jumps[instr.opcode](twoc((u > v) - (u < v))) else pc + 1
     elif instr.opcode in jumps:
       k = values[instr.arg1]
       if instr.arg2 not in labels:
         raise RuntimeError(f'Unknown jump destination {instr.arg2}')
       pc = labels[instr.arg2] if jumps[instr.opcode](k) else pc + 1
+    elif instr.opcode in sets:
+      # r = setcc u, v: 1 if jcc u, v would jump
+      u, v = untwoc(values[instr.arg1]), untwoc(values[instr.arg2])
+      values[instr.result] = 1 if jumps[sets[instr.opcode]](twoc((u > v) - (u < v))) else 0
+      pc += 1
     elif instr.opcode == 'const':
       if not isinstance(instr.arg1, int):
         print(f'Missing or bad argument: {instr.arg1}')